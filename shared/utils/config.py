@@ -165,6 +165,8 @@ MULTIPLE_FRAMES_DIR_SC: Path = Path(get_str("MULTIPLE_FRAMES_DIR_SC", ".multiple
 KW_CACHE_FILE_SC = Path(get_str("KW_CACHE_FILE_SC"))
 KW_MAPPING_FILE_SC = Path(get_path_required("KW_MAPPING_FILE_SC"))
 KW_FORBIDDEN_FILE_SC = Path(get_str("KW_FORBIDDEN_FILE_SC"))
+AI_CACHE_DIR_SC: Path = Path(get_str("AI_CACHE_DIR_SC", ".ai_cache"))
+EMBEDDING_CACHE_DIR_SC: Path = Path(get_str("EMBEDDING_CACHE_DIR_SC", ".embedding_cache"))
 SAFE_FORMATS = [".mp4", ".mkv"]
 
 OK_DIR.mkdir(parents=True, exist_ok=True)
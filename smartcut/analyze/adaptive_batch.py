@@ -0,0 +1,161 @@
+"""
+Taille de batch adaptative pour la génération VLM.
+
+`estimate_safe_batch_size` ne fournit qu'une valeur de départ. Pendant l'analyse :
+
+- un OOM pendant `generate` divise le batch par deux et le même batch est rejoué, sans recharger le modèle ;
+- après `grow_after` batches pleins réussis d'affilée, la taille augmente (sans dépasser la dernière taille en OOM) ;
+- le plafond OOM est oublié après `batch_ceiling_expire` batches pleins sans OOM (un OOM ponctuel ne bride pas le
+  batch indéfiniment) ;
+- la taille apprise est persistée par (modèle, précision) et reprise au prochain lancement.
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import os
+from pathlib import Path
+import threading
+
+import torch
+
+from shared.models.config_manager import CONFIG
+from shared.utils.config import JSON_STATES_DIR_SC
+from shared.utils.logger import get_logger
+
+logger = get_logger("SmartCut")
+
+ADAPTIVE_BATCH: bool = CONFIG.smartcut["analyse_segment"].get("adaptive_batch", True)
+BATCH_GROW_AFTER: int = CONFIG.smartcut["analyse_segment"].get("batch_grow_after", 3)
+BATCH_MAX_SIZE: int = CONFIG.smartcut["analyse_segment"].get("batch_max_size", 64)
+# Batches pleins sans OOM avant d'oublier le plafond OOM (0 = plafond permanent)
+BATCH_CEILING_EXPIRE: int = CONFIG.smartcut["analyse_segment"].get("batch_ceiling_expire", 50)
+CLEAN_SAVE_EVERY = 10  # persistance du compteur de batches sans OOM (reprise au lancement suivant)
+BATCH_SIZES_FILE: Path = JSON_STATES_DIR_SC / "vlm_batch_sizes.json"
+
+
+def is_oom_error(exc: BaseException) -> bool:
+    """
+    Vrai pour un dépassement mémoire GPU (CUDA OOM ou erreur runtime équivalente).
+    """
+    if isinstance(exc, torch.cuda.OutOfMemoryError):
+        return True
+    return isinstance(exc, RuntimeError) and "out of memory" in str(exc).lower()
+
+
+def clear_after_oom() -> None:
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class BatchSizer:
+    """
+    Taille de batch apprise pour un couple (modèle, précision).
+    """
+
+    def __init__(
+        self,
+        key: str,
+        initial: int,
+        path: Path = BATCH_SIZES_FILE,
+        ceiling_expire: int = BATCH_CEILING_EXPIRE,
+    ) -> None:
+        self.key = key
+        self.path = path
+        self.ceiling_expire = ceiling_expire
+        stored = self._load().get(key, {})
+        self.size: int = max(1, int(stored.get("size", initial)))
+        self.ceiling: int | None = stored.get("ceiling")  # plus petite taille ayant provoqué un OOM
+        self.clean: int = int(stored.get("clean", 0))  # batches pleins sans OOM depuis le dernier OOM
+        self._streak = 0
+        if stored:
+            logger.info(f"📐 Batch size appris pour {key} : {self.size} (plafond OOM : {self.ceiling})")
+
+    def on_success(self, batch_len: int) -> None:
+        """
+        Batch généré sans erreur ; seuls les batches pleins comptent pour la croissance.
+        """
+        if batch_len < self.size:
+            return
+        self._age_ceiling()
+        self._streak += 1
+        if self._streak < BATCH_GROW_AFTER:
+            return
+        self._streak = 0
+        limit = min(BATCH_MAX_SIZE, self.ceiling - 1 if self.ceiling else BATCH_MAX_SIZE)
+        grown = min(limit, self.size + max(1, self.size // 4))
+        if grown > self.size:
+            logger.info(f"📈 Batch size : {self.size} → {grown}")
+            self.size = grown
+            self._save()
+
+    def on_oom(self, batch_len: int) -> int:
+        """
+        OOM sur un batch de `batch_len` frames : retourne la nouvelle taille (moitié), 0 si déjà à 1.
+        """
+        self._streak = 0
+        self.clean = 0
+        if batch_len <= 1:
+            return 0
+        self.ceiling = batch_len if self.ceiling is None else min(self.ceiling, batch_len)
+        self.size = max(1, batch_len // 2)
+        logger.warning(f"💥 OOM sur {batch_len} frames → nouvel essai avec {self.size}")
+        self._save()
+        return self.size
+
+    def _age_ceiling(self) -> None:
+        """
+        Compte un batch plein sans OOM ; le plafond est oublié après `ceiling_expire` batches (0 = jamais).
+        """
+        if self.ceiling is None or self.ceiling_expire <= 0:
+            return
+        self.clean += 1
+        if self.clean >= self.ceiling_expire:
+            logger.info(f"📐 Plafond OOM {self.ceiling} oublié après {self.clean} batches sans OOM ({self.key})")
+            self.ceiling = None
+            self.clean = 0
+            self._save()
+        elif self.clean % CLEAN_SAVE_EVERY == 0:
+            self._save()
+
+    def _load(self) -> dict[str, dict[str, int]]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data: dict[str, dict[str, int]] = json.load(f)
+            return data
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"⚠️ Lecture de {self.path} impossible : {e}")
+            return {}
+
+    def _save(self) -> None:
+        data = self._load()
+        data[self.key] = {"size": self.size, **({"ceiling": self.ceiling, "clean": self.clean} if self.ceiling else {})}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"⚠️ Sauvegarde du batch size impossible : {e}")
+
+
+_SIZERS: dict[str, BatchSizer] = {}
+_SIZERS_LOCK = threading.Lock()
+
+
+def get_batch_sizer(model_name: str, precision: str, initial: int) -> BatchSizer | None:
+    """
+    BatchSizer partagé pour (modèle, précision), ou None si l'adaptation est désactivée.
+    """
+    if not ADAPTIVE_BATCH:
+        return None
+    key = f"{model_name}|{precision}"
+    with _SIZERS_LOCK:
+        if key not in _SIZERS:
+            _SIZERS[key] = BatchSizer(key, initial)
+        return _SIZERS[key]
@@ -2,29 +2,95 @@ from __future__ import annotations
 
 import json
 from math import ceil
-from pathlib import Path
-import shutil
 from typing import Any, cast
 
-from transformers import PreTrainedModel, ProcessorMixin
+from PIL import Image
+from transformers import BatchFeature, PreTrainedModel, ProcessorMixin
 
+from shared.models.config_manager import CONFIG
 from shared.utils.config import BATCH_FRAMES_DIR_SC
 from shared.utils.logger import get_logger
-from smartcut.analyze.analyze_torch_utils import (
-    estimate_visual_tokens,
-    release_gpu_memory,
-)
-from smartcut.analyze.analyze_utils import (
-    delete_frames,
-)
+from smartcut.analyze.adaptive_batch import BatchSizer, clear_after_oom, is_oom_error
+from smartcut.analyze.memory_manager import get_memory_manager
+from smartcut.gen_keywords.gen_frames import dedup_images, spill_images
 from smartcut.gen_keywords.main_gen_keywords import generate_keywords_for_segment
+from smartcut.gen_keywords.token_budget import LIMIT_TOKENS
 from smartcut.models_sc.ai_result import AIResult
 
 logger = get_logger("SmartCut")
 
+# Debug : écrit chaque batch en JPEG dans BATCH_FRAMES_DIR_SC (le pipeline reste en mémoire)
+SPILL_FRAMES: bool = CONFIG.smartcut["analyse_segment"].get("spill_frames", False)
+
+# Dédoublonnage perceptuel des frames d'un segment avant les batches (opt-in : change les frames envoyées au VLM)
+DEDUP_FRAMES: bool = CONFIG.smartcut["analyse_segment"].get("dedup_frames", False)
+DEDUP_MAX_DISTANCE: int = CONFIG.smartcut["analyse_segment"].get("dedup_max_distance", 4)
+DEDUP_MIN_FRAMES: int = CONFIG.smartcut["analyse_segment"].get("dedup_min_frames", 3)
+DEDUP_PICK: str = CONFIG.smartcut["analyse_segment"].get("dedup_pick", "first")
+
 KeywordsBatches = list[AIResult]
 
 
+def select_frames(frames: list[Image.Image]) -> list[Image.Image]:
+    """
+    Sélection des frames envoyées au VLM : retire les quasi-doublons (plans statiques) si activé.
+    """
+    if not DEDUP_FRAMES:
+        return frames
+    return dedup_images(frames, DEDUP_MAX_DISTANCE, DEDUP_MIN_FRAMES, DEDUP_PICK)
+
+
+def sampling_fps(num_frames: int, start: float, end: float) -> float | None:
+    """
+    Cadence moyenne des frames extraites d'un segment (métadonnée du mode d'entrée vidéo).
+    """
+    return num_frames / (end - start) if end > start else None
+
+
+def split_batches(frames: list[Image.Image], batch_size: int) -> list[list[Image.Image]]:
+    """
+    Découpe les frames d'un segment en batches (découpage partagé par le préfetch et process_batches).
+    """
+    return [frames[i : i + batch_size] for i in range(0, len(frames), batch_size)]
+
+
+def parse_batch_result(batch_result_raw: AIResult) -> AIResult:
+    """
+    Normalise la réponse brute du modèle (JSON, dict ou texte) en {"description", "keywords"}.
+    """
+    parsed_result: AIResult = {"description": "", "keywords": []}
+
+    try:
+        if isinstance(batch_result_raw, str):
+            parsed = json.loads(batch_result_raw)
+            if isinstance(parsed, dict):
+                # normaliser les clés
+                lower = {k.lower(): v for k, v in parsed.items()}
+                parsed_result["description"] = str(lower.get("description", ""))
+                parsed_result["keywords"] = list(lower.get("keywords", []))
+            else:
+                parsed_result["keywords"] = [kw.strip() for kw in str(parsed).split(",") if kw.strip()]
+
+        elif isinstance(batch_result_raw, dict):
+            lower2: dict[str, Any] = {k.lower(): v for k, v in batch_result_raw.items()}
+            parsed_result["description"] = str(lower2.get("description", ""))
+            # ✅ Cast explicite pour que mypy voie bien une liste de str
+            raw_keywords = lower2.get("keywords", [])
+            if isinstance(raw_keywords, list):
+                parsed_result["keywords"] = [str(kw).strip() for kw in raw_keywords if str(kw).strip()]
+            elif isinstance(raw_keywords, str):
+                parsed_result["keywords"] = [kw.strip() for kw in raw_keywords.split(",") if kw.strip()]
+            else:
+                parsed_result["keywords"] = []
+
+    except json.JSONDecodeError:
+        # ✅ Ici on force le type en str pour mypy
+        raw_text = cast(str, batch_result_raw)
+        parsed_result["keywords"] = [kw.strip() for kw in raw_text.split(",") if kw.strip()]
+
+    return parsed_result
+
+
 # ===========================================================
 # ⚙️ FONCTION DE TRAITEMENT PAR LOTS (batches)
 # ===========================================================
@@ -32,81 +98,73 @@ def process_batches(
     video_name: str,
     start: float,
     end: float,
-    frame_paths: list[str],
+    frames: list[Image.Image],
     batch_size: int,
     processor: ProcessorMixin,
     model: PreTrainedModel,
+    prepared: list[BatchFeature | None] | None = None,
+    sizer: BatchSizer | None = None,
 ) -> KeywordsBatches:
     """
     Traite un segment vidéo par lots et récupère les descriptions + mots-clés IA.
+
+    Les frames (images PIL déjà redimensionnées) restent en mémoire jusqu'au processor.
+    `prepared` : entrées du processor déjà calculées pour chaque batch (préfetch), dans l'ordre de `split_batches`
+    avec `batch_size` ; None pour un batch dont la réponse est en cache.
+    `sizer` : taille de batch adaptative ; un OOM divise le batch courant par deux et le rejoue (modèle conservé).
     """
 
     all_batches: KeywordsBatches = []
-    num_batches = ceil(len(frame_paths) / batch_size)
-
-    for b in range(num_batches):
-        batch_paths = frame_paths[b * batch_size : (b + 1) * batch_size]
-        if not batch_paths:
+    segment_id = f"{video_name}_seg_{int(start * 10)}_{int(end * 10)}"
+    fps = sampling_fps(len(frames), start, end)
+    pos = 0
+
+    while pos < len(frames):
+        size = sizer.size if sizer else batch_size
+        batch_images = frames[pos : pos + size]
+        b = len(all_batches)
+        num_batches = b + ceil((len(frames) - pos) / size)
+        # Les entrées préfetchées ne sont valables que si le découpage n'a pas changé depuis leur préparation
+        inputs = prepared[pos // batch_size] if prepared and size == batch_size and pos % batch_size == 0 else None
+
+        if SPILL_FRAMES:
+            spill_images(batch_images, BATCH_FRAMES_DIR_SC / f"{segment_id}_b{b + 1}", segment_id)
+
+        logger.info(f"📦 Batch {b + 1}/{num_batches} → {len(batch_images)} frames.")
+        if inputs is not None:
+            # Tokens réels de la ligne, au budget de pixels planifié à la préparation (sinon journalisé par celle-ci)
+            logger.info(f"🧮 Contexte : {inputs['input_ids'].shape[1]:,} / {LIMIT_TOKENS:,}")
+
+        oom = False
+        try:
+            batch_result_raw = generate_keywords_for_segment(
+                segment_id=segment_id,
+                images=batch_images,
+                processor=processor,
+                model=model,
+                inputs=inputs,
+                fps=fps,
+            )
+        except Exception as exc:
+            if sizer is None or not is_oom_error(exc) or not sizer.on_oom(len(batch_images)):
+                raise
+            oom = True
+        if oom:
+            # Hors du `except` : la trace de l'OOM (et les activations qu'elle retient) est libérée avant le nettoyage
+            inputs = None
+            clear_after_oom()
             continue
 
-        batch_dir = BATCH_FRAMES_DIR_SC / f"{video_name}_seg_{int(start * 10)}_{int(end * 10)}_b{b + 1}"
-        batch_dir.mkdir(parents=True, exist_ok=True)
-
-        for src_path in batch_paths:
-            dst_path = batch_dir / Path(src_path).name
-            try:
-                shutil.copy(src_path, dst_path)
-            except Exception as e:
-                logger.warning(f"⚠️ Erreur de copie {src_path} → {dst_path}: {e}")
-
-        logger.info(f"📦 Batch {b + 1}/{num_batches} → {len(batch_paths)} frames.")
-        tokens, limit = estimate_visual_tokens(len(batch_paths))
-        logger.info(f"🧮 Contexte : {tokens:,} / {limit:,}")
-
-        batch_result_raw = generate_keywords_for_segment(
-            segment_id=f"{video_name}_seg_{int(start * 10)}_{int(end * 10)}",
-            frame_dir=batch_dir,
-            processor=processor,
-            model=model,
-            num_frames=len(batch_paths),
-        )
-
-        parsed_result: AIResult = {"description": "", "keywords": []}
-
-        try:
-            if isinstance(batch_result_raw, str):
-                parsed = json.loads(batch_result_raw)
-                if isinstance(parsed, dict):
-                    # normaliser les clés
-                    lower = {k.lower(): v for k, v in parsed.items()}
-                    parsed_result["description"] = str(lower.get("description", ""))
-                    parsed_result["keywords"] = list(lower.get("keywords", []))
-                else:
-                    parsed_result["keywords"] = [kw.strip() for kw in str(parsed).split(",") if kw.strip()]
-
-            elif isinstance(batch_result_raw, dict):
-                lower2: dict[str, Any] = {k.lower(): v for k, v in batch_result_raw.items()}
-                parsed_result["description"] = str(lower2.get("description", ""))
-                # ✅ Cast explicite pour que mypy voie bien une liste de str
-                raw_keywords = lower2.get("keywords", [])
-                if isinstance(raw_keywords, list):
-                    parsed_result["keywords"] = [str(kw).strip() for kw in raw_keywords if str(kw).strip()]
-                elif isinstance(raw_keywords, str):
-                    parsed_result["keywords"] = [kw.strip() for kw in raw_keywords.split(",") if kw.strip()]
-                else:
-                    parsed_result["keywords"] = []
-
-        except json.JSONDecodeError:
-            # ✅ Ici on force le type en str pour mypy
-            raw_text = cast(str, batch_result_raw)
-            parsed_result["keywords"] = [kw.strip() for kw in raw_text.split(",") if kw.strip()]
+        if sizer:
+            sizer.on_success(len(batch_images))
+        parsed_result = parse_batch_result(batch_result_raw)
 
         # Log lisible
         logger.debug(f"🧠 Batch {b + 1}/{num_batches} description: {parsed_result['description'][:100]}")
         logger.debug(f"🧠 Batch {b + 1}/{num_batches} keywords: {parsed_result['keywords']}")
 
         all_batches.append(parsed_result)
-        delete_frames(batch_dir)
-        release_gpu_memory(model, cache_only=True)
+        pos += len(batch_images)
+        get_memory_manager().after_batch()
 
     return all_batches
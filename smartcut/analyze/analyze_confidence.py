@@ -7,24 +7,31 @@ Utilise Sentence Transformers (ex: all-MiniLM-L6-v2 ou BAAI/bge-m3).
 
 from __future__ import annotations
 
-from sentence_transformers import SentenceTransformer, util
+from collections.abc import Sequence
+
+import numpy as np
 import torch
 
 from shared.models.config_manager import CONFIG
 from shared.utils.logger import get_logger
+from smartcut.embeddings.service import SharedEncoder, get_embedding_service
+from smartcut.embeddings.store import encode_cached
+from smartcut.models_sc.smartcut_model import Segment
 
 logger = get_logger("SmartCut")
 
 MODEL_CONFIDENCE: str = CONFIG.smartcut["analyse_confidence"]["model_confidence"]
 DEVICE: str = CONFIG.smartcut["analyse_confidence"]["device"]
+ENCODE_BATCH_SIZE: int = CONFIG.smartcut["analyse_confidence"].get("batch_size", 64)
 
 # 🔧 Initialisation du modèle global
-MODEL = None
+MODEL: SharedEncoder | None = None
 
 
-def get_confidence_model() -> SentenceTransformer:
+def get_confidence_model() -> SharedEncoder | None:
     """
-    Charge le modèle de similarité en mémoire (lazy-load, CPU par défaut).
+    Modèle de similarité du service d'embeddings partagé (CPU par défaut), chargé dès le premier appel : un échec de
+    chargement est détecté ici et donne None.
     """
     global MODEL, DEVICE
     if MODEL is not None:
@@ -42,8 +49,10 @@ def get_confidence_model() -> SentenceTransformer:
         else:
             logger.info("⚙️ Pas de GPU détecté — modèle forcé sur CPU")
 
-        MODEL = SentenceTransformer(MODEL_CONFIDENCE, device=DEVICE)
-        logger.info(f"✅ Modèle de similarité chargé sur {DEVICE.upper()} : {MODEL_CONFIDENCE}")
+        encoder = get_embedding_service().get(MODEL_CONFIDENCE, device=DEVICE)
+        encoder.load()
+        MODEL = encoder
+        logger.info(f"✅ Modèle de similarité chargé sur {str(encoder.device).upper()} : {MODEL_CONFIDENCE}")
 
     except Exception as e:
         logger.error(f"❌ Erreur chargement modèle confiance : {e}")
@@ -52,37 +61,64 @@ def get_confidence_model() -> SentenceTransformer:
     return MODEL
 
 
-def compute_confidence(description: str, keywords: list[str]) -> float:
+def compute_confidence_scores(descriptions: Sequence[str], keywords_lists: Sequence[list[str]]) -> list[float]:
     """
-    Calcule un score de confiance entre la description et les mots-clés associés.
+    Scores de confiance (0.0 à 1.0) de paires (description, mots-clés).
 
-    Retourne un score entre 0.0 et 1.0 basé sur la similarité cosinus.
-    Si le modèle n’est pas dispo ou les champs vides → renvoie 0.0.
+    Deux appels `model.encode` pour toutes les paires valides (textes déjà vus lus dans le cache d'embeddings), puis
+    cosinus ligne à ligne en une opération matricielle. Les paires vides, ou l'absence de modèle, donnent 0.0.
     """
-    try:
-        if not description or not keywords:
-            return 0.0
+    scores = [0.0] * len(descriptions)
+    valid = [i for i, (desc, kws) in enumerate(zip(descriptions, keywords_lists, strict=True)) if desc and kws]
+    if not valid:
+        return scores
 
+    try:
         model = get_confidence_model()
         if not model:
             logger.warning("⚠️ Aucun modèle disponible pour le calcul de confiance.")
-            return 0.0
+            return scores
+
+        # 🔹 Encodage CPU/GPU auto, un seul passage par type de texte
+        desc_emb = encode_cached(
+            model, MODEL_CONFIDENCE, [descriptions[i] for i in valid], normalize=True, batch_size=ENCODE_BATCH_SIZE
+        )
+        key_emb = encode_cached(
+            model,
+            MODEL_CONFIDENCE,
+            [", ".join(keywords_lists[i]) for i in valid],
+            normalize=True,
+            batch_size=ENCODE_BATCH_SIZE,
+        )
+
+        similarities = np.clip((desc_emb * key_emb).sum(axis=1), 0.0, 1.0).tolist()
+        for i, score in zip(valid, similarities, strict=True):
+            scores[i] = round(float(score), 3)
+            logger.debug(f"🔹 Score de confiance : {scores[i]:.3f} (desc='{descriptions[i][:30]}...')")
+
+    except Exception as e:
+        logger.warning(f"⚠️ Erreur calcul confiance : {e}")
+    return scores
 
-        text_keywords = ", ".join(keywords)
 
-        # 🔹 Encodage CPU/GPU auto
-        desc_emb = model.encode(description, convert_to_tensor=True)
-        key_emb = model.encode(text_keywords, convert_to_tensor=True)
+def compute_confidence_batch(segments: Sequence[Segment]) -> list[float]:
+    """
+    Scores de confiance de tous les segments d'une session (même ordre que `segments`).
+    """
+    return compute_confidence_scores(
+        [seg.description or "" for seg in segments],
+        [list(seg.keywords or []) for seg in segments],
+    )
 
-        score: float = util.cos_sim(desc_emb, key_emb).item()
-        score = max(0.0, min(1.0, float(score)))
 
-        logger.debug(f"🔹 Score de confiance : {score:.3f} (desc='{description[:30]}...')")
-        return round(score, 3)
+def compute_confidence(description: str, keywords: list[str]) -> float:
+    """
+    Calcule un score de confiance entre la description et les mots-clés associés.
 
-    except Exception as e:
-        logger.warning(f"⚠️ Erreur calcul confiance : {e}")
-        return 0.0
+    Retourne un score entre 0.0 et 1.0 basé sur la similarité cosinus.
+    Si le modèle n’est pas dispo ou les champs vides → renvoie 0.0.
+    """
+    return compute_confidence_scores([description], [keywords])[0]
 
 
 if __name__ == "__main__":
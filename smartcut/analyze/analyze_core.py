@@ -1,25 +1,157 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
 from datetime import datetime
 from pathlib import Path
 
+from PIL import Image
+from transformers import PreTrainedModel, ProcessorMixin
+
+from shared.models.config_manager import CONFIG
 from shared.utils.config import JSON_STATES_DIR_SC
 from shared.utils.logger import get_logger
-from smartcut.analyze.analyze_batches import process_batches
-from smartcut.analyze.analyze_torch_utils import (
-    release_gpu_memory,
-    vram_gpu,
-)
+from smartcut.analyze.adaptive_batch import BatchSizer, get_batch_sizer
+from smartcut.analyze.analyze_batches import KeywordsBatches, process_batches, select_frames
+from smartcut.analyze.analyze_torch_utils import get_model_precision
 from smartcut.analyze.analyze_utils import (
     merge_keywords_across_batches,
 )
-from smartcut.analyze.extract_frames import extract_segment_frames
+from smartcut.analyze.extract_frames import iter_session_images
+from smartcut.analyze.extract_frames_ffmpeg import FFmpegFramesError, iter_session_images_ffmpeg
+from smartcut.analyze.memory_manager import get_memory_manager
+from smartcut.analyze.packed_generation import iter_packed_results
+from smartcut.analyze.prefetch import prefetch_segments
 from smartcut.analyze.prep_analyze import cleanup_temp, open_vid, release_cap
-from smartcut.gen_keywords.load_model import load_and_batches
-from smartcut.models_sc.smartcut_model import SmartCutSession
+from smartcut.gen_keywords.generate_keywords import FRAME_SIZE
+from smartcut.gen_keywords.result_cache import get_result_cache
+from smartcut.gen_keywords.vlm_service import get_vlm_service
+from smartcut.models_sc.smartcut_model import Segment, SmartCutSession
 
 logger = get_logger("SmartCut")
 
+# Lecteur de frames d'analyse : "opencv" (défaut) ou "ffmpeg"
+FRAME_BACKEND: str = CONFIG.smartcut["analyse_segment"].get("frame_backend", "opencv")
+# Segments préparés d'avance (frames + tensors) pendant la génération ; 0 = extraction synchrone
+PREFETCH_DEPTH: int = CONFIG.smartcut["analyse_segment"].get("prefetch_segments", 1)
+# Génération packée inter-segments : budget de tokens paddés par pack (0 = un batch plein) et lignes max
+PACK_SEGMENTS: bool = CONFIG.smartcut["analyse_segment"].get("pack_segments", False)
+PACK_TOKEN_BUDGET: int = CONFIG.smartcut["analyse_segment"].get("pack_token_budget", 0)
+PACK_MAX_ROWS: int = CONFIG.smartcut["analyse_segment"].get("pack_max_rows", 8)
+
+
+def iter_segment_frames(
+    video_path: str,
+    segments: list[Segment],
+    auto_frames: bool,
+    fps_extract: float,
+    base_rate: int,
+    lite: bool = False,
+) -> Iterator[tuple[Segment, str, list[Image.Image]]]:
+    """
+    Extrait les frames des segments à traiter et les rend segment par segment (segment, nom vidéo, images PIL).
+
+    Mode complet : une seule passe séquentielle sur la vidéo source pour toute la session.
+    Mode lite : chaque segment est un fichier distinct, parcouru séquentiellement lui aussi.
+    Backend : "opencv" (grab/retrieve) ou "ffmpeg" (select + scale natifs, pipe rawvideo).
+    Les quasi-doublons sont retirés avant d'être rendus (voir `select_frames`).
+    """
+    if not lite:
+        cuts = [(seg.start, seg.end) for seg in segments]
+        for idx, video_name, images in _iter_images(video_path, cuts, auto_frames, fps_extract, base_rate):
+            yield segments[idx], video_name, select_frames(images)
+        return
+
+    for seg in segments:
+        if not seg.output_path:
+            logger.error(f"Chemin de segment vide pour le segment {seg.id}")
+            return
+        logger.debug(f"📥 Ouverture vidéo segment lite : {Path(seg.output_path).stem}")
+        cuts = [(seg.start, seg.end)]
+        for _, video_name, images in _iter_images(seg.output_path, cuts, auto_frames, fps_extract, base_rate):
+            yield seg, video_name, select_frames(images)
+
+
+def _iter_images(
+    video_path: str,
+    cuts: list[tuple[float, float]],
+    auto_frames: bool,
+    fps_extract: float,
+    base_rate: int,
+) -> Iterator[tuple[int, str, list[Image.Image]]]:
+    indices = list(range(len(cuts)))
+    if FRAME_BACKEND == "ffmpeg":
+        video_name = Path(video_path).stem
+        done: set[int] = set()
+        try:
+            for idx, images in iter_session_images_ffmpeg(
+                video_path, cuts, auto_frames, fps_extract, base_rate, FRAME_SIZE
+            ):
+                done.add(idx)
+                yield idx, video_name, images
+            return
+        except FFmpegFramesError as e:
+            # Les segments déjà rendus sont complets : seuls les restants repassent par OpenCV
+            indices = [i for i in indices if i not in done]
+            logger.warning(f"⚠️ {e} — repli OpenCV pour {len(indices)} segment(s).")
+
+    cap, video_name = open_vid(video_path)
+    try:
+        remaining = [cuts[i] for i in indices]
+        for pos, images in iter_session_images(cap, remaining, auto_frames, fps_extract, base_rate, FRAME_SIZE):
+            yield indices[pos], video_name, images
+    finally:
+        release_cap(cap)
+
+
+def _iter_segment_results(
+    frames_iter: Iterator[tuple[Segment, str, list[Image.Image]]],
+    processor: ProcessorMixin,
+    model: PreTrainedModel,
+    batch_size: int,
+    sizer: BatchSizer | None = None,
+) -> Iterator[tuple[Segment, KeywordsBatches]]:
+    """
+    Rend (segment, résultats IA par batch) dans l'ordre des segments ; liste vide si aucune frame.
+
+    `sizer` : taille de batch adaptative (OOM → batch divisé par deux, croissance après succès).
+
+    Mode packé : les batches de plusieurs segments sont générés ensemble (voir `packed_generation`).
+    """
+    if sizer:
+        batch_size = sizer.size
+
+    if PACK_SEGMENTS:
+        prepared_iter = prefetch_segments(frames_iter, None, batch_size, depth=PREFETCH_DEPTH)
+        for seg, _, keywords_batches in iter_packed_results(
+            prepared_iter, processor, model, batch_size, PACK_TOKEN_BUDGET, PACK_MAX_ROWS
+        ):
+            logger.info(f"🎬 Segment {seg.id} analysé ({seg.start:.2f}s → {seg.end:.2f}s, mode packé)")
+            yield seg, keywords_batches
+        return
+
+    current_size = (lambda: sizer.size) if sizer else batch_size
+    for prepared in prefetch_segments(frames_iter, processor, current_size, depth=PREFETCH_DEPTH, model=model):
+        seg = prepared.segment
+        logger.info(f"🎬 Analyse segment {seg.id} ({seg.start:.2f}s → {seg.end:.2f}s)")
+        if not prepared.frames:
+            yield seg, []
+            continue
+
+        yield (
+            seg,
+            process_batches(
+                video_name=prepared.video_name,
+                start=seg.start,
+                end=seg.end,
+                frames=prepared.frames,
+                batch_size=prepared.batch_size or batch_size,
+                processor=processor,
+                model=model,
+                prepared=prepared.inputs,
+                sizer=sizer,
+            ),
+        )
+
 
 # ===========================================================
 # 🧠 FONCTION PRINCIPALE : analyse de la vidéo par segments
@@ -44,68 +176,60 @@ def analyze_by_segments(
     # Nettoyage répertoires temporaires
     cleanup_temp()
 
-    if not lite:
-        # --- Ouverture vidéo
-        cap, video_name = open_vid(video_path)
-
-    processor, model, model_name, batch_size = load_and_batches()
-
-    # --- 🔁 Boucle principale sur les segments SmartCut
-    for seg in session.segments:
-        if getattr(seg, "ai_status", "pending") == "done":
-            logger.info(f"✅ Segment {seg.id} déjà traité, passage au suivant.")
-            continue
-
-        if lite:
-            # --- Ouverture vidéo
-            if not seg.output_path:
-                logger.error(f"Chemin de segment vide pour le segment {seg.id}")
-                return {}
-            video_path_lite = Path(seg.output_path)
-            cap, video_name = open_vid(str(video_path_lite))
-            logger.debug(f"📥 Ouverture vidéo segment lite : {video_name}")
-
-        start, end = seg.start, seg.end
-        logger.info(f"🎬 Analyse segment {seg.id} ({start:.2f}s → {end:.2f}s)")
-
-        frame_paths = extract_segment_frames(cap, video_name, start, end, auto_frames, fps_extract, base_rate)
-        if not frame_paths:
-            logger.warning(f"Aucune frame extraite pour le segment {seg.id}")
-            continue
-
-        keywords_batches = process_batches(
-            video_name=video_name,
-            start=start,
-            end=end,
-            frame_paths=frame_paths,
-            batch_size=batch_size,
-            processor=processor,
-            model=model,
-        )
-
-        # Fusion des résultats IA
-        merged_description, keywords_list = merge_keywords_across_batches(keywords_batches)
-        logger.debug(f"🧠 Segment {seg.id} description: {merged_description}")
-        logger.debug(f"🧠 Segment {seg.id} keywords: {keywords_list}")
-
-        # --- 💾 Mise à jour du segment
-        logger.debug(f"🔍 seg.id={seg.id} mem_id={id(seg)} session_seg_id={id(session.segments[seg.id - 1])}")
-        # logger.debug(f"session : {session}")
-        seg.description = merged_description
-        seg.keywords = keywords_list
-        seg.ai_status = "done"
-        seg.status = "ia_done"
-        seg.ai_model = model_name
-        seg.last_updated = datetime.now().isoformat()
-        frame_data[seg.uid] = keywords_list
-
-        session.save(str(state_path))
-        logger.debug(f"💾 Session mise à jour (segment {seg.id})")
-        # logger.debug(f"session : {session}")
-
-        vram_gpu()
-
-    release_cap(cap)
-    release_gpu_memory(model)
+    vlm = get_vlm_service()
+    processor, model, model_name, batch_size = vlm.acquire()
+    try:
+        sizer = get_batch_sizer(model_name, get_model_precision(model), batch_size)
+
+        pending_segments = []
+        for seg in session.segments:
+            if getattr(seg, "ai_status", "pending") == "done":
+                logger.info(f"✅ Segment {seg.id} déjà traité, passage au suivant.")
+            else:
+                pending_segments.append(seg)
+
+        # Mode lite : un segment sans fichier arrête l'analyse après les segments qui le précèdent (retour vide)
+        blocked = next((seg for seg in pending_segments if lite and not seg.output_path), None)
+        if blocked is not None:
+            pending_segments = pending_segments[: pending_segments.index(blocked)]
+
+        # --- 🔁 Boucle principale sur les segments SmartCut (frames extraites en une passe, préparées d'avance)
+        frames_iter = iter_segment_frames(video_path, pending_segments, auto_frames, fps_extract, base_rate, lite=lite)
+        for seg, keywords_batches in _iter_segment_results(frames_iter, processor, model, batch_size, sizer):
+            if not keywords_batches:
+                logger.warning(f"Aucune frame extraite pour le segment {seg.id}")
+                continue
+
+            # Fusion des résultats IA
+            merged_description, keywords_list = merge_keywords_across_batches(keywords_batches)
+            logger.debug(f"🧠 Segment {seg.id} description: {merged_description}")
+            logger.debug(f"🧠 Segment {seg.id} keywords: {keywords_list}")
+
+            # --- 💾 Mise à jour du segment
+            logger.debug(f"🔍 seg.id={seg.id} mem_id={id(seg)} session_seg_id={id(session.segments[seg.id - 1])}")
+            # logger.debug(f"session : {session}")
+            seg.description = merged_description
+            seg.keywords = keywords_list
+            seg.ai_status = "done"
+            seg.status = "ia_done"
+            seg.ai_model = model_name
+            seg.last_updated = datetime.now().isoformat()
+            frame_data[seg.uid] = keywords_list
+
+            session.save(str(state_path))
+            logger.debug(f"💾 Session mise à jour (segment {seg.id})")
+            # logger.debug(f"session : {session}")
+
+            get_memory_manager().after_segment()
+
+        if blocked is not None:
+            logger.error(f"Chemin de segment vide pour le segment {blocked.id}")
+            return {}
+    finally:
+        # Toujours libéré (exception, OOM persistant) : sinon le modèle reste marqué utilisé et n'est jamais déchargé
+        vlm.release()
+    if cache := get_result_cache():
+        logger.info(f"📊 Cache IA : {cache.stats()}")
+    logger.info(f"📊 Mémoire GPU : {get_memory_manager().stats()}")
     logger.info("✅ Analyse complète terminée.")
     return frame_data
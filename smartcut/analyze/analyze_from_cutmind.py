@@ -6,16 +6,16 @@ from cutmind.db.repository import CutMindRepository
 from cutmind.models_cm.db_models import Segment
 from shared.ffmpeg.ffmpeg_utils import get_duration
 from shared.utils.logger import get_logger
-from smartcut.analyze.analyze_batches import process_batches
-from smartcut.analyze.analyze_torch_utils import (
-    release_gpu_memory,
-)
+from smartcut.analyze.adaptive_batch import get_batch_sizer
+from smartcut.analyze.analyze_batches import process_batches, select_frames
+from smartcut.analyze.analyze_torch_utils import get_model_precision
 from smartcut.analyze.analyze_utils import (
     merge_keywords_across_batches,
 )
-from smartcut.analyze.extract_frames import extract_segment_frames
+from smartcut.analyze.extract_frames import iter_session_images
 from smartcut.analyze.prep_analyze import cleanup_temp, open_vid, release_cap
-from smartcut.gen_keywords.load_model import load_and_batches
+from smartcut.gen_keywords.generate_keywords import FRAME_SIZE
+from smartcut.gen_keywords.vlm_service import get_vlm_service
 
 logger = get_logger("SmartCut")
 
@@ -42,50 +42,56 @@ def analyze_from_cutmind(
         raise
     cap, video_name = open_vid(seg.output_path)
 
-    processor, model, model_name, batch_size = load_and_batches()
-
-    start: float = 0.0
-    if seg.duration is None:
-        end: float = get_duration(Path(seg.output_path))
-    else:
-        end = seg.duration
+    vlm = get_vlm_service()
+    processor, model, model_name, batch_size = vlm.acquire()
+    try:
+        sizer = get_batch_sizer(model_name, get_model_precision(model), batch_size)
 
-    logger.info(f"🎬 Analyse segment {seg.id} ({start:.2f}s → {end:.2f}s)")
+        start: float = 0.0
+        if seg.duration is None:
+            end: float = get_duration(Path(seg.output_path))
+        else:
+            end = seg.duration
 
-    frame_paths = extract_segment_frames(cap, video_name, start, end, auto_frames, fps_extract, base_rate)
-    if not frame_paths:
-        logger.warning(f"Aucune frame extraite pour le segment {seg.id}")
-        raise
+        logger.info(f"🎬 Analyse segment {seg.id} ({start:.2f}s → {end:.2f}s)")
 
-    keywords_batches = process_batches(
-        video_name=video_name,
-        start=start,
-        end=end,
-        frame_paths=frame_paths,
-        batch_size=batch_size,
-        processor=processor,
-        model=model,
-    )
-    # Fusion des résultats IA
-    merged_description, keywords_list = merge_keywords_across_batches(keywords_batches)
-    logger.debug(f"🧠 Segment {seg.id} description: {merged_description}")
-    logger.debug(f"🧠 Segment {seg.id} keywords: {keywords_list}")
+        frames_iter = iter_session_images(cap, [(start, end)], auto_frames, fps_extract, base_rate, FRAME_SIZE)
+        frames = select_frames(next((images for _, images in frames_iter), []))
+        if not frames:
+            logger.warning(f"Aucune frame extraite pour le segment {seg.id}")
+            raise
 
-    # --- 💾 Mise à jour du segment
-    logger.debug(f"🔍 seg.id={seg.id} mem_id={id(seg)}")
+        keywords_batches = process_batches(
+            video_name=video_name,
+            start=start,
+            end=end,
+            frames=frames,
+            batch_size=batch_size,
+            processor=processor,
+            model=model,
+            sizer=sizer,
+        )
+        # Fusion des résultats IA
+        merged_description, keywords_list = merge_keywords_across_batches(keywords_batches)
+        logger.debug(f"🧠 Segment {seg.id} description: {merged_description}")
+        logger.debug(f"🧠 Segment {seg.id} keywords: {keywords_list}")
 
-    seg.description = merged_description
-    seg.keywords = keywords_list
-    seg.ai_model = model_name
-    repo.update_segment_validation(seg)
-    if not seg.id:
-        raise
-    repo.insert_keywords_standalone(segment_id=seg.id, keywords=seg.keywords)
+        # --- 💾 Mise à jour du segment
+        logger.debug(f"🔍 seg.id={seg.id} mem_id={id(seg)}")
 
-    logger.debug(f"💾 Session mise à jour (segment {seg.id})")
-    # logger.debug(f"session : {session}")
+        seg.description = merged_description
+        seg.keywords = keywords_list
+        seg.ai_model = model_name
+        repo.update_segment_validation(seg)
+        if not seg.id:
+            raise
+        repo.insert_keywords_standalone(segment_id=seg.id, keywords=seg.keywords)
 
-    release_cap(cap)
-    release_gpu_memory(model)
+        logger.debug(f"💾 Session mise à jour (segment {seg.id})")
+        # logger.debug(f"session : {session}")
+    finally:
+        # Toujours libérés (segment sans frame, OOM persistant) : le modèle résident doit pouvoir être déchargé
+        release_cap(cap)
+        vlm.release()
     logger.info("✅ Analyse complète terminée.")
     return seg.description, seg.keywords
@@ -2,15 +2,16 @@
 
 from __future__ import annotations
 
-import gc
-
 import torch
 from transformers import (
     PreTrainedModel,
+    ProcessorMixin,
 )
 
 from shared.models.config_manager import CONFIG
 from shared.utils.logger import get_logger
+from smartcut.analyze.memory_manager import get_memory_manager
+from smartcut.gen_keywords.token_budget import plan_max_pixels
 
 logger = get_logger("SmartCut")
 
@@ -40,41 +41,50 @@ def get_model_precision(model: torch.nn.Module) -> str:
 
 def vram_gpu() -> tuple[float, float]:
     """
-    Retourne la (VRAM libre, VRAM totale) en Go et logge l'état.
+    Retourne la (VRAM libre, VRAM totale) en Go et logge l'état ; (0, 0) sans CUDA.
     """
-    free_bytes, total_bytes = torch.cuda.mem_get_info()
-    free_gb = free_bytes / 1e9
-    total_gb = total_bytes / 1e9
+    free_gb, total_gb = get_memory_manager().mem_info()
     logger.info(f"VRAM libre: {free_gb:.2f} Go / {total_gb:.2f} Go")
     return free_gb, total_gb
 
 
 def release_gpu_memory(model: PreTrainedModel = None, cache_only: bool = True) -> None:
     """
-    Libère la mémoire GPU :
+    Libère la mémoire GPU immédiatement (no-op sans CUDA) :
 
     - Si cache_only=True : ne décharge pas le modèle, vide uniquement le cache et les tensors temporaires
     - Si cache_only=False : décharge aussi le modèle de la VRAM
+
+    Pendant l'analyse, préférer `get_memory_manager().after_batch()` qui applique la politique de nettoyage.
     """
     if not cache_only and model is not None:
         del model
 
-    gc.collect()
-    torch.cuda.empty_cache()
-    torch.cuda.synchronize()
-
-    free, total = torch.cuda.mem_get_info()
-    logger.info(
-        f"🧹 VRAM nettoyée ({'cache_only' if cache_only else 'full release'}) → "
-        f"VRAM libre : {free / 1e9:.2f} Go / {total / 1e9:.2f} Go"
-    )
-
-
-def estimate_visual_tokens(num_images: int, model_name: str = "qwen3-vl-instruct-4b") -> tuple[int, int]:
+    manager = get_memory_manager()
+    manager.cleanup("cache_only" if cache_only else "full release")
+    if manager.backend.available:
+        free, total = manager.mem_info()
+        logger.info(
+            f"🧹 VRAM nettoyée ({'cache_only' if cache_only else 'full release'}) → "
+            f"VRAM libre : {free:.2f} Go / {total:.2f} Go"
+        )
+
+
+def estimate_visual_tokens(
+    num_images: int,
+    processor: ProcessorMixin | None = None,
+    image_size: tuple[int, int] | None = None,
+) -> tuple[int, int]:
     """
-    Estime le nombre total de tokens (texte + images) et la limite max du modèle.
+    Nombre total de tokens (texte + images) d'un batch et limite max du modèle.
+
+    Avec le processor et la taille des frames : comptage exact au budget de pixels planifié pour ce batch.
+    Sinon : estimation grossière (400 tokens/image + marge texte).
     """
-    tokens = num_images * 400 + 500  # 400 tokens/image + marge texte
     # Qwen3-VL-4B-Instruct-abliterated → 262144 tokens
     limit = LIMIT_TOKENS
+    if processor is not None and image_size is not None:
+        _, tokens = plan_max_pixels(processor, [image_size] * num_images)
+        return tokens, limit
+    tokens = num_images * 400 + 500
     return tokens, limit
@@ -11,8 +11,8 @@ from shared.models.config_manager import CONFIG
 from shared.utils.config import TMP_FRAMES_DIR_SC
 from shared.utils.logger import get_logger
 from smartcut.models_sc.ai_result import AIResult
-from smartcut.models_sc.smartcut_model import SmartCutSession
-from smartcut.norm_keywords.keyword_normalizer import KeywordNormalizer
+from smartcut.models_sc.smartcut_model import Segment, SmartCutSession
+from smartcut.norm_keywords.keyword_normalizer import get_keyword_normalizer
 
 logger = get_logger("SmartCut")
 
@@ -164,19 +164,37 @@ def update_session_keywords(
     end: float,
     keywords_list: list[str],
 ) -> None:
-    for segment in session.segments:
-        if abs(segment.start - start) < 0.01 and abs(segment.end - end) < 0.01:
-            normalizer = KeywordNormalizer(mode="mixed")
-            keywords_norm = normalizer.normalize_keywords(keywords_list)
-
-            logger.info(f"{keywords_list} → {keywords_norm}")
-            segment.keywords = keywords_norm
-            segment.ai_status = "done"
-            SmartCutSession.last_updated = datetime.now().isoformat()
-
-            session.save()
-            logger.debug(
-                f"💾 Sauvegarde JSON : segment {segment.id} "
-                f"({start:.1f}s → {end:.1f}s) [{len(keywords_norm)} mots-clés]"
-            )
-            break
+    update_session_keywords_many(session, [(start, end, keywords_list)])
+
+
+def update_session_keywords_many(
+    session: SmartCutSession,
+    updates: list[tuple[float, float, list[str]]],
+) -> None:
+    """
+    Met à jour les mots-clés de plusieurs segments `(début, fin, mots-clés)` : une seule normalisation groupée pour
+    tous les segments (`normalize_session_keywords`) et une seule sauvegarde de la session.
+    """
+    matched: list[tuple[Segment, list[str]]] = []
+    for start, end, keywords_list in updates:
+        for segment in session.segments:
+            if abs(segment.start - start) < 0.01 and abs(segment.end - end) < 0.01:
+                matched.append((segment, keywords_list))
+                break
+    if not matched:
+        return
+
+    normalizer = get_keyword_normalizer(mode="mixed")
+    normalized = normalizer.normalize_session_keywords([keywords_list for _, keywords_list in matched])
+    for (segment, keywords_list), keywords_norm in zip(matched, normalized, strict=True):
+        logger.info(f"{keywords_list} → {keywords_norm}")
+        segment.keywords = keywords_norm
+        segment.ai_status = "done"
+    SmartCutSession.last_updated = datetime.now().isoformat()
+
+    session.save()
+    for segment, _ in matched:
+        logger.debug(
+            f"💾 Sauvegarde JSON : segment {segment.id} "
+            f"({segment.start:.1f}s → {segment.end:.1f}s) [{len(segment.keywords)} mots-clés]"
+        )
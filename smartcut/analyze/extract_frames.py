@@ -2,26 +2,36 @@
 
 from __future__ import annotations
 
+from collections.abc import Iterator
 import os
+import sys
+import time
 
 import cv2
+import numpy as np
+from PIL import Image
 
 from shared.utils.config import TMP_FRAMES_DIR_SC
 from shared.utils.logger import get_logger
 from smartcut.analyze.analyze_utils import compute_num_frames
+from smartcut.gen_keywords.gen_frames import frames_to_images
 
 logger = get_logger("SmartCut")
 
+# Au-delà de cet écart (en frames) entre deux frames utiles, un seek coûte moins cher que grab() en boucle
+SEEK_GAP_FRAMES = 1500
 
-def extract_segment_frames(
-    cap: cv2.VideoCapture,
-    video_name: str,
+
+def compute_segment_timestamps(
     start: float,
     end: float,
     auto_frames: bool,
     fps_extract: float,
     base_rate: int,
-) -> list[str]:
+) -> list[float]:
+    """
+    Timestamps (s) des frames à extraire pour un segment.
+    """
     seg_duration = end - start
     logger.debug(f"Segment {start:.2f}s → {end:.2f}s | durée : {seg_duration:.2f}s")
 
@@ -29,7 +39,29 @@ def extract_segment_frames(
     num_frames = max(1, num_frames)
     logger.debug(f"Nombre de frames à extraire : {num_frames}")
 
-    timestamps = [start + (seg_duration / num_frames) * i for i in range(num_frames)]
+    return [start + (seg_duration / num_frames) * i for i in range(num_frames)]
+
+
+def _frame_path(video_name: str, start: float, end: float, t: float) -> str:
+    return os.path.join(
+        TMP_FRAMES_DIR_SC,
+        f"{video_name}_seg_{int(start * 10)}_{int(end * 10)}_{int(t * 10)}.jpg",
+    )
+
+
+def extract_segment_frames(
+    cap: cv2.VideoCapture,
+    video_name: str,
+    start: float,
+    end: float,
+    auto_frames: bool,
+    fps_extract: float,
+    base_rate: int,
+) -> list[str]:
+    """
+    Extraction par seek (une recherche par timestamp) — conservée comme référence de benchmark.
+    """
+    timestamps = compute_segment_timestamps(start, end, auto_frames, fps_extract, base_rate)
     frame_paths: list[str] = []
 
     for t in timestamps:
@@ -39,12 +71,141 @@ def extract_segment_frames(
             logger.warning(f"⚠️ Impossible de lire la frame à {t:.2f}s")
             continue
 
-        path = os.path.join(
-            TMP_FRAMES_DIR_SC,
-            f"{video_name}_seg_{int(start * 10)}_{int(end * 10)}_{int(t * 10)}.jpg",
-        )
+        path = _frame_path(video_name, start, end, t)
         cv2.imwrite(path, frame)
         frame_paths.append(path)
 
     logger.info(f"🎞️ Segment {start:.1f}s → {end:.1f}s : {len(frame_paths)} frames extraites.")
     return frame_paths
+
+
+def iter_session_frames(
+    cap: cv2.VideoCapture,
+    segments: list[tuple[float, float]],
+    auto_frames: bool,
+    fps_extract: float,
+    base_rate: int,
+) -> Iterator[tuple[int, list[tuple[float, np.ndarray]]]]:
+    """
+    Parcourt le flux une seule fois, en avant, pour tous les segments d'une session.
+
+    Tous les timestamps sont triés puis atteints par grab() (décodage sans conversion) ; retrieve() n'est appelé que
+    sur les frames utiles. Chaque segment est rendu (index, [(t, frame BGR)]) dès que sa dernière frame est lue, ce qui
+    borne la mémoire à un segment en cours pour des segments chronologiques.
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+    plan: list[tuple[int, int, float]] = []
+    remaining: dict[int, int] = {}
+    for seg_idx, (start, end) in enumerate(segments):
+        timestamps = compute_segment_timestamps(start, end, auto_frames, fps_extract, base_rate)
+        plan.extend((round(t * fps), seg_idx, t) for t in timestamps)
+        remaining[seg_idx] = len(timestamps)
+    plan.sort()
+
+    pending: dict[int, list[tuple[float, np.ndarray]]] = {i: [] for i in remaining}
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    pos = 0  # index de la prochaine frame que grab() va décoder
+    current_idx = -1
+    current_frame: np.ndarray | None = None
+
+    for target, seg_idx, t in plan:
+        if target != current_idx:
+            if target < pos or target - pos > SEEK_GAP_FRAMES:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                pos = target
+            while pos < target and cap.grab():
+                pos += 1
+            current_idx, current_frame = target, None
+            if pos == target and cap.grab():
+                pos += 1
+                ok, frame = cap.retrieve()
+                current_frame = frame if ok else None
+
+        if current_frame is None:
+            logger.warning(f"⚠️ Impossible de lire la frame à {t:.2f}s")
+        else:
+            pending[seg_idx].append((t, current_frame))
+
+        remaining[seg_idx] -= 1
+        if remaining[seg_idx] == 0:
+            yield seg_idx, pending.pop(seg_idx)
+
+
+def extract_session_frames(
+    cap: cv2.VideoCapture,
+    video_name: str,
+    segments: list[tuple[float, float]],
+    auto_frames: bool,
+    fps_extract: float,
+    base_rate: int,
+) -> Iterator[tuple[int, list[str]]]:
+    """
+    Extraction séquentielle (une seule passe) pour toute la session ; rend (index segment, chemins JPEG).
+    """
+    for seg_idx, frames in iter_session_frames(cap, segments, auto_frames, fps_extract, base_rate):
+        start, end = segments[seg_idx]
+        frame_paths: list[str] = []
+        for t, frame in frames:
+            path = _frame_path(video_name, start, end, t)
+            cv2.imwrite(path, frame)
+            frame_paths.append(path)
+        logger.info(f"🎞️ Segment {start:.1f}s → {end:.1f}s : {len(frame_paths)} frames extraites.")
+        yield seg_idx, frame_paths
+
+
+def iter_session_images(
+    cap: cv2.VideoCapture,
+    segments: list[tuple[float, float]],
+    auto_frames: bool,
+    fps_extract: float,
+    base_rate: int,
+    size: tuple[int, int] | None = None,
+) -> Iterator[tuple[int, list[Image.Image]]]:
+    """
+    Extraction séquentielle en mémoire : rend (index segment, images PIL RGB redimensionnées), sans écriture disque.
+    """
+    for seg_idx, frames in iter_session_frames(cap, segments, auto_frames, fps_extract, base_rate):
+        start, end = segments[seg_idx]
+        images = frames_to_images([frame for _, frame in frames], size=size)
+        logger.info(f"🎞️ Segment {start:.1f}s → {end:.1f}s : {len(images)} frames extraites (mémoire).")
+        yield seg_idx, images
+
+
+def benchmark_extractors(video_path: str, segments: list[tuple[float, float]], base_rate: int = 5) -> dict[str, float]:
+    """
+    Compare l'extraction par seek et l'extraction séquentielle sur les mêmes segments (durée en secondes).
+    """
+    os.makedirs(TMP_FRAMES_DIR_SC, exist_ok=True)
+    results: dict[str, float] = {}
+
+    cap = cv2.VideoCapture(video_path)
+    t0 = time.perf_counter()
+    for start, end in segments:
+        extract_segment_frames(cap, "bench_seek", start, end, True, 1.0, base_rate)
+    results["seek"] = time.perf_counter() - t0
+    cap.release()
+
+    cap = cv2.VideoCapture(video_path)
+    t0 = time.perf_counter()
+    for _ in extract_session_frames(cap, "bench_seq", segments, True, 1.0, base_rate):
+        pass
+    results["sequential"] = time.perf_counter() - t0
+    cap.release()
+
+    logger.info(
+        f"⏱️ Extraction seek : {results['seek']:.2f}s | séquentielle : {results['sequential']:.2f}s "
+        f"(x{results['seek'] / max(results['sequential'], 1e-9):.2f})"
+    )
+    return results
+
+
+if __name__ == "__main__":
+    # Usage : python -m smartcut.analyze.extract_frames video.mp4 [durée_segment_s]
+    path = sys.argv[1]
+    seg_len = float(sys.argv[2]) if len(sys.argv) > 2 else 60.0
+    probe = cv2.VideoCapture(path)
+    total = probe.get(cv2.CAP_PROP_FRAME_COUNT) / (probe.get(cv2.CAP_PROP_FPS) or 25.0)
+    probe.release()
+    bench_segments = [(float(s), min(float(s) + seg_len, total)) for s in np.arange(0.0, total, seg_len)]
+    benchmark_extractors(path, bench_segments)  # durées journalisées par benchmark_extractors
@@ -0,0 +1,149 @@
+"""
+Extraction des frames d'analyse en une seule commande ffmpeg — alternative au lecteur OpenCV.
+
+Toutes les frames utiles de la session sont choisies par un filtre `select` (liste d'index), réduites à la taille
+cible par `scale`, puis envoyées en rawvideo RGB via un pipe et lues directement dans des buffers NumPy. Décodage et
+redimensionnement tournent dans les threads natifs de ffmpeg : aucune frame pleine résolution n'atteint Python.
+
+Un échec de ffmpeg (code retour non nul, flux tronqué) lève `FFmpegFramesError` : aucun segment incomplet n'est rendu,
+l'appelant peut reprendre les segments restants avec le lecteur OpenCV.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+import os
+from pathlib import Path
+import subprocess
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from shared.ffmpeg.ffmpeg_utils import get_fps
+from shared.utils.logger import get_logger
+from smartcut.analyze.extract_frames import compute_segment_timestamps
+
+logger = get_logger("SmartCut")
+
+
+class FFmpegFramesError(RuntimeError):
+    """
+    ffmpeg n'a pas rendu toutes les frames demandées.
+    """
+
+
+def _select_expr(frame_indices: list[int]) -> str:
+    """
+    Arbre de recherche binaire `if(lt(n, pivot), gauche, droite)` sur les index triés : O(log N) comparaisons par frame
+    décodée au lieu d'une somme de N `eq(n, i)`.
+    """
+    if len(frame_indices) == 1:
+        return f"eq(n\\,{frame_indices[0]})"
+    mid = len(frame_indices) // 2
+    left, right = _select_expr(frame_indices[:mid]), _select_expr(frame_indices[mid:])
+    return f"if(lt(n\\,{frame_indices[mid]})\\,{left}\\,{right})"
+
+
+def _select_filter(frame_indices: list[int]) -> str:
+    """
+    Filtre `select` retenant exactement les index donnés (triés, relatifs au point de seek).
+    """
+    return f"select='{_select_expr(frame_indices)}'"
+
+
+def iter_session_images_ffmpeg(
+    video_path: str,
+    segments: list[tuple[float, float]],
+    auto_frames: bool,
+    fps_extract: float,
+    base_rate: int,
+    size: tuple[int, int],
+) -> Iterator[tuple[int, list[Image.Image]]]:
+    """
+    Une seule passe ffmpeg pour tous les segments ; rend (index segment, images PIL RGB à `size` (largeur, hauteur)).
+
+    Comme `iter_session_frames`, chaque segment est rendu dès que sa dernière frame est lue. Lève `FFmpegFramesError`
+    si ffmpeg échoue ou rend moins de frames que prévu (les segments déjà rendus restent valides).
+    """
+    fps = get_fps(Path(video_path))
+    if fps <= 0:
+        raise ValueError(f"FPS introuvable pour {video_path}")
+    width, height = size
+    frame_size = width * height * 3
+
+    plan: list[tuple[int, int, float]] = []
+    remaining: dict[int, int] = {}
+    for seg_idx, (start, end) in enumerate(segments):
+        timestamps = compute_segment_timestamps(start, end, auto_frames, fps_extract, base_rate)
+        plan.extend((round(t * fps), seg_idx, t) for t in timestamps)
+        remaining[seg_idx] = len(timestamps)
+    plan.sort()
+    if not plan:
+        return
+
+    # Seek (précis) jusqu'à la première frame utile : `n` repart de 0 à ce point
+    seek_frame = plan[0][0]
+    targets = sorted({target for target, _, _ in plan})
+    select = _select_filter([target - seek_frame for target in targets])
+
+    # Le filtre peut dépasser la limite d'un argument de ligne de commande → script de filtre temporaire
+    with tempfile.NamedTemporaryFile("w", suffix=".ffilter", delete=False, encoding="utf-8") as script:
+        script.write(f"{select},scale={width}:{height}:flags=area,format=rgb24")
+        script_path = script.name
+
+    cmd: list[str] = ["ffmpeg", "-v", "error", "-nostdin"]
+    if seek_frame:
+        cmd += ["-ss", f"{seek_frame / fps:.6f}"]
+    cmd += [
+        "-i",
+        str(video_path),
+        "-an",
+        "-filter_script:v",
+        script_path,
+        "-frames:v",
+        str(len(targets)),
+        "-vsync",
+        "0",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "pipe:1",
+    ]
+
+    pending: dict[int, list[Image.Image]] = {i: [] for i in remaining}
+    plan_pos = 0
+    received = 0
+    try:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+            assert proc.stdout is not None
+            for target in targets:
+                raw = proc.stdout.read(frame_size)
+                if len(raw) != frame_size:
+                    break
+                received += 1
+                image = Image.fromarray(np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 3))
+
+                # Une même frame peut servir plusieurs timestamps (segments courts / fps faible)
+                while plan_pos < len(plan) and plan[plan_pos][0] == target:
+                    _, seg_idx, _ = plan[plan_pos]
+                    plan_pos += 1
+                    pending[seg_idx].append(image)
+                    remaining[seg_idx] -= 1
+                    if remaining[seg_idx] == 0:
+                        start, end = segments[seg_idx]
+                        images = pending.pop(seg_idx)
+                        logger.info(f"🎞️ Segment {start:.1f}s → {end:.1f}s : {len(images)} frames extraites (ffmpeg).")
+                        yield seg_idx, images
+            _, stderr = proc.communicate()
+    finally:
+        os.unlink(script_path)
+
+    if proc.returncode != 0 or received != len(targets):
+        details = stderr.decode(errors="ignore").strip()
+        logger.error(
+            f"❌ ffmpeg (frames) a échoué sur {video_path} (code {proc.returncode}, "
+            f"{received}/{len(targets)} frames) : {details}"
+        )
+        raise FFmpegFramesError(f"ffmpeg a rendu {received}/{len(targets)} frames pour {video_path}")
@@ -0,0 +1,174 @@
+"""
+Gestion centralisée du nettoyage mémoire GPU pendant l'analyse.
+
+`gc.collect()`, `empty_cache()` et `synchronize()` bloquent le pipeline : ils ne sont plus appelés après chaque batch
+mais selon une politique (`analyse_segment.memory_policy`) :
+
+- `"never"` : aucun nettoyage pendant l'analyse (seulement sur OOM et au déchargement du modèle) ;
+- `"on_pressure"` : nettoyage quand la VRAM libre passe sous `memory_pressure_gb` (défaut) ;
+- `"every_n"` : nettoyage tous les `memory_cleanup_every` batches.
+
+Sans CUDA, le backend est un no-op : aucune lecture de `mem_get_info`, aucun nettoyage. Le temps passé en contrôles
+et en nettoyages est compté et résumé en fin d'analyse.
+"""
+
+from __future__ import annotations
+
+import gc
+import threading
+import time
+
+import torch
+
+from shared.models.config_manager import CONFIG
+from shared.utils.logger import get_logger
+
+logger = get_logger("SmartCut")
+
+MEMORY_POLICY: str = CONFIG.smartcut["analyse_segment"].get("memory_policy", "on_pressure")
+MEMORY_PRESSURE_GB: float = CONFIG.smartcut["analyse_segment"].get("memory_pressure_gb", 2.0)
+MEMORY_CLEANUP_EVERY: int = CONFIG.smartcut["analyse_segment"].get("memory_cleanup_every", 10)
+
+POLICIES = ("never", "on_pressure", "every_n")
+
+
+class NullMemoryBackend:
+    """
+    Backend CPU : pas de VRAM à surveiller ni à libérer.
+    """
+
+    available = False
+
+    def mem_info(self) -> tuple[float, float]:
+        return 0.0, 0.0
+
+    def cleanup(self) -> None:
+        return None
+
+
+class CudaMemoryBackend:
+    """
+    Backend CUDA : VRAM (libre, totale) en Go et nettoyage du cache de l'allocateur.
+    """
+
+    available = True
+
+    def mem_info(self) -> tuple[float, float]:
+        free_bytes, total_bytes = torch.cuda.mem_get_info()
+        return free_bytes / 1e9, total_bytes / 1e9
+
+    def cleanup(self) -> None:
+        gc.collect()
+        torch.cuda.empty_cache()
+        torch.cuda.synchronize()
+
+
+MemoryBackend = NullMemoryBackend | CudaMemoryBackend
+
+
+def default_backend() -> MemoryBackend:
+    return CudaMemoryBackend() if torch.cuda.is_available() else NullMemoryBackend()
+
+
+class MemoryManager:
+    """
+    Décide quand nettoyer la mémoire GPU et compte le temps passé à le faire.
+    """
+
+    def __init__(
+        self,
+        policy: str = MEMORY_POLICY,
+        backend: MemoryBackend | None = None,
+        pressure_gb: float = MEMORY_PRESSURE_GB,
+        every: int = MEMORY_CLEANUP_EVERY,
+    ) -> None:
+        if policy not in POLICIES:
+            logger.warning(f"⚠️ Politique mémoire inconnue '{policy}', utilisation de 'on_pressure'.")
+            policy = "on_pressure"
+        self.policy = policy
+        self.backend = backend or default_backend()
+        self.pressure_gb = pressure_gb
+        self.every = max(1, every)
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.checks = 0
+        self.cleanups = 0
+        self.check_time = 0.0
+        self.cleanup_time = 0.0
+
+    def mem_info(self) -> tuple[float, float]:
+        """
+        (VRAM libre, VRAM totale) en Go ; (0, 0) sans CUDA.
+        """
+        if not self.backend.available:
+            return 0.0, 0.0
+        start = time.perf_counter()
+        info = self.backend.mem_info()
+        with self._lock:
+            self.checks += 1
+            self.check_time += time.perf_counter() - start
+        return info
+
+    def cleanup(self, reason: str = "") -> None:
+        """
+        Nettoyage immédiat (gc + cache allocateur), quelle que soit la politique.
+        """
+        if not self.backend.available:
+            return
+        start = time.perf_counter()
+        self.backend.cleanup()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.cleanups += 1
+            self.cleanup_time += elapsed
+        free, total = self.backend.mem_info()
+        logger.debug(f"🧹 VRAM nettoyée ({reason}) en {elapsed * 1000:.0f} ms → {free:.2f} Go / {total:.2f} Go")
+
+    def after_batch(self) -> None:
+        """
+        Fin d'un batch de génération : nettoie si la politique le demande.
+        """
+        with self._lock:
+            self.batches += 1
+            batches = self.batches
+        if not self.backend.available or self.policy == "never":
+            return
+        if self.policy == "every_n":
+            if batches % self.every == 0:
+                self.cleanup(f"tous les {self.every} batches")
+            return
+        free, _ = self.mem_info()
+        if free < self.pressure_gb:
+            self.cleanup(f"pression : {free:.2f} Go libres < {self.pressure_gb:.2f} Go")
+
+    def after_segment(self) -> None:
+        """
+        Fin d'un segment : simple relevé de la VRAM (log debug), sans nettoyage.
+        """
+        if self.backend.available:
+            free, total = self.mem_info()
+            logger.debug(f"VRAM libre: {free:.2f} Go / {total:.2f} Go")
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "checks": self.checks,
+            "cleanups": self.cleanups,
+            "check_time_s": round(self.check_time, 3),
+            "cleanup_time_s": round(self.cleanup_time, 3),
+        }
+
+
+_MANAGER: MemoryManager | None = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_memory_manager() -> MemoryManager:
+    """
+    Gestionnaire mémoire partagé du processus.
+    """
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = MemoryManager()
+        return _MANAGER
@@ -0,0 +1,157 @@
+"""
+Génération packée inter-segments.
+
+Plusieurs batches de frames, issus de segments consécutifs, sont regroupés en un seul appel
+`processor(text=[...], images=[...])` (une ligne par batch, padding à gauche) puis générés ensemble. Les réponses
+sont redistribuées à leur segment d'origine ; un segment est rendu dès que tous ses batches sont générés, dans
+l'ordre d'arrivée, pour que les sauvegardes de session restent séquentielles.
+
+La taille d'un pack est bornée par un budget de tokens *paddé* (lignes × ligne la plus longue) et un nombre maximal
+de lignes.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+from PIL import Image
+from transformers import BatchFeature, PreTrainedModel, ProcessorMixin
+
+from shared.utils.logger import get_logger
+from smartcut.analyze.adaptive_batch import clear_after_oom, is_oom_error
+from smartcut.analyze.analyze_batches import KeywordsBatches, parse_batch_result, sampling_fps, split_batches
+from smartcut.analyze.analyze_torch_utils import estimate_visual_tokens
+from smartcut.analyze.memory_manager import get_memory_manager
+from smartcut.analyze.prefetch import PreparedSegment
+from smartcut.gen_keywords.generate_keywords import generate_packed_from_inputs, prepare_packed_inputs
+from smartcut.gen_keywords.main_gen_keywords import model_name, result_key
+from smartcut.gen_keywords.result_cache import get_result_cache
+from smartcut.models_sc.ai_result import AIResult
+from smartcut.models_sc.smartcut_model import Segment
+
+logger = get_logger("SmartCut")
+
+
+@dataclass
+class _PendingSegment:
+    segment: Segment
+    video_name: str
+    segment_id: str
+    fps: float | None = None
+    results: list[AIResult | None] = field(default_factory=list)
+
+    @property
+    def done(self) -> bool:
+        return all(r is not None for r in self.results)
+
+
+@dataclass
+class _Unit:
+    owner: _PendingSegment
+    index: int
+    images: list[Image.Image]
+    tokens: int
+
+
+def _pack_size(units: deque[_Unit], token_budget: int, max_rows: int) -> int:
+    """
+    Nombre d'unités de tête qui tiennent dans le budget paddé (au moins une).
+    """
+    longest = 0
+    for n, unit in enumerate(units, start=1):
+        longest = max(longest, unit.tokens)
+        if n > max_rows or n * longest > token_budget:
+            return max(1, n - 1)
+    return len(units)
+
+
+def iter_packed_results(
+    prepared_iter: Iterator[PreparedSegment],
+    processor: ProcessorMixin,
+    model: PreTrainedModel,
+    batch_size: int,
+    token_budget: int = 0,
+    max_rows: int = 8,
+) -> Iterator[tuple[Segment, str, KeywordsBatches]]:
+    """
+    Rend (segment, nom vidéo, résultats par batch) dans l'ordre des segments, la génération étant packée.
+
+    token_budget <= 0 : budget d'un batch plein (`estimate_visual_tokens(batch_size)`, calculé à la première frame).
+    """
+
+    order: deque[_PendingSegment] = deque()
+    units: deque[_Unit] = deque()
+
+    cache = get_result_cache()
+
+    def run_pack(n: int) -> None:
+        pack = [units.popleft() for _ in range(n)]
+        if cache:
+            keys = {id(u): result_key(u.images, model) for u in pack}
+            for unit in pack:
+                if (cached := cache.get(keys[id(unit)])) is not None:
+                    unit.owner.results[unit.index] = parse_batch_result(cached)
+            pack = [u for u in pack if u.owner.results[u.index] is None]
+            if not pack:
+                return
+        padded = len(pack) * max(u.tokens for u in pack)
+        logger.info(
+            f"📦 Pack de {len(pack)} batches ({len({id(u.owner) for u in pack})} segments) → "
+            f"{sum(len(u.images) for u in pack)} frames | {padded:,} / {token_budget:,} tokens paddés"
+        )
+        oom = False
+        inputs: BatchFeature | None = None
+        try:
+            # Mode vidéo : une seule cadence par appel processor, celle du premier segment du pack
+            inputs = prepare_packed_inputs([u.images for u in pack], processor, fps=pack[0].owner.fps)
+            raw_results = generate_packed_from_inputs(inputs, processor, model, [u.owner.segment_id for u in pack])
+        except Exception as exc:
+            if not is_oom_error(exc) or len(pack) == 1:
+                raise
+            oom = True
+        if oom:
+            # OOM : le pack est rejoué en deux moitiés (modèle conservé), hors du `except` pour que la trace et les
+            # activations qu'elle retient soient libérées avant le nettoyage
+            inputs = None
+            clear_after_oom()
+            half = len(pack) // 2
+            logger.warning(f"💥 OOM sur un pack de {len(pack)} lignes → deux packs de {half} / {len(pack) - half}")
+            units.extendleft(reversed(pack))
+            run_pack(half)
+            run_pack(len(pack) - half)
+            return
+        for unit, raw in zip(pack, raw_results, strict=False):
+            unit.owner.results[unit.index] = parse_batch_result(raw)
+            if cache:
+                cache.put(keys[id(unit)], raw, model_name=model_name(model))
+        get_memory_manager().after_batch()
+
+    def completed() -> Iterator[tuple[Segment, str, KeywordsBatches]]:
+        while order and order[0].done:
+            pending = order.popleft()
+            yield pending.segment, pending.video_name, [r for r in pending.results if r is not None]
+
+    for prepared in prepared_iter:
+        seg = prepared.segment
+        pending = _PendingSegment(
+            seg, prepared.video_name, f"{prepared.video_name}_seg_{int(seg.start * 10)}_{int(seg.end * 10)}"
+        )
+        pending.fps = sampling_fps(len(prepared.frames), seg.start, seg.end)
+        batches = split_batches(prepared.frames, batch_size)
+        pending.results = [None] * len(batches)
+        order.append(pending)
+        for b, images in enumerate(batches):
+            if token_budget <= 0:
+                token_budget, _ = estimate_visual_tokens(batch_size, processor, images[0].size)
+            units.append(_Unit(pending, b, images, estimate_visual_tokens(len(images), processor, images[0].size)[0]))
+
+        # Un pack n'est lancé que lorsqu'il est plein : les unités suivantes ne pourraient plus y entrer
+        while units and (n := _pack_size(units, token_budget, max_rows)) < len(units):
+            run_pack(n)
+        yield from completed()
+
+    while units:
+        run_pack(_pack_size(units, token_budget, max_rows))
+    yield from completed()
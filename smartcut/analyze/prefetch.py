@@ -0,0 +1,117 @@
+"""
+Préfetch producteur/consommateur pour l'étape IA.
+
+Un thread de décodage extrait les frames du segment N+1 et prépare les tensors du processor pendant que le segment N
+est en génération sur le GPU. La file est bornée : au plus `depth` segments préparés attendent en mémoire. Les
+segments sortent dans l'ordre d'extraction, donc les sauvegardes de session gardent leur ordre habituel.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+import queue
+import threading
+
+from PIL import Image
+from transformers import BatchFeature, PreTrainedModel, ProcessorMixin
+
+from shared.utils.logger import get_logger
+from smartcut.analyze.analyze_batches import sampling_fps, split_batches
+from smartcut.gen_keywords.generate_keywords import prepare_inputs
+from smartcut.gen_keywords.main_gen_keywords import result_key
+from smartcut.gen_keywords.result_cache import get_result_cache
+from smartcut.models_sc.smartcut_model import Segment
+
+logger = get_logger("SmartCut")
+
+_DONE = object()
+
+
+@dataclass
+class PreparedSegment:
+    """
+    Segment prêt pour la génération : frames et entrées du processor (une par batch, None si la réponse est en cache).
+    """
+
+    segment: Segment
+    video_name: str
+    frames: list[Image.Image]
+    inputs: list[BatchFeature | None] = field(default_factory=list)
+    batch_size: int = 0  # découpage utilisé pour préparer `inputs`
+
+
+def prefetch_segments(
+    frames_iter: Iterator[tuple[Segment, str, list[Image.Image]]],
+    processor: ProcessorMixin | None,
+    batch_size: int | Callable[[], int],
+    depth: int = 1,
+    model: PreTrainedModel | None = None,
+) -> Iterator[PreparedSegment]:
+    """
+    Consomme `frames_iter` dans un thread dédié et rend les segments préparés dans l'ordre.
+
+    processor=None : seules les frames sont préfetchées (les entrées sont construites plus tard, ex. mode packé).
+    batch_size peut être une fonction : la taille courante (adaptative) est lue au moment de la préparation.
+    depth <= 0 : pas de thread, préparation synchrone (comportement historique).
+    model : avec le cache de résultats actif, les batches dont la réponse est déjà en cache ne passent pas par le
+    processor (entrée None).
+    Une exception du thread de décodage est relancée dans le thread appelant.
+    """
+    cache = get_result_cache() if model is not None else None
+
+    def cached(batch: list[Image.Image]) -> bool:
+        return cache is not None and model is not None and cache.contains(result_key(batch, model))
+
+    def prepare(seg: Segment, video_name: str, frames: list[Image.Image]) -> PreparedSegment:
+        if processor is None or not frames:
+            return PreparedSegment(seg, video_name, frames)
+        size = batch_size() if callable(batch_size) else batch_size
+        fps = sampling_fps(len(frames), seg.start, seg.end)
+        batches = split_batches(frames, size)
+        # Réponse déjà en cache : generate_keywords_for_segment la relit, le processor est inutile
+        inputs = [None if cached(batch) else prepare_inputs(batch, processor, fps=fps) for batch in batches]
+        return PreparedSegment(seg, video_name, frames, inputs, size)
+
+    if depth <= 0:
+        for seg, video_name, frames in frames_iter:
+            yield prepare(seg, video_name, frames)
+        return
+
+    buffer: queue.Queue[object] = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item: object) -> bool:
+        # put() bloquant mais interruptible si le consommateur abandonne
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker() -> None:
+        try:
+            for seg, video_name, frames in frames_iter:
+                if not put(prepare(seg, video_name, frames)):
+                    return
+            put(_DONE)
+        except BaseException as exc:  # pylint: disable=broad-except
+            put(exc)
+
+    thread = threading.Thread(target=worker, name="smartcut-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                logger.error(f"💥 Erreur dans le thread de préfetch : {item}")
+                raise item
+            assert isinstance(item, PreparedSegment)
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,233 @@
+"""
+Service d'embeddings de texte résident (singleton du processus).
+
+Un seul `SentenceTransformer` par nom de modèle, quel que soit le nombre d'appelants (score de confiance,
+normalisation des mots-clés) :
+
+- registre par nom de modèle, chargement paresseux au premier `encode` ;
+- micro-batching : les requêtes concurrentes sont regroupées par un thread de travail en un seul `model.encode`
+  (tout ce qui est arrivé pendant l'encodage précédent part dans le suivant, attente optionnelle `max_wait_ms`) ;
+- chemin CPU : nombre de threads torch configurable, backend ONNX optionnel (`cpu_backend: onnx`, repli sur torch),
+  sorties numpy sans passage par des tensors.
+
+Configuration : section `embedding_service` de smartcut.yaml.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import queue
+import threading
+import time
+from typing import Any, cast
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+import torch
+
+from shared.models.config_manager import CONFIG
+from shared.utils.logger import get_logger
+
+logger = get_logger("SmartCut")
+
+_SERVICE_CONFIG: dict[str, Any] = CONFIG.smartcut.get("embedding_service", {})
+MAX_BATCH: int = _SERVICE_CONFIG.get("max_batch", 256)
+MAX_WAIT_MS: float = _SERVICE_CONFIG.get("max_wait_ms", 0)
+CPU_THREADS: int = _SERVICE_CONFIG.get("cpu_threads", 0)
+CPU_BACKEND: str = _SERVICE_CONFIG.get("cpu_backend", "torch")
+
+
+@dataclass
+class _Request:
+    texts: list[str]
+    normalize: bool
+    batch_size: int
+    done: threading.Event = field(default_factory=threading.Event)
+    result: np.ndarray | None = None
+    error: BaseException | None = None
+
+
+class SharedEncoder:
+    """
+    Modèle d'embeddings partagé ; `encode` a la même forme que `SentenceTransformer.encode` (sortie numpy).
+    """
+
+    def __init__(self, model_name: str, device: str | None = None) -> None:
+        self.model_name = model_name
+        self.device = device
+        self._model: SentenceTransformer | None = None
+        self._load_lock = threading.Lock()
+        self._queue: queue.Queue[_Request] = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._worker_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+
+    @property
+    def model(self) -> SentenceTransformer:
+        with self._load_lock:
+            if self._model is None:
+                self._model = self._load()
+            return self._model
+
+    def load(self) -> None:
+        """
+        Charge le modèle tout de suite (sinon au premier `encode`) ; une erreur de chargement remonte ici.
+        """
+        _ = self.model
+
+    def request_device(self, device: str) -> None:
+        """
+        Device demandé par un autre appelant : appliqué si le modèle n'est pas encore chargé, sinon signalé.
+        """
+        with self._load_lock:
+            if self._model is None:
+                self.device = device
+            elif device != self.device:
+                logger.warning(
+                    f"⚠️ {self.model_name} déjà chargé sur {str(self.device).upper()} : device {device} ignoré"
+                )
+
+    def _load(self) -> SentenceTransformer:
+        device = self.device or ("cuda" if torch.cuda.is_available() else "cpu")
+        start = time.time()
+        model: SentenceTransformer | None = None
+        if device == "cpu":
+            if CPU_THREADS > 0:
+                torch.set_num_threads(CPU_THREADS)
+            if CPU_BACKEND == "onnx":
+                try:
+                    model = SentenceTransformer(self.model_name, device=device, backend="onnx")
+                except Exception as e:
+                    logger.warning(f"⚠️ Backend ONNX indisponible pour {self.model_name}, repli sur torch : {e}")
+        if model is None:
+            model = SentenceTransformer(self.model_name, device=device)
+        model.eval()
+        self.device = device
+        elapsed = time.time() - start
+        logger.info(f"✅ Modèle d'embeddings {self.model_name} chargé sur {device.upper()} en {elapsed:.1f}s")
+        return model
+
+    def encode(
+        self,
+        sentences: str | list[str],
+        batch_size: int = 64,
+        normalize_embeddings: bool = False,
+        **_: Any,
+    ) -> np.ndarray:
+        """
+        Embeddings float32 des textes (une ligne par texte ; un vecteur si `sentences` est une chaîne).
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        request = _Request(texts, normalize_embeddings, batch_size)
+        self._ensure_worker()
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        result = cast(np.ndarray, request.result)
+        return result[0] if single else result
+
+    def _ensure_worker(self) -> None:
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"embed-{self.model_name}", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> list[_Request]:
+        """
+        Première requête en attente (bloquant) puis toutes celles déjà arrivées, jusqu'à MAX_BATCH textes.
+        """
+        pending = [self._queue.get()]
+        count = len(pending[0].texts)
+        deadline = time.monotonic() + MAX_WAIT_MS / 1000
+        while count < MAX_BATCH:
+            timeout = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            pending.append(request)
+            count += len(request.texts)
+        return pending
+
+    def _run(self) -> None:
+        while True:
+            pending = self._collect()
+            for normalize in (False, True):
+                group = [r for r in pending if r.normalize == normalize]
+                if group:
+                    self._encode_group(group, normalize)
+
+    def _encode_group(self, group: list[_Request], normalize: bool) -> None:
+        texts = [t for r in group for t in r.texts]
+        try:
+            with torch.inference_mode():
+                vectors = self.model.encode(
+                    texts,
+                    batch_size=max(r.batch_size for r in group),
+                    convert_to_numpy=True,
+                    normalize_embeddings=normalize,
+                    show_progress_bar=False,
+                )
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        except BaseException as e:  # remonté à chaque appelant
+            for r in group:
+                r.error = e
+                r.done.set()
+            return
+
+        self.requests += len(group)
+        self.batches += 1
+        offset = 0
+        for r in group:
+            r.result = vectors[offset : offset + len(r.texts)]
+            offset += len(r.texts)
+            r.done.set()
+
+
+class EmbeddingService:
+    """
+    Registre des modèles d'embeddings du processus, par nom de modèle.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._encoders: dict[str, SharedEncoder] = {}
+
+    def get(self, model_name: str, device: str | None = None) -> SharedEncoder:
+        """
+        Encodeur partagé de `model_name` (non chargé tant qu'aucun texte n'est encodé).
+
+        `device` (None : CUDA si disponible, sinon CPU) s'applique tant que le modèle n'est pas chargé, même si un
+        autre appelant a déjà enregistré le même modèle ; une fois chargé, le device est conservé.
+        """
+        with self._lock:
+            encoder = self._encoders.get(model_name)
+            if encoder is None:
+                encoder = self._encoders[model_name] = SharedEncoder(model_name, device)
+            elif device is not None:
+                encoder.request_device(device)
+            return encoder
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {name: {"requests": e.requests, "batches": e.batches} for name, e in self._encoders.items()}
+
+
+_SERVICE: EmbeddingService | None = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """
+    Service d'embeddings partagé du processus (créé au premier appel).
+    """
+    global _SERVICE
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            _SERVICE = EmbeddingService()
+        return _SERVICE
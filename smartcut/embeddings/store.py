@@ -0,0 +1,362 @@
+"""
+Cache disque persistant des embeddings de texte, partagé par tous les modèles SentenceTransformer du projet.
+
+Clé : (nom du modèle, SHA-1 du texte). Un répertoire par modèle dans `EMBEDDING_CACHE_DIR_SC` :
+
+- `vectors.<génération>.f16` : vecteurs float16 bout à bout (lus par `np.memmap`) ; la ligne `i` est écrite à
+  l'octet `i × dim × 2`, où `i` vient de l'index et non de la taille du fichier (les octets orphelins d'une écriture
+  interrompue sont écrasés puis tronqués) ;
+- `index.json` : instantané `{"dim", "generation", "checkpoint", "rows", "entries": {hash: [ligne, dernier_accès]}}`,
+  remplacé atomiquement ;
+- `journal.<checkpoint>.jsonl` : ajouts depuis l'instantané, une ligne `[hash, ligne, dernier_accès]` par entrée
+  nouvelle ou date d'accès mise à jour. L'instantané n'est réécrit que lorsque le journal dépasse la taille de
+  l'index (coût amorti constant par écriture) ou à la compaction ;
+- `lock` : verrou inter-processus des écrivains (`fcntl.flock`).
+
+Les lecteurs ne prennent aucun verrou : une ligne est écrite dans le fichier de vecteurs avant d'apparaître dans le
+journal, une ligne de journal incomplète est ignorée, et l'éviction (LRU par taille, au-delà de `max_mb`) écrit une
+nouvelle génération compactée au lieu de réécrire les lignes existantes. Les dates d'accès des lectures sont
+journalisées à la prochaine écriture.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+import threading
+import time
+from typing import Any, Protocol
+
+import numpy as np
+
+from shared.models.config_manager import CONFIG
+from shared.utils.config import EMBEDDING_CACHE_DIR_SC
+from shared.utils.logger import get_logger
+
+logger = get_logger("SmartCut")
+
+EMBEDDING_CACHE: bool = CONFIG.smartcut.get("embedding_cache", {}).get("enabled", True)
+EMBEDDING_CACHE_MAX_MB: float = CONFIG.smartcut.get("embedding_cache", {}).get("max_mb", 256)
+EVICT_TO_RATIO = 0.8  # après éviction, le cache redescend à 80 % de max_mb
+JOURNAL_MIN_RECORDS = 1024  # le journal peut toujours contenir au moins autant de lignes avant un instantané
+
+
+class TextEncoder(Protocol):
+    def encode(self, sentences: list[str], **kwargs: Any) -> Any: ...
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def model_slug(model_name: str) -> str:
+    """
+    Nom de répertoire sûr et unique pour un modèle (`BAAI/bge-m3` → `BAAI_bge-m3-<hash>`).
+    """
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)[-60:]
+    return f"{safe}-{hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:8]}"
+
+
+class EmbeddingStore:
+    """
+    Embeddings float16 d'un modèle, en memmap, avec index JSON et éviction LRU par taille.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        root: Path = EMBEDDING_CACHE_DIR_SC,
+        max_bytes: int = int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024),
+    ) -> None:
+        self.model_name = model_name
+        self.dir = Path(root) / model_slug(model_name)
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._index: dict[str, Any] = {"dim": 0, "generation": 0, "checkpoint": 0, "rows": 0, "entries": {}}
+        self._index_stamp: tuple[int, int] | None = None  # (mtime, inode) de l'instantané chargé
+        self._journal_offset = 0  # octets du journal déjà appliqués (lignes complètes)
+        self._journal_records = 0
+        self._vectors: np.memmap | None = None
+        self._mapped: tuple[int, int] = (-1, 0)  # (génération, lignes) du memmap courant
+        self._accessed: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # -------------------- Fichiers -------------------- #
+
+    @property
+    def _index_path(self) -> Path:
+        return self.dir / "index.json"
+
+    def _vectors_path(self, generation: int) -> Path:
+        return self.dir / f"vectors.{generation}.f16"
+
+    def _journal_path(self, checkpoint: int) -> Path:
+        return self.dir / f"journal.{checkpoint}.jsonl"
+
+    @contextlib.contextmanager
+    def _writer_lock(self) -> Iterator[None]:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / "lock", "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """
+        Recharge l'instantané s'il a été remplacé (par ce processus ou un autre), puis applique la fin du journal.
+        """
+        try:
+            stat = self._index_path.stat()
+        except FileNotFoundError:
+            return
+        stamp = (stat.st_mtime_ns, stat.st_ino)
+        if stamp != self._index_stamp:
+            try:
+                with open(self._index_path, encoding="utf-8") as f:
+                    index = json.load(f)
+            except Exception as e:
+                logger.warning(f"⚠️ Index d'embeddings illisible ({self._index_path}) : {e}")
+                return
+            index.setdefault("checkpoint", 0)
+            self._index = index
+            self._index_stamp = stamp
+            self._journal_offset = 0
+            self._journal_records = 0
+        self._read_journal()
+
+    def _read_journal(self) -> None:
+        path = self._journal_path(self._index["checkpoint"])
+        try:
+            if path.stat().st_size <= self._journal_offset:
+                return
+            with open(path, "rb") as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        complete = data[: data.rfind(b"\n") + 1]  # une ligne en cours d'écriture sera lue au prochain appel
+        entries = self._index["entries"]
+        for line in complete.splitlines():
+            key, row, accessed = json.loads(line)
+            previous = entries.get(key)
+            entries[key] = [row, max(accessed, previous[1]) if previous and previous[0] == row else accessed]
+            self._index["rows"] = max(self._index["rows"], row + 1)
+            self._journal_records += 1
+        self._journal_offset += len(complete)
+
+    def _write_index(self) -> None:
+        """
+        Nouvel instantané (checkpoint suivant) ; le journal du checkpoint précédent est supprimé.
+        """
+        old_journal = self._journal_path(self._index["checkpoint"])
+        self._index["checkpoint"] += 1
+        tmp_path = self._index_path.with_name(f"index.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+        stat = self._index_path.stat()
+        self._index_stamp = (stat.st_mtime_ns, stat.st_ino)
+        self._journal_offset = 0
+        self._journal_records = 0
+        with contextlib.suppress(FileNotFoundError):
+            old_journal.unlink()
+
+    def _append_journal(self, records: list[list[Any]]) -> None:
+        """
+        Ajoute des lignes au journal (appelé sous verrou écrivain, après `_refresh`).
+        """
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with open(self._journal_path(self._index["checkpoint"]), "ab") as f:
+            f.truncate(self._journal_offset)  # ligne incomplète laissée par un écrivain interrompu
+            f.write(data)
+        self._journal_offset += len(data)
+        self._journal_records += len(records)
+
+    def _matrix(self) -> np.memmap | None:
+        """
+        Memmap en lecture des lignes connues de l'index (ré-ouvert si la génération ou le nombre de lignes change).
+        """
+        generation, rows, dim = self._index["generation"], self._index["rows"], self._index["dim"]
+        if not rows or not dim:
+            return None
+        if self._mapped != (generation, rows):
+            self._vectors = np.memmap(self._vectors_path(generation), dtype=np.float16, mode="r", shape=(rows, dim))
+            self._mapped = (generation, rows)
+        return self._vectors
+
+    # -------------------- Lecture / écriture -------------------- #
+
+    def get_many(self, texts: Sequence[str]) -> list[np.ndarray | None]:
+        """
+        Vecteurs float32 des textes présents dans le cache (None pour les absents), dans l'ordre.
+        """
+        with self._lock:
+            self._refresh()
+            entries: dict[str, list[float]] = self._index["entries"]
+            rows = [entries.get(text_hash(t), [None])[0] for t in texts]
+            try:
+                matrix = self._matrix()
+            except FileNotFoundError:
+                # Compaction concurrente : l'index lu pointe vers une génération supprimée
+                self._index_stamp = None
+                self._refresh()
+                matrix = self._matrix()
+
+            results: list[np.ndarray | None] = []
+            now = time.time()
+            for text, row in zip(texts, rows, strict=True):
+                if row is None or matrix is None or row >= matrix.shape[0]:
+                    results.append(None)
+                    self.misses += 1
+                    continue
+                results.append(np.asarray(matrix[int(row)], dtype=np.float32))
+                self._accessed[text_hash(text)] = now
+                self.hits += 1
+            return results
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        Ajoute les vecteurs des textes absents du cache, puis évince si la taille dépasse max_bytes.
+        """
+        if not len(texts):
+            return
+        vectors = np.asarray(vectors, dtype=np.float16).reshape(len(texts), -1)
+        with self._lock, self._writer_lock():
+            self._refresh()
+            index = self._index
+            snapshot = self._index_stamp is None
+            if index["dim"] and index["dim"] != vectors.shape[1]:
+                logger.warning(f"⚠️ Dimension d'embedding incohérente pour {self.model_name}, cache réinitialisé.")
+                index["generation"] += 1
+                index.update(rows=0, entries={})
+                snapshot = True
+            index["dim"] = dim = int(vectors.shape[1])
+
+            now = time.time()
+            records: list[list[Any]] = []
+            new_rows: list[np.ndarray] = []
+            for text, vector in zip(texts, vectors, strict=True):
+                key = text_hash(text)
+                if key in index["entries"]:
+                    continue
+                index["entries"][key] = [index["rows"] + len(new_rows), now]
+                records.append([key, *index["entries"][key]])
+                new_rows.append(vector)
+            for key, accessed in self._accessed.items():
+                entry = index["entries"].get(key)
+                if entry and accessed > entry[1]:
+                    entry[1] = accessed
+                    records.append([key, *entry])
+            self._accessed.clear()
+
+            if new_rows:
+                path = self._vectors_path(index["generation"])
+                with open(path, "r+b" if path.exists() else "wb") as f:
+                    f.seek(index["rows"] * dim * 2)
+                    f.write(np.stack(new_rows).astype(np.float16).tobytes())
+                    f.truncate()
+                index["rows"] += len(new_rows)
+
+            if index["rows"] * dim * 2 > self.max_bytes:
+                self._compact()
+            elif snapshot or self._journal_records + len(records) > max(JOURNAL_MIN_RECORDS, len(index["entries"])):
+                self._write_index()
+            elif records:
+                self._append_journal(records)
+
+    def _compact(self) -> None:
+        """
+        Garde les entrées les plus récemment utilisées jusqu'à EVICT_TO_RATIO × max_bytes, dans une nouvelle
+        génération du fichier de vecteurs (appelé sous verrou écrivain).
+        """
+        index = self._index
+        old_generation, dim = index["generation"], index["dim"]
+        keep_rows = max(1, int(self.max_bytes * EVICT_TO_RATIO) // (dim * 2))
+        ranked = sorted(index["entries"].items(), key=lambda e: e[1][1], reverse=True)
+        kept, dropped = ranked[:keep_rows], len(ranked) - min(len(ranked), keep_rows)
+
+        old: np.memmap[Any, np.dtype[np.float16]] = np.memmap(
+            self._vectors_path(old_generation), dtype=np.float16, mode="r", shape=(index["rows"], dim)
+        )
+        new_generation = old_generation + 1
+        with open(self._vectors_path(new_generation), "wb") as f:
+            f.write(np.asarray(old[[row for _, (row, _) in kept]], dtype=np.float16).tobytes())
+        del old
+
+        index["generation"] = new_generation
+        index["rows"] = len(kept)
+        index["entries"] = {key: [i, accessed] for i, (key, (_, accessed)) in enumerate(kept)}
+        self._write_index()
+        with contextlib.suppress(FileNotFoundError):
+            self._vectors_path(old_generation).unlink()
+        self.evictions += dropped
+        logger.info(f"🧹 Cache d'embeddings {self.model_name} : {dropped} entrées évincées ({len(kept)} conservées).")
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_STORES: dict[str, EmbeddingStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_embedding_store(model_name: str) -> EmbeddingStore | None:
+    """
+    Cache partagé du processus pour `model_name`, ou None si désactivé (`embedding_cache.enabled`).
+    """
+    if not EMBEDDING_CACHE:
+        return None
+    with _STORES_LOCK:
+        if model_name not in _STORES:
+            _STORES[model_name] = EmbeddingStore(model_name)
+        return _STORES[model_name]
+
+
+def encode_cached(
+    model: TextEncoder,
+    model_name: str,
+    texts: Sequence[str],
+    normalize: bool = False,
+    batch_size: int = 64,
+) -> np.ndarray:
+    """
+    Embeddings float32 (une ligne par texte) : lus dans le cache, les absents encodés en un seul appel puis stockés.
+    """
+    unique = list(dict.fromkeys(texts))
+    store = get_embedding_store(model_name)
+    cached = store.get_many(unique) if store else [None] * len(unique)
+    missing = [text for text, vector in zip(unique, cached, strict=True) if vector is None]
+
+    vectors: dict[str, np.ndarray] = {t: v for t, v in zip(unique, cached, strict=True) if v is not None}
+    if missing:
+        encoded = np.asarray(
+            model.encode(missing, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=False),
+            dtype=np.float32,
+        ).reshape(len(missing), -1)
+        if store:
+            store.put_many(missing, encoded)
+        vectors.update(zip(missing, encoded, strict=True))
+
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    matrix: np.ndarray = np.stack([vectors[t] for t in texts]).astype(np.float32)
+    if normalize:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.maximum(norms, 1e-12)
+    return matrix
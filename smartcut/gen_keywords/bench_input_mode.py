@@ -0,0 +1,103 @@
+"""
+Benchmark du mode d'entrée Qwen3-VL : frames en images indépendantes vs une seule entrée vidéo.
+
+Pour chaque segment, les mêmes frames sont envoyées dans les deux modes ; on compare le nombre de tokens d'entrée,
+la latence (préparation + génération) et l'accord des mots-clés (Jaccard).
+
+Usage : python -m smartcut.gen_keywords.bench_input_mode video.mp4 [durée_segment_s] [nb_segments]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import Any
+
+import cv2
+from PIL import Image
+from transformers import PreTrainedModel, ProcessorMixin
+
+from shared.utils.logger import get_logger
+from smartcut.analyze.analyze_batches import parse_batch_result, sampling_fps
+from smartcut.analyze.extract_frames import iter_session_images
+from smartcut.gen_keywords.generate_keywords import SIZEH, SIZEL, generate_from_inputs, prepare_inputs
+from smartcut.gen_keywords.vlm_service import get_vlm_service
+
+logger = get_logger("SmartCut")
+
+MODES = ("images", "video")
+
+
+def keyword_agreement(first: list[str], second: list[str]) -> float:
+    """
+    Indice de Jaccard entre deux listes de mots-clés (insensible à la casse).
+    """
+    a = {kw.strip().lower() for kw in first if kw.strip()}
+    b = {kw.strip().lower() for kw in second if kw.strip()}
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def run_mode(
+    images: list[Image.Image],
+    processor: ProcessorMixin,
+    model: PreTrainedModel,
+    input_mode: str,
+    fps: float | None,
+) -> dict[str, Any]:
+    """
+    Une génération dans le mode donné : tokens d'entrée, latence et mots-clés.
+    """
+    t0 = time.perf_counter()
+    inputs = prepare_inputs(images, processor, input_mode=input_mode, fps=fps)
+    tokens = int(inputs["input_ids"].shape[1])
+    raw = generate_from_inputs(inputs, processor, model, f"bench_{input_mode}")
+    elapsed = time.perf_counter() - t0
+    return {"tokens": tokens, "latency": elapsed, "keywords": parse_batch_result(raw)["keywords"]}
+
+
+def benchmark_input_modes(video_path: str, segment_len: float = 30.0, max_segments: int = 5) -> list[dict[str, Any]]:
+    """
+    Compare les modes "images" et "video" sur les premiers segments de la vidéo.
+    """
+    cap = cv2.VideoCapture(video_path)
+    duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / (cap.get(cv2.CAP_PROP_FPS) or 25.0)
+    step = max(1, int(segment_len))
+    segments = [(float(s), min(s + segment_len, duration)) for s in range(0, int(duration), step)][:max_segments]
+
+    vlm = get_vlm_service()
+    processor, model, _, _ = vlm.acquire()
+    rows: list[dict[str, Any]] = []
+    try:
+        for idx, images in iter_session_images(cap, segments, True, 1.0, 5, (SIZEH, SIZEL)):
+            start, end = segments[idx]
+            fps = sampling_fps(len(images), start, end)
+            results = {mode: run_mode(images, processor, model, mode, fps) for mode in MODES}
+            row = {
+                "segment": f"{start:.0f}-{end:.0f}s",
+                "frames": len(images),
+                **{f"{mode}_tokens": results[mode]["tokens"] for mode in MODES},
+                **{f"{mode}_latency": round(results[mode]["latency"], 2) for mode in MODES},
+                "agreement": round(keyword_agreement(results["images"]["keywords"], results["video"]["keywords"]), 3),
+            }
+            logger.info(f"⏱️ {row}")
+            rows.append(row)
+    finally:
+        cap.release()
+        vlm.release()
+
+    if rows:
+        mean = {key: sum(r[key] for r in rows) / len(rows) for key in rows[0] if key != "segment"}
+        logger.info(
+            f"📊 Moyennes sur {len(rows)} segments | tokens images {mean['images_tokens']:.0f} "
+            f"vs vidéo {mean['video_tokens']:.0f} | latence images {mean['images_latency']:.2f}s "
+            f"vs vidéo {mean['video_latency']:.2f}s | accord {mean['agreement']:.2f}"
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    seg_len = float(sys.argv[2]) if len(sys.argv) > 2 else 30.0
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    for result in benchmark_input_modes(path, seg_len, count):
+        print(result)
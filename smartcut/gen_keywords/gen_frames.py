@@ -3,72 +3,99 @@
 from __future__ import annotations
 
 from pathlib import Path
-import uuid
 
 import numpy as np
 from PIL import Image
-import torch
 
-from shared.utils.config import MULTIPLE_FRAMES_DIR_SC
 from shared.utils.logger import get_logger
 
 logger = get_logger("SmartCut")
 
 
-def load_frames_as_tensor(
-    frames_dir: Path,
-    segment_id: str,
-    size: tuple[int, int] = (512, 512),
-    max_frames: int = 5,
-) -> torch.Tensor:
+def frames_to_images(
+    frames: list[np.ndarray],
+    size: tuple[int, int] | None = (512, 512),
+) -> list[Image.Image]:
     """
-    Charge les frames d’un segment vidéo et les empile en un batch tensor [N, 3, H, W].
+    Convertit des frames OpenCV (BGR uint8 [H, W, 3]) en images PIL RGB, redimensionnées en (largeur, hauteur).
     """
-    segment_dir = Path(frames_dir)
-    files = sorted(segment_dir.glob(f"{segment_id}_*.jpg"))
-
-    if not files:
-        raise FileNotFoundError(f"Aucune frame trouvée pour {segment_id} dans {frames_dir}")
-
-    selected_files = files[:max_frames]
-
-    tensors: list[torch.Tensor] = []
-    for path in selected_files:
-        img = Image.open(path).convert("RGB")
+    images: list[Image.Image] = []
+    for frame in frames:
+        img = Image.fromarray(np.ascontiguousarray(frame[:, :, ::-1]))
         if size:
-            w, h = size  # width, height
-            img = img.resize((w, h))
-        arr = np.asarray(img, dtype=np.float32) / 255.0  # [H, W, 3]
-        tensor = torch.from_numpy(arr).permute(2, 0, 1)  # → [3, H, W]
-        tensors.append(tensor)
+            img = img.resize(size)
+        images.append(img)
+    return images
 
-    frames_tensor = torch.stack(tensors, dim=0)  # → [N, 3, H, W]
-    return frames_tensor
 
-
-def temp_batch_image(image_batch: torch.Tensor, seed: str | int) -> list[str]:
+def spill_images(images: list[Image.Image], out_dir: Path, prefix: str) -> list[Path]:
     """
-    Sauvegarde un batch d'images (tensor [N, C, H, W]) en fichiers temporaires PNG.
-
-    Retourne une liste d'URI "file://..."
+    Écrit un batch d'images en JPEG pour inspection (option de debug, jamais relu par le pipeline).
     """
-    image_paths: list[str] = []
-
-    num_images = image_batch.shape[0]
-    for idx in range(num_images):
-        img_tensor = image_batch[idx].cpu().numpy().squeeze()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths: list[Path] = []
+    for idx, img in enumerate(images):
+        path = out_dir / f"{prefix}_{idx:03d}.jpg"
+        try:
+            img.save(path, format="JPEG", quality=95)
+            paths.append(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Erreur d'écriture debug {path}: {e}")
+    return paths
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Hash perceptuel par différence (dHash) : niveaux de gris réduits à (hash_size+1)×hash_size, comparaison horizontale.
+    """
+    small = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
 
-        # [C, H, W] → [H, W, C]
-        if img_tensor.ndim == 3 and img_tensor.shape[0] in (1, 3, 4):
-            img_tensor = np.transpose(img_tensor, (1, 2, 0))
 
-        arr = np.clip(255.0 * img_tensor, 0, 255).astype(np.uint8)
-        img = Image.fromarray(arr).convert("RGB")
+def image_entropy(image: Image.Image) -> float:
+    """
+    Entropie de Shannon (bits) de l'histogramme de luminance — indicateur de contenu informatif.
+    """
+    hist = np.asarray(image.convert("L").histogram(), dtype=np.float64)
+    probs = hist[hist > 0] / hist.sum()
+    return float(-(probs * np.log2(probs)).sum())
 
-        unique_id = uuid.uuid4().hex
-        image_path = MULTIPLE_FRAMES_DIR_SC / f"temp_image_{seed}_{idx}_{unique_id}.jpg"
-        img.save(image_path, format="JPEG", quality=95)
 
-        image_paths.append(f"file://{image_path.resolve().as_posix()}")
+def dedup_images(
+    images: list[Image.Image],
+    max_distance: int = 4,
+    min_frames: int = 3,
+    pick: str = "first",
+) -> list[Image.Image]:
+    """
+    Supprime les frames quasi identiques d'un segment (ordre chronologique conservé).
 
-    return image_paths
+    Les frames consécutives dont le dHash est à au plus `max_distance` bits de la première frame du groupe forment un
+    groupe ; un seul représentant est gardé par groupe ("first" ou "entropy" = frame la plus informative). Si moins de
+    `min_frames` frames restent, des frames écartées sont réintégrées à intervalles réguliers.
+    """
+    if len(images) <= min_frames:
+        return images
+
+    hashes = [dhash(img) for img in images]
+    groups: list[list[int]] = []
+    for idx, h in enumerate(hashes):
+        if groups and (hashes[groups[-1][0]] ^ h).bit_count() <= max_distance:
+            groups[-1].append(idx)
+        else:
+            groups.append([idx])
+
+    if pick == "entropy":
+        kept = {max(group, key=lambda i: image_entropy(images[i])) for group in groups}
+    else:
+        kept = {group[0] for group in groups}
+
+    if len(kept) < min_frames:
+        dropped = [i for i in range(len(images)) if i not in kept]
+        needed = min_frames - len(kept)
+        kept.update(dropped[int(j)] for j in np.linspace(0, len(dropped) - 1, needed))
+
+    if len(kept) < len(images):
+        logger.info(f"🧹 Dédoublonnage : {len(images)} → {len(kept)} frames ({len(groups)} plans distincts).")
+    return [images[i] for i in sorted(kept)]
@@ -6,18 +6,29 @@ paramètres que le node ComfyUI.
 from __future__ import annotations
 
 import os
-from pathlib import Path
+import threading
+from typing import Any
 
+from PIL import Image
 from qwen_vl_utils import process_vision_info
 from transformers import (
+    BatchFeature,
+    LogitsProcessorList,
     PreTrainedModel,
     ProcessorMixin,
+    StoppingCriteriaList,
 )
 
 from shared.models.config_manager import CONFIG
-from shared.utils.config import PROMPTS
 from shared.utils.logger import get_logger
-from smartcut.gen_keywords.gen_frames import load_frames_as_tensor, temp_batch_image
+from smartcut.gen_keywords.json_constraint import (
+    JsonTracker,
+    KeywordsJsonLogitsProcessor,
+    KeywordsJsonStoppingCriteria,
+)
+from smartcut.gen_keywords.prefix_cache import current_prompts, reload_prompts_if_changed
+from smartcut.gen_keywords.speculative import generate_assisted
+from smartcut.gen_keywords.token_budget import frame_size, plan_max_pixels
 from smartcut.models_sc.ai_result import AIResult
 
 logger = get_logger("SmartCut")
@@ -43,79 +54,197 @@ DO_SAMPLE = CONFIG.smartcut["generate_keywords"]["do_sample"]
 SKIP_SPECIAL_TOKENS = CONFIG.smartcut["generate_keywords"]["skip_special_tokens"]
 CLEAN_UP_TOKENIZATION_SPACES = CONFIG.smartcut["generate_keywords"]["clean_up_tokenization_spaces"]
 
+# Budget de pixels par frame ajusté au nombre de frames du batch (voir token_budget)
+TOKEN_PLANNER: bool = CONFIG.smartcut["generate_keywords"].get("token_planner", True)
 
-def generate_keywords_from_frames(
-    image_path: Path,
-    processor: ProcessorMixin,
-    model: PreTrainedModel,
-    segment_id: str,
-    num_frames: int,
+# "images" : une entrée image par frame | "video" : les frames d'un batch en une seule vidéo (fusion temporelle)
+INPUT_MODE: str = CONFIG.smartcut["generate_keywords"].get("input_mode", "images")
+VIDEO_FPS: float = CONFIG.smartcut["generate_keywords"].get("video_fps", 1.0)
+
+# Taille d'extraction des frames : SIZEH × SIZEL, agrandie jusqu'au plafond du planificateur s'il est actif
+FRAME_SIZE: tuple[int, int] = frame_size((SIZEH, SIZEL)) if TOKEN_PLANNER and INPUT_MODE != "video" else (SIZEH, SIZEL)
+
+# Décodage contraint au schéma {"description", "keywords"} et arrêt à la fermeture de l'objet (voir json_constraint)
+# Opt-in : modifie la génération (masquage des logits) par rapport au chemin historique
+STRUCTURED_OUTPUT: bool = CONFIG.smartcut["generate_keywords"].get("structured_output", False)
+
+
+def generation_params() -> dict[str, Any]:
+    """
+    Paramètres qui influencent la réponse du modèle (clé du cache de résultats).
+    """
+    return {
+        "max_new_tokens": MAX_NEW_TOKENS,
+        "temperature": TEMPERATURE,
+        "top_p": TOP_P,
+        "repetition_penalty": REPETITION_PENALTY,
+        "do_sample": DO_SAMPLE,
+        "min_pixels": MIN_PIXELS,
+        "max_pixels": MAX_PIXELS,
+        "total_pixels": TOTAL_PIXELS,
+        "input_mode": INPUT_MODE,
+        "structured_output": STRUCTURED_OUTPUT,
+    }
+
+
+# Le tokenizer rapide n'accepte pas d'appels concurrents : le thread de préfetch prépare les entrées pendant que le
+# thread principal décode les sorties
+PROCESSOR_LOCK = threading.Lock()
+
+
+def build_messages(
+    images: list[Image.Image],
     prompt_name: str = "keywords",
-) -> AIResult:
+    max_pixels: int | None = None,
+    input_mode: str = INPUT_MODE,
+    fps: float | None = None,
+) -> list[dict[str, Any]]:
     """
-    Génération des mots-clés pour un batch de frames.
+    Conversation (system + user) d'un batch de frames ; `max_pixels` : budget par frame issu du planificateur.
+
+    input_mode="video" : les frames forment un seul élément vidéo échantillonné à `fps` images/s.
     """
 
-    SYSTEM_PROMPT = PROMPTS["system_keywords"]
-    user_prompt = PROMPTS[prompt_name]
+    prompts = current_prompts()
+    SYSTEM_PROMPT = prompts["system_keywords"]
+    user_prompt = prompts[prompt_name]
 
     content = []
 
     # Paramètres visuels équivalents à ComfyUI
-    min_pixels = MIN_PIXELS * 28 * 28
-    max_pixels = MAX_PIXELS * 28 * 28
+    if max_pixels is None:
+        max_pixels = MAX_PIXELS * 28 * 28
+    min_pixels = min(MIN_PIXELS * 28 * 28, max_pixels)
     total_pixels = TOTAL_PIXELS * 28 * 28
 
-    frames_tensor = load_frames_as_tensor(
-        frames_dir=image_path,
-        segment_id=segment_id,
-        size=(SIZEH, SIZEL),
-        max_frames=num_frames,
-    )
-
-    image_paths = temp_batch_image(frames_tensor, seed=segment_id)
-    content = [
-        *[
+    if input_mode == "video":
+        visual = [
+            {
+                "type": "video",
+                "video": images,
+                "sample_fps": fps or VIDEO_FPS,
+                "min_pixels": min_pixels,
+                "max_pixels": max_pixels,
+                "total_pixels": total_pixels,
+            }
+        ]
+    else:
+        visual = [
             {
                 "type": "image",
-                "image": path,
+                "image": img,
                 "min_pixels": min_pixels,
                 "max_pixels": max_pixels,
                 "total_pixels": total_pixels,
             }
-            for path in image_paths
-        ],
-        {"type": "text", "text": user_prompt},
-    ]
+            for img in images
+        ]
+
+    content = [*visual, {"type": "text", "text": user_prompt}]
 
-    messages = [
+    return [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": content},
     ]
 
-    # 1️⃣ Conversion du chat en texte brut pour le modèle
-    model_text = processor.apply_chat_template(messages, tokenize=TOKENIZE, add_generation_prompt=ADD_GENERATION_PROMPT)
+
+def prepare_packed_inputs(
+    image_groups: list[list[Image.Image]],
+    processor: ProcessorMixin,
+    prompt_name: str = "keywords",
+    input_mode: str = INPUT_MODE,
+    fps: float | None = None,
+) -> BatchFeature:
+    """
+    Prépare les tensors d'entrée (CPU) de plusieurs batches de frames en un seul appel processor (une ligne par
+    groupe, padding à gauche pour la génération).
+
+    Les images sont transmises en mémoire (PIL) jusqu'au processor : aucun aller-retour JPEG sur disque.
+    """
+    reload_prompts_if_changed()
+    max_pixels = None
+    if TOKEN_PLANNER and input_mode != "video":
+        largest = max(image_groups, key=len)
+        max_pixels, tokens = plan_max_pixels(processor, [img.size for img in largest], prompt_name)
+        logger.debug(f"🧮 Budget pixels : {max_pixels:,} px/frame → {tokens:,} tokens ({len(largest)} frames)")
+    conversations = [build_messages(images, prompt_name, max_pixels, input_mode, fps) for images in image_groups]
 
     os.environ["FORCE_QWENVL_VIDEO_READER"] = "torchvision"
 
-    # 2️⃣ Préparation des entrées visuelles
-    image_inputs, video_inputs, video_kwargs = process_vision_info(messages, return_video_kwargs=True)
+    with PROCESSOR_LOCK:
+        # 1️⃣ Conversion du chat en texte brut pour le modèle
+        model_texts = [
+            processor.apply_chat_template(messages, tokenize=TOKENIZE, add_generation_prompt=ADD_GENERATION_PROMPT)
+            for messages in conversations
+        ]
 
-    # 3️⃣ Construction finale des inputs tensors
-    inputs = processor(
-        text=[model_text],
-        images=image_inputs,
-        videos=video_inputs,
-        padding=PADDING,
-        return_tensors=RETURN_TENSORS,
-        **video_kwargs,
-    ).to(model.device)
+        # 2️⃣ Préparation des entrées visuelles (ordre des images = ordre des lignes)
+        image_inputs, video_inputs, video_kwargs = process_vision_info(
+            conversations, return_video_kwargs=True, return_video_metadata=input_mode == "video"
+        )
+        if video_inputs:
+            # Qwen3-VL : les timestamps des frames viennent des métadonnées vidéo
+            video_inputs, video_metadata = (list(v) for v in zip(*video_inputs, strict=True))
+            video_kwargs["video_metadata"] = video_metadata
 
-    logger.debug("🧩 Entrées préparées, génération en cours pour %s", image_path.name)
+        # 3️⃣ Construction finale des inputs tensors (padding à gauche le temps de l'appel, tokenizer partagé)
+        padding_side = processor.tokenizer.padding_side
+        if len(image_groups) > 1:
+            processor.tokenizer.padding_side = "left"
+        try:
+            inputs: BatchFeature = processor(
+                text=model_texts,
+                images=image_inputs,
+                videos=video_inputs,
+                padding=PADDING,
+                return_tensors=RETURN_TENSORS,
+                **video_kwargs,
+            )
+        finally:
+            processor.tokenizer.padding_side = padding_side
+    return inputs
 
-    # Génération identique à ComfyUI
-    generated_ids = model.generate(
-        **inputs,
+
+def prepare_inputs(
+    images: list[Image.Image],
+    processor: ProcessorMixin,
+    prompt_name: str = "keywords",
+    input_mode: str = INPUT_MODE,
+    fps: float | None = None,
+) -> BatchFeature:
+    """
+    Prépare les tensors d'entrée (CPU) d'un batch de frames : chat template, vision info et processor.
+    """
+    return prepare_packed_inputs([images], processor, prompt_name, input_mode, fps)
+
+
+def generate_packed_from_inputs(
+    inputs: BatchFeature,
+    processor: ProcessorMixin,
+    model: PreTrainedModel,
+    segment_ids: list[str],
+) -> list[AIResult]:
+    """
+    Génération des mots-clés à partir d'entrées préparées ; une réponse par ligne du batch.
+    """
+    inputs = inputs.to(model.device)
+    logger.debug("🧩 Entrées préparées, génération en cours pour %s", ", ".join(segment_ids))
+
+    constraint: dict[str, Any] = {}
+    if STRUCTURED_OUTPUT:
+        with PROCESSOR_LOCK:
+            tracker = JsonTracker(processor.tokenizer, inputs.input_ids.shape[1])
+        constraint = {
+            "logits_processor": LogitsProcessorList([KeywordsJsonLogitsProcessor(tracker)]),
+            "stopping_criteria": StoppingCriteriaList([KeywordsJsonStoppingCriteria(tracker)]),
+        }
+
+    # Génération identique à ComfyUI (+ contrainte JSON si activée)
+    generated_ids = generate_assisted(
+        inputs,
+        processor,
+        model,
+        tokenizer_lock=PROCESSOR_LOCK,
         max_new_tokens=MAX_NEW_TOKENS,
         temperature=TEMPERATURE,
         top_p=TOP_P,
@@ -123,16 +252,18 @@ def generate_keywords_from_frames(
         do_sample=DO_SAMPLE,
         eos_token_id=processor.tokenizer.eos_token_id,
         pad_token_id=processor.tokenizer.pad_token_id,
+        **constraint,
     )
 
     # Retrait du prompt d'entrée (comme dans le node)
     trimmed_ids = [out_ids[len(in_ids) :] for in_ids, out_ids in zip(inputs.input_ids, generated_ids, strict=False)]
 
-    output_text: AIResult = processor.batch_decode(
-        trimmed_ids,
-        skip_special_tokens=SKIP_SPECIAL_TOKENS,
-        clean_up_tokenization_spaces=CLEAN_UP_TOKENIZATION_SPACES,
-    )[0]
+    with PROCESSOR_LOCK:
+        output_texts: list[AIResult] = processor.batch_decode(
+            trimmed_ids,
+            skip_special_tokens=SKIP_SPECIAL_TOKENS,
+            clean_up_tokenization_spaces=CLEAN_UP_TOKENIZATION_SPACES,
+        )
 
     # Nettoyage du texte
     # if "</think>" in output_text:
@@ -140,5 +271,33 @@ def generate_keywords_from_frames(
 
     # output_text = re.sub(r"^[\s\u200b\xa0]+", "", output_text)
 
-    logger.info("🔑 Mots-clés générés pour %s : %s", image_path.name, output_text)
-    return output_text
+    for segment_id, output_text in zip(segment_ids, output_texts, strict=False):
+        logger.info("🔑 Mots-clés générés pour %s : %s", segment_id, output_text)
+    return output_texts
+
+
+def generate_from_inputs(
+    inputs: BatchFeature,
+    processor: ProcessorMixin,
+    model: PreTrainedModel,
+    segment_id: str,
+) -> AIResult:
+    """
+    Génération des mots-clés à partir d'entrées déjà préparées par `prepare_inputs`.
+    """
+    return generate_packed_from_inputs(inputs, processor, model, [segment_id])[0]
+
+
+def generate_keywords_from_frames(
+    images: list[Image.Image],
+    processor: ProcessorMixin,
+    model: PreTrainedModel,
+    segment_id: str,
+    prompt_name: str = "keywords",
+    fps: float | None = None,
+) -> AIResult:
+    """
+    Génération des mots-clés pour un batch de frames.
+    """
+    inputs = prepare_inputs(images, processor, prompt_name, fps=fps)
+    return generate_from_inputs(inputs, processor, model, segment_id)
@@ -0,0 +1,210 @@
+"""
+Décodage contraint de la réponse mots-clés : `{"description": "...", "keywords": ["...", ...]}`.
+
+Un automate caractère par caractère suit chaque ligne du batch pendant `model.generate` :
+
+- `KeywordsJsonLogitsProcessor` masque les tokens qui sortiraient du schéma (pas de préambule "thinking", pas de
+  texte libre autour du JSON, pas de guillemet ou d'échappement dans les chaînes) ;
+- `KeywordsJsonStoppingCriteria` arrête une ligne dès que l'objet de premier niveau est fermé, au lieu de décoder
+  jusqu'à `max_new_tokens`.
+
+La ponctuation est imposée sous forme canonique (`", "`, `": "`) : seuls le contenu des chaînes et le nombre de
+mots-clés sont choisis par le modèle.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import threading
+
+import torch
+from transformers import LogitsProcessor, PreTrainedTokenizerBase, StoppingCriteria
+
+# Grammaire : état -> littéraux possibles (texte, état suivant) ; les états absents sont des chaînes JSON
+GRAMMAR: dict[str, list[tuple[str, str]]] = {
+    "start": [('{"description": "', "description")],
+    "after_description": [(', "keywords": [', "list")],
+    "list": [('"', "keyword"), ("]}", "done")],
+    "after_keyword": [(', "', "keyword"), ("]}", "done")],
+}
+# Chaîne -> état littéral ouvert par son guillemet fermant
+STRING_STATES: dict[str, str] = {"description": "after_description", "keyword": "after_keyword"}
+
+
+@dataclass(frozen=True)
+class JsonState:
+    """
+    Position dans la grammaire : `consumed` = partie déjà lue des littéraux de `name`.
+    """
+
+    name: str = "start"
+    consumed: str = ""
+
+
+DONE = JsonState("done")
+
+
+def advance(state: JsonState, text: str) -> JsonState | None:
+    """
+    Avance l'automate sur `text` ; None si le texte sort du schéma.
+    """
+    for ch in text:
+        if state.name == "done":
+            return None
+        if state.name in STRING_STATES:
+            if ch == '"':
+                state = JsonState(STRING_STATES[state.name])
+            elif ch == "\\" or ord(ch) < 0x20:
+                return None
+            continue
+
+        consumed = state.consumed + ch
+        options = [(lit, nxt) for lit, nxt in GRAMMAR[state.name] if lit.startswith(consumed)]
+        if not options:
+            return None
+        complete = [nxt for lit, nxt in options if lit == consumed]
+        state = JsonState(complete[0]) if complete else JsonState(state.name, consumed)
+    return state
+
+
+class _Vocabulary:
+    """
+    Texte décodé de chaque token et masques précalculés par état (construits une fois par tokenizer).
+    """
+
+    def __init__(self, tokenizer: PreTrainedTokenizerBase) -> None:
+        size = len(tokenizer)
+        self.texts: list[str] = tokenizer.batch_decode([[i] for i in range(size)], skip_special_tokens=False)
+        special = set(tokenizer.all_special_ids) | set(getattr(tokenizer, "added_tokens_decoder", {}))
+        for token_id in special:
+            if 0 <= token_id < size:
+                self.texts[token_id] = ""
+
+        self.by_text: dict[str, list[int]] = {}
+        for token_id, text in enumerate(self.texts):
+            if text:
+                self.by_text.setdefault(text, []).append(token_id)
+
+        self.eos_ids = [i for i in (tokenizer.eos_token_id, tokenizer.pad_token_id) if i is not None]
+        self.free_ids = [
+            i for i, t in enumerate(self.texts) if t and '"' not in t and "\\" not in t and min(map(ord, t)) >= 0x20
+        ]
+        self._masks: dict[tuple[JsonState, int, str], torch.Tensor] = {}
+
+    def _literal_ids(self, state: JsonState, prefix: str = "") -> list[int]:
+        """
+        Tokens qui lisent un préfixe non vide (précédé de `prefix`) d'un des littéraux restants de `state`.
+        """
+        ids: list[int] = []
+        for lit, _ in GRAMMAR[state.name]:
+            if not lit.startswith(state.consumed):
+                continue
+            remaining = lit[len(state.consumed) :]
+            for k in range(1, len(remaining) + 1):
+                ids.extend(self.by_text.get(prefix + remaining[:k], []))
+        return ids
+
+    def allowed_ids(self, state: JsonState) -> list[int]:
+        if state.name == "done":
+            return self.eos_ids
+        if state.name in STRING_STATES:
+            closing = JsonState(STRING_STATES[state.name])
+            return self.free_ids + self.by_text.get('"', []) + self._literal_ids(closing, prefix='"')
+        return self._literal_ids(state)
+
+    def mask(self, state: JsonState, width: int, device: torch.device) -> torch.Tensor:
+        """
+        Masque booléen (True = token interdit) de largeur `width` (taille des logits du modèle).
+        """
+        key = (state, width, str(device))
+        if key not in self._masks:
+            mask = torch.ones(width, dtype=torch.bool)
+            ids = [i for i in self.allowed_ids(state) if i < width]
+            mask[torch.tensor(ids, dtype=torch.long)] = False
+            self._masks[key] = mask.to(device)
+        return self._masks[key]
+
+
+_VOCABS: dict[int, _Vocabulary] = {}
+_VOCABS_LOCK = threading.Lock()
+
+
+def get_vocabulary(tokenizer: PreTrainedTokenizerBase) -> _Vocabulary:
+    with _VOCABS_LOCK:
+        if id(tokenizer) not in _VOCABS:
+            _VOCABS[id(tokenizer)] = _Vocabulary(tokenizer)
+        return _VOCABS[id(tokenizer)]
+
+
+class JsonTracker:
+    """
+    État de l'automate par ligne du batch, calculé sur les tokens générés depuis `prompt_length`.
+
+    Partagé entre le logits processor et le critère d'arrêt. L'état ne dépend que de la séquence reçue, pas de l'ordre
+    des appels : le décodage assisté appelle le processor sur les propositions du brouillon puis sur des préfixes plus
+    courts pendant la vérification, et les tokens rejetés disparaissent de la séquence suivante. Chaque ligne garde
+    l'état après chacun de ses derniers tokens ; seule la partie qui diffère de la séquence précédente est rejouée.
+    """
+
+    def __init__(self, tokenizer: PreTrainedTokenizerBase, prompt_length: int) -> None:
+        self.vocab = get_vocabulary(tokenizer)
+        self.prompt_length = prompt_length
+        self.states: list[JsonState] = []
+        self._tokens: list[list[int]] = []
+        self._history: list[list[JsonState]] = []
+
+    def update(self, input_ids: torch.LongTensor) -> list[JsonState]:
+        rows: list[list[int]] = input_ids[:, self.prompt_length :].tolist()
+        if len(self._tokens) != len(rows):
+            self._tokens = [[] for _ in rows]
+            self._history = [[] for _ in rows]
+        self.states = [self._row_state(row, tokens) for row, tokens in enumerate(rows)]
+        return self.states
+
+    def _row_state(self, row: int, tokens: list[int]) -> JsonState:
+        known, history = self._tokens[row], self._history[row]
+        common = 0
+        while common < min(len(known), len(tokens)) and known[common] == tokens[common]:
+            common += 1
+        del known[common:], history[common:]
+
+        state = history[-1] if history else JsonState()
+        for token_id in tokens[common:]:
+            if state.name != "done":
+                text = self.vocab.texts[token_id] if token_id < len(self.vocab.texts) else ""
+                state = advance(state, text) or DONE
+            known.append(token_id)
+            history.append(state)
+        return state
+
+    def finished(self) -> list[bool]:
+        return [state.name == "done" for state in self.states]
+
+
+class KeywordsJsonLogitsProcessor(LogitsProcessor):
+    """
+    Interdit (-inf) les tokens incompatibles avec le schéma mots-clés à la position courante de chaque ligne.
+    """
+
+    def __init__(self, tracker: JsonTracker) -> None:
+        self.tracker = tracker
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        states = self.tracker.update(input_ids)
+        for row, state in enumerate(states):
+            mask = self.tracker.vocab.mask(state, scores.shape[-1], scores.device)
+            scores[row].masked_fill_(mask, float("-inf"))
+        return scores
+
+
+class KeywordsJsonStoppingCriteria(StoppingCriteria):
+    """
+    Arrête chaque ligne dès que l'objet JSON de premier niveau est fermé.
+    """
+
+    def __init__(self, tracker: JsonTracker) -> None:
+        self.tracker = tracker
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs: object) -> torch.BoolTensor:
+        self.tracker.update(input_ids)
+        return torch.tensor(self.tracker.finished(), dtype=torch.bool, device=input_ids.device)
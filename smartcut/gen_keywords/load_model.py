@@ -7,6 +7,7 @@ import time
 import torch
 from torch import dtype as TorchDType
 from transformers import (
+    AutoModelForImageTextToText,
     AutoProcessor,
     BitsAndBytesConfig,
     PreTrainedModel,
@@ -143,6 +144,32 @@ def load_qwen_model(force_reload: bool = False) -> tuple[ProcessorMixin, PreTrai
         raise
 
 
+def load_draft_model(draft_name: str) -> PreTrainedModel:
+    """
+    Charge le modèle brouillon du décodage spéculatif, sur le même device et avec la quantization du 4B.
+    """
+    quant_config = None
+    if LOAD_IN_4BIT_4B and torch.cuda.is_available():
+        quant_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_use_double_quant=BNB_4BIT_USE_DOUBLE_QUANT_4B,
+            bnb_4bit_quant_type=BNB_4BIT_QUANT_TYPE_4B,
+            bnb_4bit_compute_dtype=BNB_4BIT_COMPUTE_DTYPE_4B,
+        )
+
+    start = time.time()
+    draft: PreTrainedModel = AutoModelForImageTextToText.from_pretrained(
+        draft_name,
+        torch_dtype=TORCH_DTYPE,
+        device_map=DEVICE_MAP if torch.cuda.is_available() else DEVICE_MAP_CPU,
+        attn_implementation=ATTN_IMPLEMENTATION,
+        quantization_config=quant_config,
+    )
+    draft.eval()
+    logger.info(f"✅ Modèle brouillon {draft_name} chargé en {time.time() - start:.1f}s")
+    return draft
+
+
 def load_and_batches() -> tuple[ProcessorMixin, PreTrainedModel, str, int]:
     """
     lance le modèle et définit la taille du batches
@@ -2,33 +2,64 @@
 
 from __future__ import annotations
 
-from pathlib import Path
-
+from PIL import Image
 from transformers import (
+    BatchFeature,
     PreTrainedModel,
     ProcessorMixin,
 )
 
 from shared.utils.logger import get_logger
-from smartcut.gen_keywords.generate_keywords import generate_keywords_from_frames
+from smartcut.gen_keywords.generate_keywords import (
+    generate_from_inputs,
+    generate_keywords_from_frames,
+    generation_params,
+)
+from smartcut.gen_keywords.result_cache import get_result_cache, make_key
 from smartcut.models_sc.ai_result import AIResult
 
 logger = get_logger("SmartCut")
 
 
+def model_name(model: PreTrainedModel) -> str:
+    return str(getattr(model, "name_or_path", ""))
+
+
+def result_key(images: list[Image.Image], model: PreTrainedModel) -> str:
+    """
+    Clé du cache de résultats pour un batch de frames analysé par `model`.
+    """
+    return make_key(images, model_name(model), generation_params())
+
+
 def generate_keywords_for_segment(
     segment_id: str,
-    frame_dir: Path,
+    images: list[Image.Image],
     processor: ProcessorMixin,
     model: PreTrainedModel,
-    num_frames: int,
+    inputs: BatchFeature | None = None,
+    fps: float | None = None,
 ) -> AIResult:
     """
     Génère et fusionne les mots-clés à partir de plusieurs frames d'un segment.
+
+    `inputs` : tensors déjà préparés (préfetch) pour ces frames ; sinon ils sont construits ici.
+    `fps` : cadence d'échantillonnage des frames (mode d'entrée vidéo).
+    Les réponses sont mises en cache par contenu (frames + prompt + modèle + paramètres).
     """
-    response: AIResult = generate_keywords_from_frames(
-        frame_dir, processor, model, segment_id, num_frames, prompt_name="keywords"
-    )
+    cache = get_result_cache()
+    key = result_key(images, model) if cache else ""
+    if cache and (cached := cache.get(key)) is not None:
+        logger.info(f"♻️ Réponse en cache pour {segment_id} ({len(images)} frames).")
+        return cached
+
+    if inputs is not None:
+        response: AIResult = generate_from_inputs(inputs, processor, model, segment_id)
+    else:
+        response = generate_keywords_from_frames(images, processor, model, segment_id, prompt_name="keywords", fps=fps)
+
+    if cache:
+        cache.put(key, response, model_name=model_name(model))
 
     # responses = [r1, r2]
     # result = "\n".join([f"Réponse {i+1}: {r}" for i, r in enumerate(responses)])
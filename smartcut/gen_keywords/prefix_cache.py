@@ -0,0 +1,210 @@
+"""
+Réutilisation du cache KV du préfixe texte fixe (prompt système) entre batches et segments.
+
+Chaque entrée commence par le même bloc `<|im_start|>system ... <|im_end|>` : son cache KV est calculé une fois par
+modèle chargé, puis copié pour chaque génération. Seule la suite (images, prompt utilisateur) est pré-remplie :
+
+1. positions M-RoPE calculées sur la séquence complète (`get_rope_index`) ;
+2. pré-remplissage de `[préfixe, dernier token[` avec les pixels, à partir de la copie du cache ;
+3. `generate` ne traite plus que le dernier token puis décode normalement.
+
+Le prompt utilisateur suit les images dans la conversation : il ne fait pas partie du préfixe partagé.
+
+Le cache est invalidé quand le fichier `PROMPT_PATH` change (date de modification ou taille) : les prompts sont
+rechargés dans un nouveau dictionnaire qui remplace l'ancien en une seule affectation (`current_prompts`). Le
+rechargement a lieu sur le thread de préparation des batches : les lecteurs prennent un instantané et ne voient
+jamais un dictionnaire à moitié rempli. Seuls les batches d'une ligne (ou sans padding) en profitent ; les autres
+repassent par `generate` classique.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import copy
+import inspect
+import os
+import threading
+from typing import Any
+
+import torch
+from transformers import BatchFeature, PreTrainedModel, ProcessorMixin
+
+from shared.models.config_manager import CONFIG
+from shared.utils.config import PROMPT_PATH, PROMPTS, load_prompts
+from shared.utils.logger import get_logger
+
+logger = get_logger("SmartCut")
+
+PREFIX_CACHE: bool = CONFIG.smartcut["generate_keywords"].get("prefix_cache", True)
+PIXEL_INPUTS = {"pixel_values", "pixel_values_videos"}
+PER_TOKEN_INPUTS = {"mm_token_type_ids", "token_type_ids"}  # alignées sur input_ids, découpées au pré-remplissage
+
+_PROMPTS_LOCK = threading.Lock()
+_prompts_signature: tuple[int, int] | None = None
+_prompts: dict[str, Any] = dict(PROMPTS)
+
+
+def current_prompts() -> dict[str, Any]:
+    """
+    Prompts courants : instantané remplacé d'un bloc à chaque rechargement (à lire, jamais à modifier).
+    """
+    return _prompts
+
+
+def prompts_signature() -> tuple[int, int]:
+    """
+    (mtime_ns, taille) du fichier de prompts ; (0, 0) s'il est introuvable.
+    """
+    try:
+        st = os.stat(PROMPT_PATH)
+    except OSError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def reload_prompts_if_changed() -> bool:
+    """
+    Recharge les prompts si le fichier a changé depuis le dernier contrôle ; retourne True si rechargé.
+    """
+    global _prompts, _prompts_signature
+    with _PROMPTS_LOCK:
+        signature = prompts_signature()
+        if _prompts_signature is None:
+            _prompts_signature = signature
+            return False
+        if signature == _prompts_signature:
+            return False
+        try:
+            prompts = load_prompts()
+        except Exception as e:
+            logger.warning(f"⚠️ Rechargement des prompts impossible ({PROMPT_PATH}) : {e}")
+            return False
+        _prompts_signature = signature
+        _prompts = dict(prompts)
+        logger.info(f"📝 Prompts rechargés depuis {PROMPT_PATH}.")
+        return True
+
+
+class PrefixKVCache:
+    """
+    Cache KV du prompt système pour un modèle, reconstruit si le modèle ou le prompt change.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._key: tuple[int, str] | None = None
+        self._ids: torch.Tensor | None = None
+        self._past: Any = None
+        self.hits = 0
+        self.builds = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._key, self._ids, self._past = None, None, None
+
+    def prefix_ids(
+        self,
+        processor: ProcessorMixin,
+        model: PreTrainedModel,
+        tokenizer_lock: threading.Lock | None = None,
+    ) -> torch.Tensor:
+        """
+        Ids du préfixe [1, P] pour le modèle et le prompt système courants (cache KV calculé s'il manque).
+        """
+        system_prompt = str(current_prompts()["system_keywords"])
+        key = (id(model), system_prompt)
+        with self._lock:
+            if self._key != key or self._ids is None:
+                with tokenizer_lock or contextlib.nullcontext():
+                    text = processor.apply_chat_template(
+                        [{"role": "system", "content": system_prompt}], tokenize=False, add_generation_prompt=False
+                    )
+                    ids = processor.tokenizer(text, return_tensors="pt")["input_ids"].to(model.device)
+                with torch.no_grad():
+                    # Modèle de base : cache KV sans calcul des logits
+                    past = model.model(input_ids=ids, use_cache=True).past_key_values
+                self._key, self._ids, self._past = key, ids, past
+                self.builds += 1
+                logger.info(f"🧠 Cache KV du prompt système calculé ({ids.shape[1]} tokens).")
+                return ids
+            return self._ids
+
+    def past_copy(self, prefix_ids: torch.Tensor) -> Any:
+        """
+        Copie du cache KV de `prefix_ids` (compte un hit) ; None s'il a été remplacé entre-temps.
+        """
+        with self._lock:
+            if self._ids is not prefix_ids:
+                return None
+            self.hits += 1
+            return copy.deepcopy(self._past)
+
+
+_CACHE = PrefixKVCache()
+
+
+def get_prefix_cache() -> PrefixKVCache:
+    return _CACHE
+
+
+def _usable_prefix(inputs: BatchFeature, prefix_ids: torch.Tensor) -> bool:
+    input_ids = inputs["input_ids"]
+    size = prefix_ids.shape[1]
+    if input_ids.shape[0] != 1 or input_ids.shape[1] <= size + 1:
+        return False
+    mask = inputs.get("attention_mask")
+    if mask is not None and not bool(mask.all()):
+        return False
+    return bool(torch.equal(input_ids[:, :size], prefix_ids))
+
+
+def generate_with_prefix(
+    inputs: BatchFeature,
+    processor: ProcessorMixin,
+    model: PreTrainedModel,
+    tokenizer_lock: threading.Lock | None = None,
+    **generate_kwargs: Any,
+) -> torch.Tensor:
+    """
+    `model.generate(**inputs, **generate_kwargs)` en repartant du cache KV du prompt système quand c'est possible.
+    """
+    base_model = getattr(model, "model", None)
+    get_rope_index = getattr(base_model, "get_rope_index", None)
+    if not PREFIX_CACHE or base_model is None or get_rope_index is None:
+        return model.generate(**inputs, **generate_kwargs)
+
+    prefix_ids = _CACHE.prefix_ids(processor, model, tokenizer_lock)
+    past = _CACHE.past_copy(prefix_ids) if _usable_prefix(inputs, prefix_ids) else None
+    if past is None:
+        return model.generate(**inputs, **generate_kwargs)
+
+    input_ids = inputs["input_ids"]
+    attention_mask = inputs.get("attention_mask")
+    if attention_mask is None:
+        attention_mask = torch.ones_like(input_ids)
+    start, stop = prefix_ids.shape[1], input_ids.shape[1] - 1
+
+    # Arguments nommés : l'ordre positionnel de `get_rope_index` diffère selon les versions de transformers, et les
+    # processors récents fournissent `mm_token_type_ids` (type de chaque token : texte, image, vidéo)
+    rope_kwargs = {k: inputs.get(k) for k in ("image_grid_thw", "video_grid_thw", "mm_token_type_ids") if k in inputs}
+    position_ids, rope_deltas = get_rope_index(input_ids, attention_mask=attention_mask, **rope_kwargs)
+
+    prefill: dict[str, Any] = {k: v for k, v in inputs.items() if k not in ("input_ids", "attention_mask")}
+    for key in PER_TOKEN_INPUTS & prefill.keys():
+        prefill[key] = prefill[key][:, start:stop]
+    if "cache_position" in inspect.signature(base_model.forward).parameters:
+        prefill["cache_position"] = torch.arange(start, stop, device=input_ids.device)
+    with torch.no_grad():
+        base_model(
+            input_ids=input_ids[:, start:stop],
+            attention_mask=attention_mask[:, :stop],
+            position_ids=position_ids[..., start:stop],
+            past_key_values=past,
+            use_cache=True,
+            **prefill,
+        )
+    # Le décodage reprend à la position `stop` : les deltas M-RoPE sont ceux de la séquence complète
+    base_model.rope_deltas = rope_deltas
+    # Les pixels ont été consommés au pré-remplissage : seul le dernier token reste à traiter
+    remaining = {k: v for k, v in inputs.items() if k not in PIXEL_INPUTS}
+    return model.generate(**remaining, past_key_values=past, **generate_kwargs)
@@ -0,0 +1,172 @@
+"""
+Cache adressé par contenu des réponses du VLM.
+
+La clé est un SHA-256 des pixels des frames, des prompts (system + user), du nom du modèle et des paramètres de
+génération : une même séquence de frames analysée avec la même configuration (reprise, ré-analyse CutMind,
+doublons entre vidéos) ne repasse pas par `model.generate`.
+
+Chaque entrée est un petit fichier JSON (`<clé[:2]>/<clé>.json`) écrit atomiquement. L'éviction est LRU par
+taille : la date de modification sert de date de dernier accès et, au-delà de `max_bytes`, les entrées les plus
+anciennes sont supprimées jusqu'à `EVICT_TO_RATIO × max_bytes` (le répertoire n'est parcouru qu'une fois par éviction,
+pas à chaque écriture).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+from typing import Any
+
+from PIL import Image
+
+from shared.models.config_manager import CONFIG
+from shared.utils.config import AI_CACHE_DIR_SC
+from shared.utils.logger import get_logger
+from smartcut.gen_keywords.prefix_cache import current_prompts
+from smartcut.models_sc.ai_result import AIResult
+
+logger = get_logger("SmartCut")
+
+RESULT_CACHE: bool = CONFIG.smartcut["generate_keywords"].get("result_cache", True)
+RESULT_CACHE_MAX_MB: float = CONFIG.smartcut["generate_keywords"].get("result_cache_max_mb", 512)
+EVICT_TO_RATIO = 0.8  # après éviction, le cache redescend à 80 % de max_bytes
+
+
+def make_key(
+    images: list[Image.Image],
+    model_name: str,
+    params: dict[str, Any],
+    prompt_name: str = "keywords",
+) -> str:
+    """
+    Clé de cache : pixels des frames (dans l'ordre) + prompts + modèle + paramètres de génération.
+    """
+    digest = hashlib.sha256()
+    for img in images:
+        digest.update(f"{img.mode}:{img.size[0]}x{img.size[1]}|".encode())
+        digest.update(img.tobytes())
+    prompts = current_prompts()
+    digest.update(str(prompts["system_keywords"]).encode())
+    digest.update(str(prompts[prompt_name]).encode())
+    digest.update(model_name.encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class AIResultCache:
+    """
+    Cache disque des réponses brutes du modèle, avec compteurs de hits / misses.
+    """
+
+    def __init__(self, root: Path = AI_CACHE_DIR_SC, max_bytes: int = int(RESULT_CACHE_MAX_MB * 1024 * 1024)) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._size: int | None = None
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> AIResult | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                result: AIResult = json.load(f)["result"]
+            os.utime(path)  # accès → entrée la plus récente pour l'éviction LRU
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Entrée de cache illisible {path.name} : {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def contains(self, key: str) -> bool:
+        """
+        Entrée présente, sans lecture ni effet sur les statistiques (tri des batches avant préparation).
+        """
+        return self._path(key).exists()
+
+    def put(self, key: str, result: AIResult, model_name: str = "") -> None:
+        path = self._path(key)
+        try:
+            old_size = path.stat().st_size if path.exists() else 0
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"model": model_name, "result": result}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ Écriture du cache impossible ({path.name}) : {e}")
+            return
+
+        with self._lock:
+            if self._size is not None:
+                self._size += path.stat().st_size - old_size  # clé réécrite : l'ancienne taille est remplacée
+            self._evict()
+
+    def _entries(self) -> list[tuple[Path, os.stat_result]]:
+        return [(p, p.stat()) for p in self.root.glob("*/*.json")]
+
+    def _evict(self) -> None:
+        """
+        Au-delà de max_bytes, supprime les entrées les moins récemment utilisées jusqu'à EVICT_TO_RATIO × max_bytes
+        (appelé sous verrou).
+        """
+        entries = self._entries() if self._size is None else None
+        if entries is not None:
+            self._size = sum(st.st_size for _, st in entries)
+        if self._size is None or self._size <= self.max_bytes:
+            return
+
+        if entries is None:
+            entries = self._entries()
+            self._size = sum(st.st_size for _, st in entries)  # recalé sur le disque (autres processus)
+        target = int(self.max_bytes * EVICT_TO_RATIO)
+        evicted = 0
+        for path, st in sorted(entries, key=lambda e: e[1].st_mtime_ns):
+            if self._size <= target:
+                break
+            try:
+                path.unlink()
+                self._size -= st.st_size
+                evicted += 1
+            except FileNotFoundError:
+                continue
+        self.evictions += evicted
+        logger.info(f"🧹 Cache IA : {evicted} entrées évincées (taille {self._size / 1e6:.1f} Mo).")
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_CACHE: AIResultCache | None = None
+
+
+def get_result_cache() -> AIResultCache | None:
+    """
+    Cache partagé du processus, ou None si désactivé (`generate_keywords.result_cache`).
+    """
+    global _CACHE
+    if not RESULT_CACHE:
+        return None
+    if _CACHE is None:
+        _CACHE = AIResultCache()
+    return _CACHE
@@ -0,0 +1,250 @@
+"""
+Décodage spéculatif (assisted generation) pour le modèle 8B.
+
+Quand le modèle chargé est `MODEL_8B`, un modèle brouillon (par défaut `MODEL_4B`, même tokenizer et mêmes tokens
+visuels) propose `num_assistant_tokens` tokens que le 8B vérifie en une seule passe. Configuration
+(`generate_keywords` dans smartcut.yaml) :
+
+- `speculative` : active le mode (défaut : désactivé) ;
+- `draft_model` : checkpoint du brouillon (défaut : `model_4b`) ;
+- `num_assistant_tokens` : tokens proposés par étape ;
+- `speculative_baseline_every` : une génération sur N sans brouillon, pour mesurer l'accélération réelle.
+
+Le taux d'acceptation est compté par étape de vérification : un `streamer` reçoit les tokens validés par le 8B (les
+tokens acceptés plus un) et un hook compte les passes forward du brouillon depuis l'étape précédente (un token proposé
+par passe). La dernière étape est exclue : `generate` la tronque à la longueur maximale ou à l'EOS, ses propositions ne
+sont donc pas toutes jugées. Seuls les batches d'une ligne sont assistés (limite de `generate`) ; les autres suivent le
+chemin classique.
+
+Le chemin assisté (et sa mesure de référence) n'utilise pas le cache KV du prompt système (`prefix_cache`) : la cible
+et le brouillon pré-remplissent chacun le prompt complet, le brouillon n'ayant pas de cache de préfixe à reprendre.
+
+Le décodage contraint (`json_constraint`) reste actif : son `logits_processor` est aussi passé au brouillon, et
+l'état de l'automate est recalculé à partir de la séquence reçue à chaque appel (propositions puis préfixes vérifiés).
+
+Test CPU de bout en bout avec de petits checkpoints :
+
+    python -m smartcut.gen_keywords.speculative <cible> <brouillon> [nb_générations]
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from typing import Any
+
+from PIL import Image
+import torch
+from transformers import AutoProcessor, BatchFeature, PreTrainedModel, ProcessorMixin
+from transformers.generation import BaseStreamer
+
+from shared.models.config_manager import CONFIG
+from shared.utils.logger import get_logger
+from smartcut.gen_keywords.load_model import MODEL_4B, MODEL_8B, load_draft_model
+from smartcut.gen_keywords.prefix_cache import generate_with_prefix
+
+logger = get_logger("SmartCut")
+
+SPECULATIVE: bool = CONFIG.smartcut["generate_keywords"].get("speculative", False)
+DRAFT_MODEL: str = CONFIG.smartcut["generate_keywords"].get("draft_model", "") or MODEL_4B
+NUM_ASSISTANT_TOKENS: int = CONFIG.smartcut["generate_keywords"].get("num_assistant_tokens", 5)
+BASELINE_EVERY: int = CONFIG.smartcut["generate_keywords"].get("speculative_baseline_every", 20)
+STATS_LOG_EVERY = 10
+
+
+class SpeculativeStats:
+    """
+    Compteurs de passes forward et de temps, avec et sans brouillon.
+    """
+
+    def __init__(self) -> None:
+        self.draft_calls = 0
+        self.runs = 0
+        self.accepted = 0
+        self.drafted = 0
+        self.assisted_time = 0.0
+        self.assisted_tokens = 0
+        self.plain_time = 0.0
+        self.plain_tokens = 0
+
+    def count_draft(self, *_: Any) -> None:
+        self.draft_calls += 1
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.drafted if self.drafted else 0.0
+
+    @property
+    def speedup(self) -> float | None:
+        """
+        Rapport des ms/token sans et avec brouillon ; None tant qu'aucune mesure de référence n'existe.
+        """
+        if not (self.plain_tokens and self.assisted_tokens and self.assisted_time):
+            return None
+        return (self.plain_time / self.plain_tokens) / (self.assisted_time / self.assisted_tokens)
+
+    def summary(self) -> str:
+        speedup = f"×{self.speedup:.2f}" if self.speedup is not None else "n/d"
+        return (
+            f"🎯 Spéculatif : {self.runs} générations | acceptation {self.acceptance_rate:.0%} "
+            f"({self.accepted}/{self.drafted} tokens) | accélération {speedup}"
+        )
+
+
+class _StepCounter(BaseStreamer):
+    """
+    `streamer` de `generate` : relève à chaque étape de vérification (tokens proposés par le brouillon, tokens validés).
+    """
+
+    def __init__(self, stats: SpeculativeStats) -> None:
+        self.stats = stats
+        self.steps: list[tuple[int, int]] = []
+        self._prompt_seen = False
+        self._draft_mark = stats.draft_calls
+
+    def put(self, value: torch.Tensor) -> None:
+        if not self._prompt_seen:  # premier appel : le prompt
+            self._prompt_seen = True
+            return
+        self.steps.append((self.stats.draft_calls - self._draft_mark, int(value.shape[-1])))
+        self._draft_mark = self.stats.draft_calls
+
+    def end(self) -> None:
+        pass
+
+
+class _Assistant:
+    def __init__(self, draft: PreTrainedModel) -> None:
+        self.draft = draft
+        self.stats = SpeculativeStats()
+        self._hooks = [draft.register_forward_hook(self.stats.count_draft)]
+
+    def remove_hooks(self) -> None:
+        for hook in self._hooks:
+            hook.remove()
+
+
+_ASSISTANTS: dict[int, _Assistant | None] = {}
+_ASSISTANTS_LOCK = threading.Lock()
+
+
+def _model_name(model: PreTrainedModel) -> str:
+    return str(getattr(model, "name_or_path", ""))
+
+
+def attach_assistant(target: PreTrainedModel, draft: PreTrainedModel) -> _Assistant:
+    """
+    Associe un modèle brouillon déjà chargé au modèle cible (utilisé aussi par le test CPU).
+    """
+    draft.generation_config.num_assistant_tokens = NUM_ASSISTANT_TOKENS
+    assistant = _Assistant(draft)
+    with _ASSISTANTS_LOCK:
+        _ASSISTANTS[id(target)] = assistant
+    return assistant
+
+
+def get_assistant(model: PreTrainedModel) -> _Assistant | None:
+    """
+    Brouillon associé au modèle, chargé au premier appel si le mode est actif et le modèle est le 8B.
+    """
+    with _ASSISTANTS_LOCK:
+        if id(model) in _ASSISTANTS:
+            return _ASSISTANTS[id(model)]
+        if not SPECULATIVE or _model_name(model) != MODEL_8B or DRAFT_MODEL == MODEL_8B:
+            _ASSISTANTS[id(model)] = None
+            return None
+    try:
+        draft = load_draft_model(DRAFT_MODEL)
+    except Exception as e:
+        logger.warning(f"⚠️ Brouillon {DRAFT_MODEL} indisponible, décodage classique : {e}")
+        with _ASSISTANTS_LOCK:
+            _ASSISTANTS[id(model)] = None
+        return None
+    return attach_assistant(model, draft)
+
+
+def release_assistant(model: PreTrainedModel | None = None) -> None:
+    """
+    Libère le brouillon du modèle donné (ou de tous) ; appelé au déchargement du VLM.
+    """
+    with _ASSISTANTS_LOCK:
+        keys = list(_ASSISTANTS) if model is None else [id(model)]
+        for key in keys:
+            assistant = _ASSISTANTS.pop(key, None)
+            if assistant is None:
+                continue
+            if assistant.stats.runs:
+                logger.info(assistant.stats.summary())
+            assistant.remove_hooks()
+
+
+def generate_assisted(
+    inputs: BatchFeature,
+    processor: ProcessorMixin,
+    model: PreTrainedModel,
+    tokenizer_lock: threading.Lock | None = None,
+    **generate_kwargs: Any,
+) -> torch.Tensor:
+    """
+    Génération avec le brouillon si disponible (batch d'une ligne), sinon chemin classique (`generate_with_prefix`).
+
+    Le chemin assisté contourne le cache KV du prompt système (voir l'en-tête du module).
+    """
+    assistant = get_assistant(model) if inputs["input_ids"].shape[0] == 1 else None
+    if assistant is None:
+        return generate_with_prefix(inputs, processor, model, tokenizer_lock, **generate_kwargs)
+
+    stats = assistant.stats
+    baseline = BASELINE_EVERY > 0 and stats.runs % BASELINE_EVERY == 0
+    counter = _StepCounter(stats)
+    start = time.perf_counter()
+    if baseline:
+        output = model.generate(**inputs, **generate_kwargs)
+    else:
+        output = model.generate(**inputs, assistant_model=assistant.draft, streamer=counter, **generate_kwargs)
+    elapsed = time.perf_counter() - start
+    new_tokens = int(output.shape[1] - inputs["input_ids"].shape[1])
+
+    stats.runs += 1
+    if baseline:
+        stats.plain_time += elapsed
+        stats.plain_tokens += new_tokens
+    else:
+        # Dernière étape exclue : tronquée par la longueur maximale ou l'EOS
+        for drafted, valid in counter.steps[:-1]:
+            stats.drafted += drafted
+            stats.accepted += valid - 1
+        stats.assisted_time += elapsed
+        stats.assisted_tokens += new_tokens
+    logger.debug(f"🎯 {'Référence' if baseline else 'Assisté'} : {new_tokens} tokens en {elapsed:.2f}s")
+    if stats.runs % STATS_LOG_EVERY == 0:
+        logger.info(stats.summary())
+    return output
+
+
+def _cpu_check(target_name: str, draft_name: str, runs: int = 4) -> SpeculativeStats:
+    """
+    Test de bout en bout sur CPU : cible et brouillon (petits checkpoints), une image de test, génération assistée.
+    """
+    from transformers import AutoModelForImageTextToText
+
+    from smartcut.gen_keywords.generate_keywords import MAX_NEW_TOKENS, prepare_inputs
+
+    processor = AutoProcessor.from_pretrained(target_name)
+    target = AutoModelForImageTextToText.from_pretrained(target_name, torch_dtype=torch.float32).eval()
+    draft = AutoModelForImageTextToText.from_pretrained(draft_name, torch_dtype=torch.float32).eval()
+    assistant = attach_assistant(target, draft)
+
+    image = Image.new("RGB", (224, 224), (128, 96, 64))
+    for i in range(runs):
+        inputs = prepare_inputs([image], processor)
+        output = generate_assisted(inputs, processor, target, max_new_tokens=MAX_NEW_TOKENS, do_sample=False)
+        logger.info(f"🧪 Génération {i + 1}/{runs} : {output.shape[1] - inputs['input_ids'].shape[1]} tokens")
+    logger.info(assistant.stats.summary())
+    release_assistant(target)
+    return assistant.stats
+
+
+if __name__ == "__main__":
+    _cpu_check(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 4)
@@ -0,0 +1,169 @@
+"""
+Comptage exact des tokens d'un batch et choix du budget de pixels par frame.
+
+Le nombre de tokens visuels d'une image dépend de sa résolution finale : `process_vision_info` la redimensionne
+d'abord (facteur 28, bornes min/max_pixels du message), puis l'image processor du modèle la ré-aligne sur son propre
+facteur (patch_size × merge_size) ; chaque bloc fusionné vaut un token. Le planificateur cherche, pour un batch donné,
+le plus grand `max_pixels` par frame dont le total (texte + images) tient dans :
+
+- `LIMIT_TOKENS - MAX_NEW_TOKENS` (contexte du modèle) ;
+- la cible de latence `latency_target_s × prefill_tokens_per_s` si elle est définie.
+
+Le plafond de la recherche est `planner_max_pixels` (défaut : `max_pixels`), borné par la résolution native des frames.
+Les frames sont extraites jusqu'à ce plafond (`frame_size`) : les segments courts obtiennent ainsi des frames plus
+nettes, les longs sont réduits et ne débordent plus du contexte.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any
+
+from qwen_vl_utils.vision_process import smart_resize
+from transformers import ProcessorMixin
+
+from shared.models.config_manager import CONFIG
+from shared.utils.logger import get_logger
+from smartcut.gen_keywords.prefix_cache import current_prompts
+
+logger = get_logger("SmartCut")
+
+PIXEL_UNIT = 28 * 28  # unité des bornes *_pixels du YAML (convention ComfyUI)
+VL_UTILS_FACTOR = 28  # facteur de redimensionnement de qwen_vl_utils (image_patch_size=14 × merge 2)
+IMAGE_WRAPPER_TOKENS = 2  # <|vision_start|> … <|vision_end|>
+
+MIN_PIXELS: int = CONFIG.smartcut["generate_keywords"]["min_pixels"] * PIXEL_UNIT
+MAX_PIXELS: int = CONFIG.smartcut["generate_keywords"]["max_pixels"] * PIXEL_UNIT
+# Plafond du planificateur et de la taille d'extraction des frames (unités 28×28 ; 0 = max_pixels)
+PLANNER_MAX_PIXELS: int = CONFIG.smartcut["generate_keywords"].get("planner_max_pixels", 0) * PIXEL_UNIT or MAX_PIXELS
+MAX_NEW_TOKENS: int = CONFIG.smartcut["generate_keywords"]["max_new_tokens"]
+LIMIT_TOKENS: int = CONFIG.smartcut["analyse_segment"]["limit_tokens"]
+LATENCY_TARGET_S: float = CONFIG.smartcut["analyse_segment"].get("latency_target_s", 0)
+PREFILL_TOKENS_PER_S: float = CONFIG.smartcut["analyse_segment"].get("prefill_tokens_per_s", 4000)
+
+_PROMPT_TOKENS: dict[tuple[int, str, str], int] = {}
+
+
+def processor_geometry(processor: ProcessorMixin) -> tuple[int, int | None, int | None]:
+    """
+    (facteur, min_pixels, max_pixels) de l'image processor du modèle.
+    """
+    image_processor: Any = getattr(processor, "image_processor", None)
+    patch_size = getattr(image_processor, "patch_size", 14) or 14
+    merge_size = getattr(image_processor, "merge_size", 2) or 2
+    size = getattr(image_processor, "size", None) or {}
+    min_pixels = getattr(image_processor, "min_pixels", None) or size.get("shortest_edge")
+    max_pixels = getattr(image_processor, "max_pixels", None) or size.get("longest_edge")
+    return patch_size * merge_size, min_pixels, max_pixels
+
+
+def image_tokens(
+    processor: ProcessorMixin,
+    width: int,
+    height: int,
+    min_pixels: int = MIN_PIXELS,
+    max_pixels: int = MAX_PIXELS,
+) -> int:
+    """
+    Tokens visuels d'une image (width × height) après les deux redimensionnements, balises comprises.
+    """
+    factor, proc_min, proc_max = processor_geometry(processor)
+    h1, w1 = smart_resize(height, width, factor=VL_UTILS_FACTOR, min_pixels=min_pixels, max_pixels=max_pixels)
+    h2, w2 = smart_resize(h1, w1, factor=factor, min_pixels=proc_min, max_pixels=proc_max)
+    return int((h2 // factor) * (w2 // factor)) + IMAGE_WRAPPER_TOKENS
+
+
+def prompt_tokens(processor: ProcessorMixin, prompt_name: str = "keywords") -> int:
+    """
+    Tokens du texte (chat template system + user, sans image), mis en cache par processor et texte des prompts.
+    """
+    prompts = current_prompts()
+    key = (id(processor), str(prompts["system_keywords"]), str(prompts[prompt_name]))
+    if key not in _PROMPT_TOKENS:
+        messages = [
+            {"role": "system", "content": prompts["system_keywords"]},
+            {"role": "user", "content": [{"type": "text", "text": prompts[prompt_name]}]},
+        ]
+        text = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        _PROMPT_TOKENS[key] = len(processor.tokenizer(text)["input_ids"])
+    return _PROMPT_TOKENS[key]
+
+
+def count_tokens(
+    processor: ProcessorMixin,
+    image_sizes: list[tuple[int, int]],
+    max_pixels: int = MAX_PIXELS,
+    prompt_name: str = "keywords",
+) -> int:
+    """
+    Tokens d'entrée d'une ligne de batch : texte + somme des images (tailles (largeur, hauteur)).
+    """
+    per_size: dict[tuple[int, int], int] = {}
+    total = prompt_tokens(processor, prompt_name)
+    for size in image_sizes:
+        if size not in per_size:
+            per_size[size] = image_tokens(processor, size[0], size[1], min(MIN_PIXELS, max_pixels), max_pixels)
+        total += per_size[size]
+    return total
+
+
+def token_cap() -> int:
+    """
+    Budget d'entrée : contexte du modèle (moins la génération) et, si définie, cible de latence de prefill.
+    """
+    cap = LIMIT_TOKENS - MAX_NEW_TOKENS
+    if LATENCY_TARGET_S > 0:
+        cap = min(cap, int(LATENCY_TARGET_S * PREFILL_TOKENS_PER_S))
+    return cap
+
+
+def frame_size(base: tuple[int, int], max_pixels: int = PLANNER_MAX_PIXELS) -> tuple[int, int]:
+    """
+    Taille d'extraction des frames (largeur, hauteur) : `base` agrandie à ratio constant jusqu'à `max_pixels`
+    (multiples de VL_UTILS_FACTOR), jamais réduite ; le planificateur la réduit ensuite batch par batch.
+    """
+    width, height = base
+    scale = math.sqrt(max_pixels / (width * height))
+    if scale <= 1:
+        return base
+    return (
+        max(width, int(width * scale) // VL_UTILS_FACTOR * VL_UTILS_FACTOR),
+        max(height, int(height * scale) // VL_UTILS_FACTOR * VL_UTILS_FACTOR),
+    )
+
+
+def plan_max_pixels(
+    processor: ProcessorMixin,
+    image_sizes: list[tuple[int, int]],
+    prompt_name: str = "keywords",
+    cap: int | None = None,
+    ceiling: int | None = None,
+) -> tuple[int, int]:
+    """
+    Plus grand max_pixels par frame dont le batch tient dans `cap` ; retourne (max_pixels, tokens).
+
+    Borne haute : `ceiling` (défaut PLANNER_MAX_PIXELS) et résolution native de la plus grande frame, au-delà de
+    laquelle le nombre de tokens ne change plus. Recherche dichotomique par pas de VL_UTILS_FACTOR² (le nombre de
+    tokens croît avec max_pixels).
+    """
+    cap = token_cap() if cap is None else cap
+    step = VL_UTILS_FACTOR * VL_UTILS_FACTOR
+    native = max((w * h for w, h in image_sizes), default=step)
+    lo, hi = 1, max(1, -(-min(PLANNER_MAX_PIXELS if ceiling is None else ceiling, native) // step))
+    best = lo
+
+    if count_tokens(processor, image_sizes, hi * step, prompt_name) <= cap:
+        best = hi
+    else:
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if count_tokens(processor, image_sizes, mid * step, prompt_name) <= cap:
+                best, lo = mid, mid + 1
+            else:
+                hi = mid - 1
+
+    max_pixels = best * step
+    tokens = count_tokens(processor, image_sizes, max_pixels, prompt_name)
+    if tokens > cap:
+        logger.warning(f"⚠️ {len(image_sizes)} frames dépassent le budget ({tokens:,} > {cap:,}) même au minimum.")
+    return max_pixels, tokens
@@ -0,0 +1,128 @@
+"""
+Service VLM résident (singleton du processus).
+
+Le modèle Qwen3-VL est chargé une seule fois puis partagé par SmartCut, SmartCut Lite et la validation CutMind,
+au lieu d'être rechargé à chaque vidéo ou à chaque segment. Il est déchargé automatiquement après une période
+d'inactivité configurable (`generate_keywords.vlm_idle_timeout`, en secondes) :
+
+- `> 0` : déchargement après N secondes sans utilisation
+- `0` : déchargement dès la fin de l'utilisation (comportement historique)
+- `< 0` : jamais déchargé (jusqu'à `unload()` ou la fin du processus)
+"""
+
+from __future__ import annotations
+
+import gc
+import threading
+import time
+
+import torch
+from transformers import PreTrainedModel, ProcessorMixin
+
+from shared.models.config_manager import CONFIG
+from shared.utils.logger import get_logger
+from smartcut.analyze.analyze_torch_utils import release_gpu_memory
+from smartcut.gen_keywords.load_model import load_and_batches
+from smartcut.gen_keywords.prefix_cache import get_prefix_cache
+from smartcut.gen_keywords.speculative import release_assistant
+
+logger = get_logger("SmartCut")
+
+VLM_IDLE_TIMEOUT: float = CONFIG.smartcut["generate_keywords"].get("vlm_idle_timeout", 300)
+
+LoadedVLM = tuple[ProcessorMixin, PreTrainedModel, str, int]
+
+
+class VLMService:
+    """
+    Détient le modèle chargé et gère son déchargement sur inactivité.
+    """
+
+    def __init__(self, idle_timeout: float = VLM_IDLE_TIMEOUT) -> None:
+        self.idle_timeout = idle_timeout
+        self._lock = threading.RLock()
+        self._loaded: LoadedVLM | None = None
+        self._in_use = False
+        self._last_release = 0.0
+        self._timer: threading.Timer | None = None
+        self.loads = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded is not None
+
+    def acquire(self) -> LoadedVLM:
+        """
+        Retourne (processor, model, model_name, batch_size), en chargeant le modèle si nécessaire.
+        """
+        with self._lock:
+            self._cancel_timer()
+            if self._loaded is None:
+                self._loaded = load_and_batches()
+                self.loads += 1
+            else:
+                logger.info(f"♻️ Modèle {self._loaded[2]} déjà chargé — réutilisation.")
+            self._in_use = True
+            return self._loaded
+
+    def release(self) -> None:
+        """
+        Fin d'utilisation : vide le cache GPU et arme le déchargement sur inactivité.
+        """
+        with self._lock:
+            self._cancel_timer()
+            self._in_use = False
+            self._last_release = time.monotonic()
+            if self.idle_timeout == 0:
+                self.unload()
+                return
+            if torch.cuda.is_available():
+                release_gpu_memory(cache_only=True)
+            if self.idle_timeout > 0:
+                self._timer = threading.Timer(self.idle_timeout, self._unload_if_idle)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def unload(self) -> None:
+        """
+        Décharge le modèle (VRAM libérée), quel que soit le délai d'inactivité.
+        """
+        with self._lock:
+            self._cancel_timer()
+            if self._loaded is None:
+                return
+            model_name = self._loaded[2]
+            self._loaded = None
+            get_prefix_cache().clear()
+            release_assistant()
+            gc.collect()
+            if torch.cuda.is_available():
+                release_gpu_memory(cache_only=False)
+            logger.info(f"💤 Modèle {model_name} déchargé.")
+
+    def _unload_if_idle(self) -> None:
+        with self._lock:
+            idle = time.monotonic() - self._last_release
+            if not self._in_use and idle >= self.idle_timeout:
+                logger.info(f"⏱️ Modèle inactif depuis {idle:.0f}s.")
+                self.unload()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+_SERVICE: VLMService | None = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_vlm_service() -> VLMService:
+    """
+    Service VLM partagé du processus (créé au premier appel).
+    """
+    global _SERVICE
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            _SERVICE = VLMService()
+        return _SERVICE
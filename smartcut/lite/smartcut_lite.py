@@ -16,7 +16,7 @@ from shared.models.config_manager import CONFIG
 from shared.utils.config import JSON_STATES_DIR_SC
 from shared.utils.logger import get_logger
 from shared.utils.safe_runner import safe_main
-from smartcut.analyze.analyze_confidence import compute_confidence
+from smartcut.analyze.analyze_confidence import compute_confidence_batch
 from smartcut.analyze.analyze_utils import extract_keywords_from_filename
 from smartcut.analyze.main_analyze import analyze_video_segments
 from smartcut.lite.relocate_and_rename_segments import relocate_and_rename_segments
@@ -69,9 +69,11 @@ def lite_cut(directory_path: Path) -> None:
 
         # Étape 2️⃣ — Calcul du score de confiance
         logger.info("📊 Calcul des scores de confiance...")
+        done_segments = [seg for seg in session.segments if seg.ai_status == "done"]
+        confidences = dict(zip(map(id, done_segments), compute_confidence_batch(done_segments), strict=True))
         for seg in session.segments:
             if seg.ai_status == "done":
-                seg.confidence = compute_confidence(seg.description, seg.keywords)
+                seg.confidence = confidences[id(seg)]
                 seg.last_updated = datetime.now().isoformat()
                 seg.status = "confidence_done"
                 logger.info(f"  - Segment {seg.id}: confidence = {seg.confidence:.3f}")
@@ -0,0 +1,198 @@
+"""
+SceneScoreCurve
+===============
+
+Courbe des scores de changement de plan (un score par frame décodée).
+
+💡 Principe :
+- La vidéo n'est décodée qu'une seule fois pour calculer le score de chaque frame
+- Les listes de coupures sont ensuite déduites de la courbe pour n'importe quel seuil
+  et n'importe quel intervalle (start/end), sans re-décodage
+- La courbe est persistée dans un sidecar binaire (.npy + méta JSON) à côté du
+  `.smartcut_state.json`, puis mappée en mémoire lors d'une reprise
+- En mode coarse-to-fine, la courbe est creuse : seules les fenêtres candidates sont
+  présentes, les frames absentes sont considérées sans coupure
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from shared.utils.logger import get_logger
+
+logger = get_logger("SmartCut")
+
+# Un enregistrement par frame : index, timestamp (s), score de changement
+SCORE_DTYPE = np.dtype([("frame", "<u4"), ("time", "<f8"), ("score", "<f4")])
+SIDECAR_VERSION = 1
+
+
+def video_signature(video_path: str | Path) -> dict[str, int]:
+    """
+    Clé d'identification de la vidéo source (taille + mtime) pour valider un sidecar.
+    """
+    stat = Path(video_path).stat()
+    return {"video_size": stat.st_size, "video_mtime_ns": stat.st_mtime_ns}
+
+
+@dataclass
+class SceneScoreCurve:
+    """
+    Scores de détection par frame pour une vidéo complète.
+    """
+
+    fps: float
+    duration: float
+    records: np.ndarray  # tableau structuré SCORE_DTYPE, trié par frame
+    backend: str = "content"  # détecteur ayant produit les scores ("content" ou "luma")
+    coarse_step: int = 1  # 1 = courbe dense, N = fenêtres candidates issues d'un échantillonnage 1/N
+    coarse_threshold: float = 0.0  # seuil de sélection des fenêtres candidates (mode coarse)
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self.records["frame"]
+
+    @property
+    def times(self) -> np.ndarray:
+        return self.records["time"]
+
+    @property
+    def scores(self) -> np.ndarray:
+        return self.records["score"]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def detect(
+        self,
+        threshold: float,
+        min_scene_len: int = 15,
+        start: float | None = None,
+        end: float | None = None,
+    ) -> list[tuple[float, float]]:
+        """
+        Déduit la liste des scènes pour un seuil donné, sur toute la vidéo ou sur [start, end].
+
+        Reproduit la logique de ContentDetector : une coupure est posée sur une frame dont le score
+        dépasse le seuil, si au moins `min_scene_len` frames la séparent de la coupure précédente.
+        Retourne une liste vide si aucune coupure n'est trouvée (comme SceneManager).
+        """
+        lo = int(np.searchsorted(self.times, start, side="left")) if start else 0
+        hi = int(np.searchsorted(self.times, end, side="left")) if end else len(self.records)
+        window = self.records[lo:hi]
+        if len(window) == 0:
+            return []
+
+        # La première frame de l'intervalle n'a pas de frame précédente → jamais de coupure
+        first_frame = round(start * self.fps) if start else 0
+        last_cut = first_frame
+        cut_times: list[float] = []
+
+        for idx in np.flatnonzero(window["score"] >= threshold):
+            frame = int(window["frame"][idx])
+            if frame <= first_frame:
+                continue
+            if frame - last_cut >= min_scene_len:
+                cut_times.append(float(window["time"][idx]))
+                last_cut = frame
+
+        if not cut_times:
+            return []
+
+        bounds = [start or 0.0, *cut_times, end or self.duration]
+        return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+    # ============================================================
+    # 💾 Persistence sidecar (.npy mappé en mémoire)
+    # ============================================================
+
+    @staticmethod
+    def _meta_path(path: Path) -> Path:
+        return path.with_suffix(".json")
+
+    def save(self, path: str | Path, video_path: str | Path) -> None:
+        """
+        Sauvegarde la courbe (écriture atomique) avec la signature de la vidéo source.
+        """
+        path = Path(path)
+        meta: dict[str, Any] = {
+            "version": SIDECAR_VERSION,
+            "backend": self.backend,
+            "coarse_step": self.coarse_step,
+            "coarse_threshold": self.coarse_threshold,
+            "fps": self.fps,
+            "duration": self.duration,
+            "count": len(self.records),
+            **video_signature(video_path),
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            with open(tmp_path, "wb") as file:
+                np.save(file, np.ascontiguousarray(self.records, dtype=SCORE_DTYPE))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+
+            meta_path = self._meta_path(path)
+            tmp_meta = meta_path.with_name(f"{meta_path.name}.tmp")
+            with open(tmp_meta, "w", encoding="utf-8") as file:
+                json.dump(meta, file, indent=2)
+            os.replace(tmp_meta, meta_path)
+            logger.info("💾 Courbe de scores sauvegardée dans %s (%d frames)", path, len(self.records))
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.error("❌ Erreur de sauvegarde de la courbe de scores : %s", exc)
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+        video_path: str | Path,
+        backend: str = "content",
+        coarse_step: int = 1,
+        coarse_threshold: float = 0.0,
+    ) -> SceneScoreCurve | None:
+        """
+        Recharge une courbe persistée (mmap) si elle correspond toujours à la vidéo source et au détecteur.
+
+        Une courbe dense reste valable pour une demande coarse ; une courbe coarse ne l'est que pour les mêmes
+        paramètres d'échantillonnage. Retourne None si le sidecar est absent, obsolète ou illisible.
+        """
+        path = Path(path)
+        try:
+            with open(cls._meta_path(path), encoding="utf-8") as file:
+                meta: dict[str, Any] = json.load(file)
+
+            signature = video_signature(video_path)
+            expected = {"version": SIDECAR_VERSION, "backend": backend, **signature}
+            stored_sampling = (meta.get("coarse_step", 1), meta.get("coarse_threshold", 0.0))
+            sampling_ok = stored_sampling[0] == 1 or stored_sampling == (coarse_step, coarse_threshold)
+            if any(meta.get(k) != v for k, v in expected.items()) or not sampling_ok:
+                logger.info("♻️ Courbe de scores obsolète pour %s — recalcul nécessaire.", video_path)
+                return None
+
+            records = np.load(path, mmap_mode="r")
+            if records.dtype != SCORE_DTYPE or len(records) != meta["count"]:
+                logger.warning("⚠️ Sidecar de scores incohérent : %s", path)
+                return None
+
+            logger.info("♻️ Courbe de scores rechargée depuis %s (%d frames)", path, len(records))
+            return cls(
+                fps=float(meta["fps"]),
+                duration=float(meta["duration"]),
+                records=records,
+                backend=backend,
+                coarse_step=int(stored_sampling[0]),
+                coarse_threshold=float(stored_sampling[1]),
+            )
+        except FileNotFoundError:
+            return None
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.error("Erreur de chargement de la courbe de scores : %s", exc)
+            return None
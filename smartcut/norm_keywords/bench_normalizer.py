@@ -0,0 +1,123 @@
+"""
+Benchmark de KeywordNormalizer sur un vocabulaire réaliste de 5 000 mots-clés canoniques.
+
+Compare, sur les mêmes mots inconnus et avec des caches vides :
+
+- le chemin mot par mot (`normalize` : un encodage et une écriture du cache par mot) ;
+- le chemin groupé (`normalize_many` : un encodage, un scoring matriciel, une écriture du cache).
+
+Le cache d'embeddings persistant est désactivé pour mesurer les encodages réels. Les fichiers (mapping, cache,
+interdits) sont écrits dans un répertoire temporaire.
+
+Usage : python -m smartcut.norm_keywords.bench_normalizer [taille_vocabulaire] [nb_mots]
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+
+from shared.utils.logger import get_logger
+from smartcut.embeddings import store
+from smartcut.norm_keywords.keyword_normalizer import KeywordNormalizer
+
+logger = get_logger("SmartCut")
+
+SUBJECTS = (
+    "plage forêt montagne rue ville voiture vélo bateau avion train chat chien cheval oiseau enfant femme homme "
+    "foule marché cuisine salon jardin rivière lac mer neige pluie soleil nuit crépuscule aube "
+    "concert danse sport football tennis course piscine parc pont gare port château église musée bureau école "
+    "fête mariage anniversaire repas pique-nique randonnée camping feu désert champ ferme vignoble route "
+    "tunnel aéroport stade plateau tournage studio scène spectacle cirque zoo aquarium bibliothèque magasin"
+).split()
+QUALIFIERS = (
+    "ensoleillé nocturne enneigé pluvieux brumeux urbain rural ancien moderne coloré sombre lumineux calme animé "
+    "vide bondé intérieur extérieur aérien sous-marin rapide lent festif familial romantique sportif touristique "
+    "historique industriel naturel sauvage tropical hivernal estival automnal printanier vintage panoramique "
+    "macro large ralenti accéléré drone embarqué monochrome"
+).split()
+
+
+def build_vocabulary(size: int = 5000, seed: int = 0) -> list[str]:
+    """
+    `size` mots-clés canoniques (sujets, « sujet qualificatif », « sujet qualificatif qualificatif »), reproductibles.
+    """
+    rng = random.Random(seed)
+    singles = [f"{s} {q}" for s, q in itertools.product(SUBJECTS, QUALIFIERS)]
+    doubles = [f"{s} {a} {b}" for s, a, b in itertools.product(SUBJECTS, QUALIFIERS, QUALIFIERS) if a < b]
+    rng.shuffle(singles)
+    rng.shuffle(doubles)
+    return (list(SUBJECTS) + singles + doubles)[:size]
+
+
+def build_queries(vocabulary: list[str], count: int = 2000, seed: int = 1) -> list[str]:
+    """
+    Mots à normaliser : variantes proches du vocabulaire (pluriels, inversions) et mots hors vocabulaire.
+    """
+    rng = random.Random(seed)
+    queries: dict[str, None] = {}
+    while len(queries) < count:
+        word = rng.choice(vocabulary)
+        variant = rng.randrange(3)
+        if variant == 0:
+            queries[f"{word}s"] = None
+        elif variant == 1 and " " in word:
+            first, rest = word.split(" ", 1)
+            queries[f"{rest} {first}"] = None
+        else:
+            queries[f"{word} {rng.choice(QUALIFIERS)} {rng.randrange(1000)}"] = None
+    return list(queries)
+
+
+def _normalizer(root: Path, vocabulary: list[str], name: str) -> KeywordNormalizer:
+    mapping_path = root / f"{name}_mapping.json"
+    with open(mapping_path, "w", encoding="utf-8") as f:
+        json.dump({word: word for word in vocabulary}, f, ensure_ascii=False)
+    return KeywordNormalizer(
+        mapping_path=mapping_path,
+        forbidden_path=root / f"{name}_forbidden.json",
+        cache_path=root / f"{name}_cache.json",
+    )
+
+
+def benchmark_normalizer(vocab_size: int = 5000, num_words: int = 2000) -> dict[str, float]:
+    store.EMBEDDING_CACHE = False
+    vocabulary = build_vocabulary(vocab_size)
+    queries = build_queries(vocabulary, num_words)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        per_word = _normalizer(root, vocabulary, "per_word")
+        per_word.model.encode(["préchauffage"])  # chargement du modèle hors mesure
+
+        t0 = time.perf_counter()
+        single = [per_word.normalize(word) for word in queries]
+        per_word_s = time.perf_counter() - t0
+
+        bulk = _normalizer(root, vocabulary, "bulk")
+        t0 = time.perf_counter()
+        grouped = bulk.normalize_many(queries)
+        bulk_s = time.perf_counter() - t0
+
+    agreement = sum(a == b for a, b in zip(single, grouped, strict=True)) / len(queries)
+    result = {
+        "vocabulary": len(vocabulary),
+        "words": len(queries),
+        "per_word_s": round(per_word_s, 3),
+        "bulk_s": round(bulk_s, 3),
+        "speedup": round(per_word_s / bulk_s, 1) if bulk_s else 0.0,
+        "agreement": round(agreement, 4),
+    }
+    logger.info(f"📊 Normalisation : {result}")
+    return result
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    print(benchmark_normalizer(size, words))
@@ -2,22 +2,31 @@
 keyword_normalizer.py — version avec mode configurable
 ------------------------------------------------------
 Normalisation des mots-clés avec mapping manuel + embeddings + modes de filtrage.
+
+Les embeddings des candidats (valeurs du mapping) sont calculés une fois, normalisés et gardés en matrice : une
+recherche sémantique est un produit matrice-vecteur suivi d'un argmax. La matrice n'est reconstruite que si les
+valeurs de mapping.json changent sur disque ; seules les entrées du cache devenues invalides sont alors supprimées.
 """
 
 import json
+import os
 from pathlib import Path
+import threading
 
-from sentence_transformers import SentenceTransformer, util
+import numpy as np
 
 from shared.models.config_manager import CONFIG
 from shared.utils.config import KW_CACHE_FILE_SC, KW_FORBIDDEN_FILE_SC, KW_MAPPING_FILE_SC
 from shared.utils.logger import get_logger
+from smartcut.embeddings.service import get_embedding_service
+from smartcut.embeddings.store import encode_cached
 
 logger = get_logger("SmartCut")
 
 MODEL_NAME = CONFIG.smartcut["keyword_normalizer"]["model_name_key"]
 MODE = CONFIG.smartcut["keyword_normalizer"]["mode"]
 SIMILARITY_THRESHOLD = CONFIG.smartcut["keyword_normalizer"]["similarity_threshold"]
+SCORE_CHUNK = 1024  # mots scorés par produit matriciel (borne la mémoire des scores)
 
 
 class KeywordNormalizer:
@@ -32,17 +41,28 @@ class KeywordNormalizer:
         mode: str = MODE,  # "full", "strict" ou "mixed"
         mapping_path: Path = KW_MAPPING_FILE_SC,
         forbidden_path: Path = KW_FORBIDDEN_FILE_SC,
+        cache_path: Path = KW_CACHE_FILE_SC,
     ) -> None:
-        self.model = SentenceTransformer(model_name)
+        self.model = get_embedding_service().get(model_name)
+        self.model_name = model_name
         self.threshold = threshold
+        self.mapping_path = mapping_path
+        self.forbidden_path = forbidden_path
+        self.cache_path = cache_path
         self.mapping = self._load_mapping(mapping_path)
         self.forbidden = self._load_forbidden(forbidden_path)
         self.cache = self._load_cache()
         self.mode = mode
-        # Tri et sauvegarde automatique des fichiers au démarrage
+        # Tri et sauvegarde automatique des fichiers au démarrage (sans réécriture s'ils sont déjà triés)
         self._save_mapping()
         self._save_forbidden()
 
+        self.candidates: list[str] = []
+        self.candidate_set: set[str] = set()
+        self.candidate_matrix: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        self._mapping_signature = self._file_signature(mapping_path)
+        self._build_candidates()
+
         if self.mode not in {"full", "strict", "mixed"}:
             raise ValueError("Mode invalide : choisissez 'full', 'strict' ou 'mixed'.")
 
@@ -75,15 +95,29 @@ class KeywordNormalizer:
             logger.info("ℹ️ Aucun mapping.json trouvé — aucun mapping appliqué.")
             return {}
 
+    @staticmethod
+    def _write_json(path: Path, data: object) -> bool:
+        """
+        Écrit `data` (indenté) dans `path` sauf si le fichier a déjà exactement ce contenu ; True si écrit.
+        """
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+        try:
+            if path.read_text(encoding="utf-8") == text:
+                return False
+        except (OSError, UnicodeDecodeError):
+            pass
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return True
+
     def _save_mapping(self) -> None:
         """
-        Sauvegarde le mapping trié alphabétiquement dans mapping.json.
+        Sauvegarde le mapping trié alphabétiquement dans mapping.json (s'il n'y est pas déjà sous cette forme).
         """
         try:
             sorted_mapping = dict(sorted(self.mapping.items()))
-            with open(KW_MAPPING_FILE_SC, "w", encoding="utf-8") as f:
-                json.dump(sorted_mapping, f, indent=2, ensure_ascii=False)
-            logger.info("Mapping sauvegardé (%d entrées, trié alphabétiquement).", len(sorted_mapping))
+            if self._write_json(self.mapping_path, sorted_mapping):
+                logger.info("Mapping sauvegardé (%d entrées, trié alphabétiquement).", len(sorted_mapping))
         except Exception as e:
             logger.error("Erreur lors de la sauvegarde du mapping : %s", e)
 
@@ -106,13 +140,12 @@ class KeywordNormalizer:
 
     def _save_forbidden(self) -> None:
         """
-        Sauvegarde la liste de mots interdits triée alphabétiquement dans forbidden.json.
+        Sauvegarde la liste de mots interdits triée alphabétiquement dans forbidden.json (si elle a changé).
         """
         try:
             sorted_forbidden = sorted(set(self.forbidden))
-            with open(KW_FORBIDDEN_FILE_SC, "w", encoding="utf-8") as f:
-                json.dump(sorted_forbidden, f, indent=2, ensure_ascii=False)
-            logger.info("Liste de mots interdits sauvegardée (%d entrées triées).", len(sorted_forbidden))
+            if self._write_json(self.forbidden_path, sorted_forbidden):
+                logger.info("Liste de mots interdits sauvegardée (%d entrées triées).", len(sorted_forbidden))
         except Exception as e:
             logger.error("Erreur lors de la sauvegarde de la liste interdite : %s", e)
 
@@ -120,12 +153,12 @@ class KeywordNormalizer:
         """
         Charge le cache depuis keyword_cache.json et le trie alphabétiquement.
         """
-        if KW_CACHE_FILE_SC.exists():
+        if self.cache_path.exists():
             try:
-                with open(KW_CACHE_FILE_SC, encoding="utf-8") as f:
+                with open(self.cache_path, encoding="utf-8") as f:
                     cache = json.load(f)
                 sorted_cache = dict(sorted(cache.items()))
-                logger.info("Cache chargé depuis %s (%d entrées triées).", KW_CACHE_FILE_SC, len(sorted_cache))
+                logger.info("Cache chargé depuis %s (%d entrées triées).", self.cache_path, len(sorted_cache))
                 return sorted_cache
             except json.JSONDecodeError:
                 logger.warning("Cache corrompu, recréation.")
@@ -139,83 +172,119 @@ class KeywordNormalizer:
         """
         try:
             sorted_cache = dict(sorted(self.cache.items()))
-            with open(KW_CACHE_FILE_SC, "w", encoding="utf-8") as f:
+            with open(self.cache_path, "w", encoding="utf-8") as f:
                 json.dump(sorted_cache, f, indent=2, ensure_ascii=False)
             logger.info("Cache sauvegardé (%d entrées, trié alphabétiquement).", len(sorted_cache))
         except Exception as e:
             logger.error("Erreur lors de la sauvegarde du cache : %s", e)
 
-    # -------------------- Normalisation -------------------- #
+    # -------------------- Matrice des candidats -------------------- #
 
-    def _normalize_with_embeddings(self, word: str, candidates: list[str]) -> str:
+    @staticmethod
+    def _file_signature(path: Path) -> tuple[int, int]:
         """
-        Compare un mot avec les candidats via embeddings et retourne le plus proche.
+        (mtime_ns, taille) du fichier ; (0, 0) s'il est absent.
         """
-        word_emb = self.model.encode(word, convert_to_tensor=True)
-        if len(word_emb.shape) > 1 and word_emb.shape[0] > 1:
-            logger.debug(f"⚙️ Moyenne des {word_emb.shape[0]} tokens pour '{word}'.")
-            word_emb = word_emb.mean(dim=0, keepdim=True)
-        logger.debug("Nombre de candidats reçus : %d", len(candidates))
-        logger.debug("Exemples de candidats : %s", candidates[:10])
-        cand_emb = self.model.encode(candidates, convert_to_tensor=True)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return (0, 0)
+        return (st.st_mtime_ns, st.st_size)
 
-        # 🧠 --- LOGS DE DIAGNOSTIC ---
-        logger.debug(
-            "🔍 _normalize_with_embeddings — word='%s' | word_emb.shape=%s | cand_emb.shape=%s",
-            word,
-            tuple(word_emb.shape),
-            tuple(cand_emb.shape),
-        )
-        # ⚙️ --- PATCH : moyenne des tokens si le mot d'entrée produit plusieurs embeddings ---
-        if len(word_emb.shape) > 1 and word_emb.shape[0] > 1:
-            logger.debug(
-                "⚙️ Moyenne des %d tokens du mot '%s' pour un embedding global.",
-                word_emb.shape[0],
-                word,
-            )
-            word_emb = word_emb.mean(dim=0, keepdim=True)
-
-        scores = util.cos_sim(word_emb, cand_emb)[0]
-
-        # Log les stats du tensor
-        logger.debug(
-            "Scores tensor shape=%s | device=%s | valeurs=%s",
-            tuple(scores.shape),
-            scores.device,
-            scores[:10],  # affiche les 10 premiers max
-        )
+    def _build_candidates(self) -> None:
+        """
+        Encode une fois les valeurs du mapping en une matrice normalisée (une ligne par candidat).
+        """
+        self.candidates = sorted(set(self.mapping.values()))
+        self.candidate_set = set(self.candidates)
+        if self.candidates:
+            self.candidate_matrix = encode_cached(self.model, self.model_name, self.candidates, normalize=True)
+        else:
+            self.candidate_matrix = np.zeros((0, 0), dtype=np.float32)
+        logger.info("🧮 Matrice des candidats : %d mots-clés canoniques.", len(self.candidates))
 
-        best_idx = int(scores.argmax())
-        best_score = float(scores[best_idx])
-        logger.debug(
-            "✅ Best match index=%d | best_score=%.4f | candidate='%s'",
-            best_idx,
-            best_score,
-            candidates[best_idx] if candidates else "N/A",
+    def _refresh_mapping(self) -> None:
+        """
+        Recharge mapping.json si le fichier a changé (date ou taille), puis compare son contenu :
+
+        - contenu identique : rien à faire ;
+        - mêmes valeurs : seules les entrées du cache contredites par le nouveau mapping sont supprimées ;
+        - valeurs différentes : matrice reconstruite, et les entrées du cache dont la valeur n'est plus un candidat
+          (y compris les mots restés sous le seuil, à réévaluer) sont supprimées.
+        """
+        signature = self._file_signature(self.mapping_path)
+        if signature == self._mapping_signature:
+            return
+        self._mapping_signature = signature
+        mapping = self._load_mapping(self.mapping_path)
+        if mapping == self.mapping:
+            return
+
+        self.mapping = mapping
+        candidates_changed = set(mapping.values()) != self.candidate_set
+        if candidates_changed:
+            self._build_candidates()
+        stale = [
+            word
+            for word, norm in self.cache.items()
+            if (word in mapping and mapping[word] != norm) or (candidates_changed and norm not in self.candidate_set)
+        ]
+        for word in stale:
+            del self.cache[word]
+        if stale:
+            self._save_cache()
+        logger.info(
+            "🔄 mapping.json modifié : %s, %d entrées du cache invalidées.",
+            "candidats reconstruits" if candidates_changed else "candidats inchangés",
+            len(stale),
         )
 
-        return candidates[best_idx] if best_score >= self.threshold else word
+    # -------------------- Normalisation -------------------- #
 
     def normalize(self, word: str) -> str:
-        word = word.lower().strip()
+        return self.normalize_many([word])[0]
 
-        if word in self.cache:
-            return self.cache[word]
-
-        if word in self.mapping:
-            norm = self.mapping[word]
-            self.cache[word] = norm
-            return norm
-
-        candidates = list(set(self.mapping.values()))
-        norm = self._normalize_with_embeddings(word, candidates)
-        logger.debug(f"norm = {norm}")
-        self.cache[word] = norm
-        self._save_cache()
-
-        if norm != word:
-            logger.info("→ '%s' reconnu comme '%s' (similarité sémantique)", word, norm)
-        return norm
+    def normalize_many(self, words: list[str]) -> list[str]:
+        """
+        Normalise une liste de mots en une passe : cache et mapping d'abord, puis un seul encodage de tous les mots
+        inconnus, un seul scoring matriciel contre les candidats et une seule écriture du cache.
+        """
+        self._refresh_mapping()
+        words = [w.lower().strip() for w in words]
+
+        misses: list[str] = []
+        for word in dict.fromkeys(words):
+            if word in self.cache:
+                continue
+            if word in self.mapping:
+                self.cache[word] = self.mapping[word]
+            else:
+                misses.append(word)
+
+        if misses:
+            for word, norm in zip(misses, self._match_candidates(misses), strict=True):
+                self.cache[word] = norm
+                if norm != word:
+                    logger.info("→ '%s' reconnu comme '%s' (similarité sémantique)", word, norm)
+            self._save_cache()
+
+        return [self.cache[w] for w in words]
+
+    def _match_candidates(self, words: list[str]) -> list[str]:
+        """
+        Candidat le plus proche de chaque mot (ou le mot lui-même sous le seuil), par blocs de SCORE_CHUNK mots.
+        """
+        if not self.candidates:
+            return list(words)
+        embeddings = encode_cached(self.model, self.model_name, words, normalize=True)
+        matches: list[str] = []
+        for i in range(0, len(words), SCORE_CHUNK):
+            scores = embeddings[i : i + SCORE_CHUNK] @ self.candidate_matrix.T
+            best = scores.argmax(axis=1)
+            best_scores = scores[np.arange(len(best)), best]
+            for word, idx, score in zip(words[i : i + SCORE_CHUNK], best, best_scores, strict=True):
+                matches.append(self.candidates[int(idx)] if float(score) >= self.threshold else word)
+        return matches
 
     # -------------------- Mode de traitement -------------------- #
 
@@ -231,14 +300,31 @@ class KeywordNormalizer:
         else:
             mots = []
 
-        # 🔹 Normalisation individuelle
-        normalises = [self.normalize(m) for m in mots]
+        # 🔹 Normalisation groupée (un seul encodage pour les mots inconnus)
+        return self._apply_mode(self.normalize_many(mots))
 
+    def normalize_session_keywords(self, keyword_lists: list[list[str]]) -> list[list[str]]:
+        """
+        Normalise les listes de mots-clés de plusieurs segments avec un seul passage `normalize_many`.
+        """
+        lists = [[m.strip() for m in kws if isinstance(m, str) and m.strip()] for kws in keyword_lists]
+        flat = self.normalize_many([m for kws in lists for m in kws])
+        results: list[list[str]] = []
+        offset = 0
+        for kws in lists:
+            results.append(self._apply_mode(flat[offset : offset + len(kws)]))
+            offset += len(kws)
+        return results
+
+    def _apply_mode(self, normalises: list[str]) -> list[str]:
+        """
+        Applique le mode (strict / mixed / full) puis le filtre des mots interdits.
+        """
         # 🔹 Gestion du mode
         if self.mode == "strict":
-            normalises = [m for m in normalises if m in self.mapping.values()]
+            normalises = [m for m in normalises if m in self.candidate_set]
         elif self.mode == "mixed":
-            normalises = sorted(set(normalises), key=lambda x: x not in self.mapping.values())
+            normalises = sorted(set(normalises), key=lambda x: x not in self.candidate_set)
         else:
             normalises = sorted(set(normalises))
 
@@ -246,3 +332,17 @@ class KeywordNormalizer:
         normalises = [m for m in normalises if m.lower() not in self.forbidden]
 
         return normalises
+
+
+_NORMALIZERS: dict[str, KeywordNormalizer] = {}
+_NORMALIZERS_LOCK = threading.Lock()
+
+
+def get_keyword_normalizer(mode: str = MODE) -> KeywordNormalizer:
+    """
+    Normaliseur partagé du processus pour `mode` (fichiers et modèle chargés une seule fois).
+    """
+    with _NORMALIZERS_LOCK:
+        if mode not in _NORMALIZERS:
+            _NORMALIZERS[mode] = KeywordNormalizer(mode=mode)
+        return _NORMALIZERS[mode]
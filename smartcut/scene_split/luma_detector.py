@@ -0,0 +1,155 @@
+"""
+Détecteur de scènes "luma" — alternative vectorisée à ContentDetector.
+
+ffmpeg décode et réduit chaque frame en niveaux de gris (~160 px de large) puis envoie le flux brut via un pipe ; les
+deltas inter-frames et les histogrammes sont calculés par blocs de frames avec NumPy. Le score produit alimente la même
+SceneScoreCurve que ContentDetector, donc les listes de coupures gardent le format (start, end) habituel.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import subprocess
+
+import numpy as np
+
+from shared.ffmpeg.ffmpeg_utils import get_fps, get_resolution
+from shared.models.config_manager import CONFIG
+from shared.utils.logger import get_logger
+from smartcut.models_sc.scene_curve import SCORE_DTYPE
+
+logger = get_logger("SmartCut")
+
+LUMA_WIDTH: int = CONFIG.smartcut["smartcut"].get("scene_luma_width", 160)
+BLOCK_FRAMES = 256  # frames traitées par opération NumPy
+HIST_BINS = 64
+
+
+def _scaled_size(video_path: str, width: int = LUMA_WIDTH) -> tuple[int, int]:
+    """
+    Taille réduite (largeur, hauteur paire) en conservant le ratio.
+    """
+    src_w, src_h = get_resolution(Path(video_path))
+    if not src_w or not src_h:
+        raise ValueError(f"Résolution introuvable pour {video_path}")
+    height = max(2, round(width * src_h / src_w / 2) * 2)
+    return width, height
+
+
+def block_scores(frames: np.ndarray, prev_frame: np.ndarray | None) -> np.ndarray:
+    """
+    Scores d'un bloc de frames [N, H, W] uint8 (0-255) : moyenne du delta luma absolu et delta d'histogramme.
+
+    La première frame est comparée à `prev_frame` (score nul si None).
+    """
+    stack = frames if prev_frame is None else np.concatenate([prev_frame[None], frames])
+    n = len(stack)
+
+    # Delta moyen de luminance entre frames consécutives
+    pixel_delta = np.abs(np.diff(stack.astype(np.int16), axis=0)).mean(axis=(1, 2))
+
+    # Histogrammes de tout le bloc en un seul bincount (décalage par frame)
+    bins = (stack.astype(np.int64) * HIST_BINS) >> 8
+    offsets: np.ndarray = (np.arange(n) * HIST_BINS)[:, None, None]
+    hist = np.bincount((bins + offsets).ravel(), minlength=n * HIST_BINS).reshape(n, HIST_BINS)
+    hist = hist / float(stack.shape[1] * stack.shape[2])
+    hist_delta = 0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1) * 255.0
+
+    scores: np.ndarray = (pixel_delta + hist_delta) / 2.0
+    if prev_frame is None:
+        scores = np.concatenate([[0.0], scores])
+    return scores.astype(np.float32)
+
+
+def _probe(video_path: str) -> tuple[float, tuple[int, int]]:
+    """
+    FPS et taille réduite de la vidéo (deux appels ffprobe).
+    """
+    fps = get_fps(Path(video_path))
+    if fps <= 0:
+        raise ValueError(f"FPS introuvable pour {video_path}")
+    return fps, _scaled_size(video_path)
+
+
+def score_frames_luma(
+    video_path: str,
+    start_frame: int = 0,
+    end_frame: int | None = None,
+    frame_step: int = 1,
+    probe: tuple[float, tuple[int, int]] | None = None,
+) -> np.ndarray:
+    """
+    Décode [start_frame, end_frame[ via ffmpeg (niveaux de gris réduits) et retourne les scores par frame.
+
+    frame_step > 1 : seule une frame sur N est transmise, le score compare alors deux frames échantillonnées.
+    probe : résultat de `_probe` déjà calculé (évite les appels ffprobe quand plusieurs fenêtres sont décodées).
+    """
+    fps, (width, height) = probe or _probe(video_path)
+    frame_size = width * height
+
+    # Une frame de chevauchement : la première frame décodée n'a pas de frame précédente
+    seek_frame = max(0, start_frame - 1)
+
+    select = f"select=not(mod(n\\,{frame_step}))," if frame_step > 1 else ""
+
+    cmd: list[str] = ["ffmpeg", "-v", "error", "-nostdin"]
+    if seek_frame:
+        cmd += ["-ss", f"{seek_frame / fps:.6f}"]
+    cmd += ["-i", str(video_path)]
+    if end_frame is not None:
+        cmd += ["-frames:v", str(-(-(end_frame - seek_frame) // frame_step))]
+    cmd += [
+        "-an",
+        "-vsync",
+        "0",
+        "-vf",
+        f"{select}scale={width}:{height}:flags=area,format=gray",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "gray",
+        "pipe:1",
+    ]
+
+    chunks: list[np.ndarray] = []
+    prev_frame: np.ndarray | None = None
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        assert proc.stdout is not None
+        while True:
+            raw = proc.stdout.read(frame_size * BLOCK_FRAMES)
+            usable = len(raw) - len(raw) % frame_size
+            if usable <= 0:
+                break
+            frames = np.frombuffer(raw[:usable], dtype=np.uint8).reshape(-1, height, width)
+            chunks.append(block_scores(frames, prev_frame))
+            prev_frame = frames[-1]
+        _, stderr = proc.communicate()
+
+    if proc.returncode != 0:
+        logger.error(f"❌ ffmpeg (luma) a échoué sur {video_path} : {stderr.decode(errors='ignore').strip()}")
+        raise RuntimeError(f"ffmpeg luma decode failed for {video_path}")
+
+    scores = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    records: np.ndarray = np.zeros(len(scores), dtype=SCORE_DTYPE)
+    records["frame"] = seek_frame + np.arange(len(scores)) * frame_step
+    records["time"] = records["frame"] / fps
+    records["score"] = scores
+    kept: np.ndarray = records[records["frame"] >= start_frame]
+    return kept
+
+
+def score_windows_luma(video_path: str, windows: list[tuple[int, int]]) -> np.ndarray:
+    """
+    Scores des fenêtres [a, b[ (triées, disjointes) : une seule sonde ffprobe, un ffmpeg avec seek rapide par fenêtre.
+    """
+    probe = _probe(video_path)
+    chunks = [score_frames_luma(video_path, a, b, probe=probe) for a, b in windows]
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=SCORE_DTYPE)
+
+
+def coarse_candidates_luma(video_path: str, step: int, threshold: float) -> list[int]:
+    """
+    Passe grossière : frames échantillonnées (1 sur `step`) dont l'écart avec l'échantillon précédent dépasse le seuil.
+    """
+    records = score_frames_luma(video_path, frame_step=step)
+    return [int(f) for f in records["frame"][records["score"] >= threshold]]
@@ -4,13 +4,12 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from scenedetect import open_video  # type: ignore
-
 from shared.utils.config import ERROR_DIR_SC
 from shared.utils.logger import get_logger
 from smartcut.scene_split.pyscenedetect import (
-    detect_scenes_with_pyscenedetect,
+    COARSE_MARGIN,
     fill_missing_segments,
+    get_scene_curve,
     refine_long_segments,
 )
 from smartcut.scene_split.split_utils import move_to_error
@@ -25,23 +24,36 @@ def adaptive_scene_split(
     threshold_step: int = 2,
     min_duration: float = 15.0,
     max_duration: float = 180.0,
+    workers: int = 1,
+    backend: str = "content",
+    coarse_step: int = 1,
 ) -> list[tuple[float, float]]:
     """
     Segmentation adaptative complète avec comblement de zones manquantes.
+
+    workers > 1 : détection découpée en chunks décodés en parallèle sur plusieurs cœurs.
+    backend : "content" (ContentDetector) ou "luma" (frames réduites en niveaux de gris, NumPy vectorisé).
+    coarse_step > 1 : échantillonnage 1 frame sur N puis décodage complet uniquement autour des coupures candidates.
     """
     logger.info(f"🚀 Début découpage adaptatif: {video_path}")
 
-    # Récupération durée vidéo
-    video = open_video(video_path)
-    video_duration = video.duration.get_seconds()
+    # Décodage unique (ou sidecar persistant) : toutes les passes travaillent sur la courbe de scores
+    curve = get_scene_curve(
+        video_path,
+        workers=workers,
+        backend=backend,
+        coarse_step=coarse_step,
+        coarse_threshold=min_threshold * COARSE_MARGIN,
+    )
+    video_duration = curve.duration
 
     # Étape 1 : détection globale
-    scenes = detect_scenes_with_pyscenedetect(video_path, threshold=initial_threshold)
+    scenes = curve.detect(threshold=initial_threshold)
     logger.info(f"🎬 {len(scenes)} scènes initiales détectées à th={initial_threshold}")
 
     # Étape 2 : premier raffinage adaptatif
     thresholds: list[float] = list(range(initial_threshold - threshold_step, min_threshold - 1, -threshold_step))
-    refined = refine_long_segments(video_path, scenes, thresholds, min_duration, max_duration)
+    refined = refine_long_segments(curve, scenes, thresholds, min_duration, max_duration)
 
     # Étape 2.5 : comblement des gaps APRÈS le raffinage
     refined = fill_missing_segments(refined, video_duration)
@@ -57,7 +69,7 @@ def adaptive_scene_split(
             logger.debug(f"🪚 Raffinage spécifique des gaps {s:.1f}s–{e:.1f}s (durée {duration:.1f}s)")
             # On descend plus bas en seuils que la première passe
             deep_thresholds: list[float] = list(range(initial_threshold, min_threshold - 1, -threshold_step))
-            sub_scenes = refine_long_segments(video_path, [(s, e)], deep_thresholds, min_duration, max_duration)
+            sub_scenes = refine_long_segments(curve, [(s, e)], deep_thresholds, min_duration, max_duration)
             second_refined.extend(sub_scenes)
         else:
             second_refined.append((s, e))
@@ -65,7 +77,7 @@ def adaptive_scene_split(
     refined = sorted(second_refined, key=lambda x: x[0])
 
     # Deuxième passage de raffinage uniquement sur les gaps ajoutés
-    refined = refine_long_segments(video_path, refined, thresholds, min_duration, max_duration)
+    refined = refine_long_segments(curve, refined, thresholds, min_duration, max_duration)
 
     # Étape 3 : nettoyage (suppression micro-segments)
     refined = [seg for seg in refined if (seg[1] - seg[0]) >= min_duration]
@@ -2,48 +2,288 @@
 
 from __future__ import annotations
 
-from scenedetect import ContentDetector, FrameTimecode, SceneManager, open_video  # type: ignore
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+from pathlib import Path
+import time
 
+import numpy as np
+from scenedetect import ContentDetector, FrameTimecode, SceneManager, StatsManager, open_video  # type: ignore
+
+from shared.utils.config import JSON_STATES_DIR_SC
 from shared.utils.logger import get_logger
+from smartcut.models_sc.scene_curve import SCORE_DTYPE, SceneScoreCurve
+from smartcut.scene_split.luma_detector import coarse_candidates_luma, score_frames_luma, score_windows_luma
 
 logger = get_logger("SmartCut")
 
+# Frames re-décodées avant chaque chunk parallèle (score correct dès la frontière)
+CHUNK_OVERLAP_FRAMES = 8
+# En dessous, le coût de démarrage des process dépasse le gain
+MIN_CHUNK_FRAMES = 2000
+# Coarse-to-fine : seuil des candidats = min_threshold x marge (écart sur N frames ≠ écart entre 2 frames)
+COARSE_MARGIN = 0.75
+# Au-delà de cette part de frames candidates, une passe dense complète est plus rapide
+COARSE_MAX_COVERAGE = 0.5
+# Fenêtres séparées de moins de N frames : décoder l'écart coûte moins qu'un seek (≈ un GOP à décoder)
+COARSE_MERGE_GAP = 48
+# Passes coarse lancées / repliées sur la passe dense (taux de repli journalisé)
+COARSE_STATS = {"runs": 0, "fallbacks": 0}
 
-def detect_scenes_with_pyscenedetect(
-    video_path: str,
-    threshold: float = 30.0,
-    min_scene_len: int = 15,
-    start: float | None = None,
-    end: float | None = None,
-) -> list[tuple[float, float]]:
+
+def _content_detector() -> tuple[SceneManager, StatsManager]:
+    stats_manager = StatsManager()
+    scene_manager = SceneManager(stats_manager=stats_manager)
+    # Seuil maximal : seules les métriques nous intéressent, les coupures sont calculées sur la courbe
+    scene_manager.add_detector(ContentDetector(threshold=255.0))
+    return scene_manager, stats_manager
+
+
+def _stats_records(stats_manager: StatsManager, start_frame: int, last_frame: int, fps: float) -> np.ndarray:
+    """
+    Scores ContentDetector des frames [start_frame, last_frame[ relevés dans le StatsManager.
+    """
+    key = ContentDetector.FRAME_SCORE_KEY
+    records: np.ndarray = np.zeros(max(0, last_frame - start_frame), dtype=SCORE_DTYPE)
+    records["frame"] = np.arange(start_frame, start_frame + len(records))
+    records["time"] = records["frame"] / float(fps)
+    for i, frame_num in enumerate(range(start_frame, last_frame)):
+        value = stats_manager.get_metrics(frame_num, [key])[0]
+        if value is not None:
+            records["score"][i] = value
+    return records
+
+
+def score_frames(video_path: str, start_frame: int = 0, end_frame: int | None = None) -> np.ndarray:
+    """
+    Décode l'intervalle [start_frame, end_frame[ et retourne le score ContentDetector de chaque frame.
+    """
+    video = open_video(video_path)
+    fps = video.frame_rate
+    scene_manager, stats_manager = _content_detector()
+
+    # Chevauchement : la première frame décodée n'a pas de frame précédente (score nul)
+    seek_frame = max(0, start_frame - CHUNK_OVERLAP_FRAMES)
+    if seek_frame:
+        video.seek(FrameTimecode(timecode=seek_frame, fps=fps))
+    end_tc = FrameTimecode(timecode=end_frame, fps=fps) if end_frame else None
+    scene_manager.detect_scenes(video, end_time=end_tc)
+
+    last_frame = int(video.frame_number)
+    if end_frame is not None:
+        last_frame = min(last_frame, end_frame)
+    return _stats_records(stats_manager, start_frame, last_frame, fps)
+
+
+def score_windows(video_path: str, windows: list[tuple[int, int]]) -> np.ndarray:
+    """
+    Scores ContentDetector des fenêtres [a, b[ (triées, disjointes) avec un seul décodeur : un seek par fenêtre,
+    aucun si la fenêtre commence avant la position courante (décodage continu).
+    """
+    video = open_video(video_path)
+    fps = video.frame_rate
+    scene_manager, stats_manager = _content_detector()
+
+    chunks: list[np.ndarray] = []
+    for start_frame, end_frame in windows:
+        # Chevauchement : la frame comparée à la fin de la fenêtre précédente n'est pas conservée
+        seek_frame = max(0, start_frame - CHUNK_OVERLAP_FRAMES)
+        if seek_frame > int(video.frame_number):
+            video.seek(FrameTimecode(timecode=seek_frame, fps=fps))
+        scene_manager.detect_scenes(video, end_time=FrameTimecode(timecode=end_frame, fps=fps))
+        last_frame = min(int(video.frame_number), end_frame)
+        chunks.append(_stats_records(stats_manager, start_frame, last_frame, fps))
+    return stitch_chunks(chunks)
+
+
+# Détecteurs disponibles : même signature (video_path, start_frame, end_frame) → records SCORE_DTYPE
+SCORE_BACKENDS: dict[str, Callable[..., np.ndarray]] = {
+    "content": score_frames,
+    "luma": score_frames_luma,
+}
+
+# Scores de plusieurs fenêtres (video_path, [(a, b), ...]) avec un seul décodeur / une seule sonde ffprobe
+WINDOW_BACKENDS: dict[str, Callable[[str, list[tuple[int, int]]], np.ndarray]] = {
+    "content": score_windows,
+    "luma": score_windows_luma,
+}
+
+
+def stitch_chunks(chunks: list[np.ndarray]) -> np.ndarray:
+    """
+    Assemble les courbes de plusieurs chunks en supprimant les doublons aux frontières.
+    """
+    merged = np.concatenate(chunks) if chunks else np.zeros(0, dtype=SCORE_DTYPE)
+    _, first_idx = np.unique(merged["frame"], return_index=True)
+    stitched: np.ndarray = merged[first_idx]
+    return stitched
+
+
+def compute_scene_curve(video_path: str, workers: int = 1, backend: str = "content") -> SceneScoreCurve:
+    """
+    Décode la vidéo une seule fois et enregistre le score de chaque frame.
+
+    - backend : "content" (ContentDetector PySceneDetect) ou "luma" (ffmpeg + NumPy, frames réduites)
+    - workers > 1 : la timeline est découpée en chunks chevauchants décodés en parallèle (un process par chunk)
+    """
+    if backend not in SCORE_BACKENDS:
+        raise ValueError(f"Backend de détection inconnu : {backend!r} (choix : {', '.join(SCORE_BACKENDS)})")
+    score_fn = SCORE_BACKENDS[backend]
+
+    t0 = time.time()
+    video = open_video(video_path)
+    fps = float(video.frame_rate)
+    duration = video.duration.get_seconds()
+    total_frames = int(video.duration.frame_num)
+
+    if workers <= 1 or total_frames < workers * MIN_CHUNK_FRAMES:
+        records = score_fn(video_path)
+    else:
+        bounds = np.linspace(0, total_frames, workers + 1, dtype=int)
+        # Le dernier chunk va jusqu'au bout du flux (nombre de frames annoncé parfois inexact)
+        ranges = [(int(a), int(b) if i < workers - 1 else None) for i, (a, b) in enumerate(itertools.pairwise(bounds))]
+        logger.info(f"🧵 Détection parallèle : {workers} chunks de ~{total_frames // workers} frames")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(score_fn, video_path, a, b) for a, b in ranges]
+            records = stitch_chunks([f.result() for f in futures])
+
+    curve = SceneScoreCurve(fps=fps, duration=duration, records=records, backend=backend)
+    logger.info(
+        f"📈 Courbe de scores ({backend}) calculée : {len(records)} frames en {time.time() - t0:.1f}s (décodage unique)"
+    )
+    return curve
+
+
+def coarse_candidates_content(video_path: str, step: int, threshold: float) -> list[int]:
     """
-    Détection PySceneDetect sur une vidéo entière ou un intervalle spécifique (start/end en secondes).
+    Passe grossière ContentDetector : une frame sur `step` est analysée, les coupures trouvées marquent les fenêtres
+    [c - step, c] à raffiner.
     """
     video = open_video(video_path)
     scene_manager = SceneManager()
-    scene_manager.add_detector(ContentDetector(threshold=threshold, min_scene_len=min_scene_len))
+    scene_manager.add_detector(ContentDetector(threshold=threshold, min_scene_len=1))
+    scene_manager.detect_scenes(video, frame_skip=step - 1)
+    return [int(tc.get_frames()) for tc in scene_manager.get_cut_list()]
 
-    start_tc = FrameTimecode(timecode=start, fps=video.frame_rate) if start else None
-    end_tc = FrameTimecode(timecode=end, fps=video.frame_rate) if end else None
 
-    if start_tc:
-        video.seek(start_tc)
+COARSE_BACKENDS: dict[str, Callable[[str, int, float], list[int]]] = {
+    "content": coarse_candidates_content,
+    "luma": coarse_candidates_luma,
+}
 
-    # Détection de scènes
-    scene_manager.detect_scenes(video, end_time=end_tc)
-    scenes = scene_manager.get_scene_list()
 
-    # Filtrage manuel pour compatibilité <0.6
-    filtered = []
-    for s, e in scenes:
-        s_sec, e_sec = s.get_seconds(), e.get_seconds()
-        if start and e_sec <= start:
-            continue
-        if end and s_sec >= end:
-            continue
-        filtered.append((max(s_sec, start or 0.0), min(e_sec, end or e_sec)))
+def merge_windows(candidates: list[int], step: int, gap: int = 0) -> list[tuple[int, int]]:
+    """
+    Convertit les frames candidates en fenêtres [c - step, c + 1[, fusionnées si moins de `gap` frames les séparent.
+    """
+    windows: list[tuple[int, int]] = []
+    for c in sorted(candidates):
+        a, b = max(0, c - step), c + 1
+        if windows and a <= windows[-1][1] + gap:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], b))
+        else:
+            windows.append((a, b))
+    return windows
+
 
-    return filtered
+def split_windows(windows: list[tuple[int, int]], parts: int) -> list[list[tuple[int, int]]]:
+    """
+    Répartit les fenêtres (dans l'ordre) en au plus `parts` groupes contigus de tailles proches, un par process.
+    """
+    total = sum(b - a for a, b in windows)
+    target = total / max(1, parts)
+    groups: list[list[tuple[int, int]]] = [[]]
+    filled = 0
+    for a, b in windows:
+        if groups[-1] and filled >= target * len(groups) and len(groups) < parts:
+            groups.append([])
+        groups[-1].append((a, b))
+        filled += b - a
+    return groups
+
+
+def compute_scene_curve_coarse(
+    video_path: str,
+    step: int,
+    threshold: float,
+    workers: int = 1,
+    backend: str = "content",
+) -> SceneScoreCurve:
+    """
+    Détection en deux temps : échantillonnage 1 frame sur `step` pour repérer les fenêtres candidates, puis scores
+    frame par frame uniquement dans ces fenêtres. Les coupures restent placées à la frame exacte.
+
+    Les fenêtres proches sont fusionnées et décodées par un seul décodeur (un par process si workers > 1).
+    """
+    t0 = time.time()
+    video = open_video(video_path)
+    fps = float(video.frame_rate)
+    duration = video.duration.get_seconds()
+    total_frames = int(video.duration.frame_num)
+
+    windows = merge_windows(COARSE_BACKENDS[backend](video_path, step, threshold), step, COARSE_MERGE_GAP)
+    covered = sum(b - a for a, b in windows)
+    coarse_s = time.time() - t0
+    logger.info(
+        f"🔎 Passe grossière (1/{step}) en {coarse_s:.1f}s : {len(windows)} fenêtres candidates, "
+        f"{covered}/{total_frames} frames"
+    )
+
+    COARSE_STATS["runs"] += 1
+    if covered > COARSE_MAX_COVERAGE * total_frames:
+        COARSE_STATS["fallbacks"] += 1
+        logger.info(
+            f"↩️ Trop de fenêtres candidates ({covered / max(1, total_frames):.0%} des frames) — passe dense "
+            f"complète (repli {COARSE_STATS['fallbacks']}/{COARSE_STATS['runs']}, {coarse_s:.1f}s de passe grossière)."
+        )
+        return compute_scene_curve(video_path, workers=workers, backend=backend)
+
+    window_fn = WINDOW_BACKENDS[backend]
+    if workers > 1 and len(windows) > 1:
+        groups = split_windows(windows, workers)
+        with ProcessPoolExecutor(max_workers=len(groups)) as pool:
+            futures = [pool.submit(window_fn, video_path, group) for group in groups]
+            records = stitch_chunks([f.result() for f in futures])
+    else:
+        records = window_fn(video_path, windows)
+
+    curve = SceneScoreCurve(
+        fps=fps,
+        duration=duration,
+        records=records,
+        backend=backend,
+        coarse_step=step,
+        coarse_threshold=threshold,
+    )
+    logger.info(
+        f"📈 Courbe coarse-to-fine ({backend}) : {len(records)} frames fines en {time.time() - t0:.1f}s "
+        f"(repli dense {COARSE_STATS['fallbacks']}/{COARSE_STATS['runs']})"
+    )
+    return curve
+
+
+def get_scene_curve(
+    video_path: str,
+    workers: int = 1,
+    backend: str = "content",
+    coarse_step: int = 1,
+    coarse_threshold: float = 0.0,
+) -> SceneScoreCurve:
+    """
+    Retourne la courbe de scores de la vidéo : sidecar persistant si valide, sinon décodage puis sauvegarde.
+    """
+    sidecar_path = JSON_STATES_DIR_SC / f"{Path(video_path).stem}.scene_scores.npy"
+    curve = SceneScoreCurve.load(sidecar_path, video_path, backend, coarse_step, coarse_threshold)
+    if curve is not None:
+        return curve
+
+    if coarse_step > 1:
+        curve = compute_scene_curve_coarse(video_path, coarse_step, coarse_threshold, workers=workers, backend=backend)
+    else:
+        curve = compute_scene_curve(video_path, workers=workers, backend=backend)
+    curve.save(sidecar_path, video_path)
+    return curve
 
 
 def fill_missing_segments(scenes: list[tuple[float, float]], video_duration: float) -> list[tuple[float, float]]:
@@ -84,7 +324,7 @@ def fill_missing_segments(scenes: list[tuple[float, float]], video_duration: flo
 
 
 def refine_long_segments(
-    video_path: str,
+    curve: SceneScoreCurve,
     scenes: list[tuple[float, float]],
     thresholds: list[float],
     min_duration: float = 5.0,
@@ -92,6 +332,8 @@ def refine_long_segments(
 ) -> list[tuple[float, float]]:
     """
     Raffine les segments trop longs (ou proches du max) via descente de seuil dynamique.
+
+    Les coupures sont déduites de la courbe de scores : aucun re-décodage de la vidéo.
     """
     refined: list[tuple[float, float]] = []
 
@@ -109,7 +351,7 @@ def refine_long_segments(
         # boucle descendante jusqu’à obtenir une coupure
         sub_scenes = []
         for t in thresholds:
-            sub_scenes = detect_scenes_with_pyscenedetect(video_path, threshold=t, start=start, end=end)
+            sub_scenes = curve.detect(threshold=t, start=start, end=end)
             if sub_scenes:
                 logger.debug(f"🪓 {len(sub_scenes)} sous-segments trouvés à th={t}")
                 break
@@ -123,7 +365,7 @@ def refine_long_segments(
         # sous-segments trouvés → éventuel raffinement récursif
         for s, e in sub_scenes:
             if (e - s) > max_duration and len(thresholds) > 1:
-                refined.extend(refine_long_segments(video_path, [(s, e)], thresholds[1:], min_duration, max_duration))
+                refined.extend(refine_long_segments(curve, [(s, e)], thresholds[1:], min_duration, max_duration))
             else:
                 refined.append((s, e))
 
@@ -23,7 +23,7 @@ from shared.utils.config import JSON_STATES_DIR_SC, TRASH_DIR_SC
 from shared.utils.logger import get_logger
 from shared.utils.safe_runner import safe_main
 from shared.utils.trash import move_to_trash, purge_old_trash
-from smartcut.analyze.analyze_confidence import compute_confidence
+from smartcut.analyze.analyze_confidence import compute_confidence_batch
 from smartcut.analyze.analyze_utils import extract_keywords_from_filename
 from smartcut.analyze.main_analyze import analyze_video_segments
 from smartcut.ffsmartcut.ffsmartcut import cut_video, ensure_safe_video_format
@@ -42,6 +42,9 @@ MIN_THRESHOLD = CONFIG.smartcut["smartcut"]["min_threshold"]
 THRESHOLD_STEP = CONFIG.smartcut["smartcut"]["threshold_step"]
 MIN_DURATION = CONFIG.smartcut["smartcut"]["min_duration"]
 MAX_DURATION = CONFIG.smartcut["smartcut"]["max_duration"]
+SCENE_WORKERS = CONFIG.smartcut["smartcut"].get("scene_workers", 1)
+SCENE_BACKEND = CONFIG.smartcut["smartcut"].get("scene_backend", "content")
+SCENE_COARSE_STEP = CONFIG.smartcut["smartcut"].get("scene_coarse_step", 1)
 
 FRAME_PER_SEGMENT = CONFIG.smartcut["smartcut"]["frame_per_segment"]
 AUTO_FRAMES = CONFIG.smartcut["smartcut"]["auto_frames"]
@@ -120,6 +123,9 @@ def multi_stage_cut(
             threshold_step=THRESHOLD_STEP,
             min_duration=MIN_DURATION,
             max_duration=MAX_DURATION,
+            workers=SCENE_WORKERS,
+            backend=SCENE_BACKEND,
+            coarse_step=SCENE_COARSE_STEP,
         )
         logger.info("🎞️ %d coupures détectées.", len(cuts))
 
@@ -180,9 +186,11 @@ def multi_stage_cut(
         logger.info("🧠 Calcul d'un indice de confiance :")
         try:
             auto_keywords = extract_keywords_from_filename(video_path.name)
+            done_segments = [seg for seg in session.segments if seg.ai_status == "done"]
+            confidences = dict(zip(map(id, done_segments), compute_confidence_batch(done_segments), strict=True))
             for seg in session.segments:
                 if seg.ai_status == "done":
-                    seg.confidence = compute_confidence(seg.description, seg.keywords)
+                    seg.confidence = confidences[id(seg)]
                     seg.last_updated = datetime.now().isoformat()
                     seg.status = "confidence_done"
                     logger.info(f"  - Segment {seg.id}: confidence = {seg.confidence:.3f}")
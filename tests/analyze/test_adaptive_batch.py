@@ -0,0 +1,144 @@
+"""
+Taille de batch adaptative : réduction sur OOM, croissance, plafond, persistance et reprise (batches et packs).
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+from typing import Any
+
+from PIL import Image
+import pytest
+
+from smartcut.analyze import adaptive_batch, analyze_batches, packed_generation
+from smartcut.analyze.adaptive_batch import BatchSizer, is_oom_error
+from smartcut.analyze.prefetch import PreparedSegment
+from smartcut.models_sc.smartcut_model import Segment
+
+
+@pytest.fixture(autouse=True)
+def _limits(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(adaptive_batch, "BATCH_GROW_AFTER", 2)
+    monkeypatch.setattr(adaptive_batch, "BATCH_MAX_SIZE", 64)
+
+
+def _sizer(tmp_path: Path, initial: int = 8, expire: int = 6) -> BatchSizer:
+    return BatchSizer("model|bf16", initial, path=tmp_path / "sizes.json", ceiling_expire=expire)
+
+
+def _run_full_batches(sizer: BatchSizer, count: int) -> None:
+    for _ in range(count):
+        sizer.on_success(sizer.size)
+
+
+def test_oom_halves_and_stops_at_one(tmp_path: Path) -> None:
+    sizer = _sizer(tmp_path)
+    assert sizer.on_oom(8) == 4
+    assert sizer.on_oom(4) == 2
+    assert sizer.on_oom(2) == 1
+    assert sizer.on_oom(1) == 0
+    assert sizer.ceiling == 2
+
+
+def test_growth_needs_full_batches_and_respects_ceiling(tmp_path: Path) -> None:
+    sizer = _sizer(tmp_path, initial=8, expire=0)
+    sizer.on_success(3)
+    sizer.on_success(3)
+    assert sizer.size == 8  # batches partiels : pas de croissance
+
+    sizer.on_oom(12)
+    assert sizer.size == 6
+    _run_full_batches(sizer, 20)
+    assert sizer.size == 11  # jamais la taille qui a provoqué l'OOM
+
+
+def test_ceiling_expires_after_clean_batches(tmp_path: Path) -> None:
+    sizer = _sizer(tmp_path, initial=8, expire=6)
+    sizer.on_oom(12)
+    _run_full_batches(sizer, 5)
+    assert sizer.ceiling == 12
+    sizer.on_success(sizer.size)
+    assert sizer.ceiling is None
+    _run_full_batches(sizer, 4)
+    assert sizer.size >= 12
+
+
+def test_oom_resets_the_clean_counter(tmp_path: Path) -> None:
+    sizer = _sizer(tmp_path, initial=8, expire=6)
+    sizer.on_oom(12)
+    _run_full_batches(sizer, 5)
+    sizer.on_oom(10)
+    _run_full_batches(sizer, 5)
+    assert sizer.ceiling == 10
+
+
+def test_state_is_persisted_and_reloaded(tmp_path: Path) -> None:
+    sizer = _sizer(tmp_path, initial=8, expire=100)
+    sizer.on_oom(8)
+    _run_full_batches(sizer, adaptive_batch.CLEAN_SAVE_EVERY)
+
+    reloaded = _sizer(tmp_path, initial=32, expire=100)
+    assert reloaded.size == sizer.size
+    assert reloaded.ceiling == 8
+    assert reloaded.clean == adaptive_batch.CLEAN_SAVE_EVERY
+
+    other = BatchSizer("other|fp16", 5, path=tmp_path / "sizes.json")
+    assert (other.size, other.ceiling) == (5, None)
+
+
+def test_is_oom_error() -> None:
+    assert is_oom_error(RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB"))
+    assert not is_oom_error(RuntimeError("shape mismatch"))
+    assert not is_oom_error(ValueError("out of memory"))
+
+
+def test_process_batches_cleans_up_after_leaving_the_oom_handler(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[int] = []
+    cleanups: list[object] = []
+
+    def generate(images: list[Image.Image], **_: object) -> dict[str, object]:
+        calls.append(len(images))
+        if len(images) > 2:
+            raise RuntimeError("CUDA out of memory")
+        return {"description": "ok", "keywords": ["k"]}
+
+    monkeypatch.setattr(analyze_batches, "generate_keywords_for_segment", generate)
+    monkeypatch.setattr(analyze_batches, "clear_after_oom", lambda: cleanups.append(sys.exc_info()[1]))
+    frames = [Image.new("RGB", (8, 8)) for _ in range(4)]
+
+    no_model: Any = None  # generate_keywords_for_segment est remplacé : ni processor ni modèle
+    sizer = _sizer(tmp_path, initial=4)
+    results = analyze_batches.process_batches("v", 0.0, 1.0, frames, 4, no_model, no_model, sizer=sizer)
+    assert calls == [4, 2, 2]
+    assert cleanups == [None]  # nettoyage hors du `except` : plus d'exception en cours
+    assert len(results) == 2
+
+
+def test_packed_oom_splits_the_pack_after_leaving_the_handler(monkeypatch: pytest.MonkeyPatch) -> None:
+    packs: list[int] = []
+    cleanups: list[object] = []
+
+    def generate(inputs: list[list[Image.Image]], *_: object) -> list[dict[str, object]]:
+        packs.append(len(inputs))
+        if len(inputs) > 2:
+            raise RuntimeError("CUDA out of memory")
+        return [{"description": "ok", "keywords": ["k"]} for _ in inputs]
+
+    monkeypatch.setattr(packed_generation, "get_result_cache", lambda: None)
+    monkeypatch.setattr(packed_generation, "estimate_visual_tokens", lambda n, *_: (n * 10, 0))
+    monkeypatch.setattr(packed_generation, "prepare_packed_inputs", lambda groups, *_, **__: groups)
+    monkeypatch.setattr(packed_generation, "generate_packed_from_inputs", generate)
+    monkeypatch.setattr(packed_generation, "clear_after_oom", lambda: cleanups.append(sys.exc_info()[1]))
+    segments = [
+        PreparedSegment(Segment(id=i, start=i, end=i + 1), "v", [Image.new("RGB", (8, 8)) for _ in range(2)])
+        for i in range(2)
+    ]
+
+    no_model: Any = None
+    results = list(packed_generation.iter_packed_results(iter(segments), no_model, no_model, 1, token_budget=100))
+    assert packs == [4, 2, 2]
+    assert cleanups == [None]
+    assert [len(batches) for _, _, batches in results] == [2, 2]
@@ -0,0 +1,57 @@
+"""
+Mise à jour des mots-clés de session : une normalisation groupée et une sauvegarde pour tous les segments.
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from smartcut.analyze import analyze_utils
+from smartcut.models_sc.smartcut_model import Segment, SmartCutSession
+
+
+class _Normalizer:
+    def __init__(self) -> None:
+        self.calls: list[list[list[str]]] = []
+
+    def normalize_session_keywords(self, keyword_lists: list[list[str]]) -> list[list[str]]:
+        self.calls.append(keyword_lists)
+        return [sorted(k.lower() for k in kws) for kws in keyword_lists]
+
+
+@pytest.fixture
+def normalizer(monkeypatch: pytest.MonkeyPatch) -> _Normalizer:
+    normalizer = _Normalizer()
+    monkeypatch.setattr(analyze_utils, "get_keyword_normalizer", lambda mode: normalizer)
+    return normalizer
+
+
+def _session(monkeypatch: pytest.MonkeyPatch) -> tuple[SmartCutSession, list[int]]:
+    session = SmartCutSession(video="v.mp4", segments=[Segment(id=1, start=0.0, end=2.0), Segment(id=2, end=4.0)])
+    session.segments[1].start = 2.0
+    saves: list[int] = []
+    monkeypatch.setattr(session, "save", lambda *a, **k: saves.append(1))
+    return session, saves
+
+
+def test_many_updates_normalize_once_and_save_once(monkeypatch: pytest.MonkeyPatch, normalizer: _Normalizer) -> None:
+    session, saves = _session(monkeypatch)
+    analyze_utils.update_session_keywords_many(
+        session, [(0.0, 2.0, ["Mer", "Plage"]), (2.004, 4.0, ["Chat"]), (9.0, 10.0, ["absent"])]
+    )
+    assert normalizer.calls == [[["Mer", "Plage"], ["Chat"]]]
+    assert saves == [1]
+    assert [s.keywords for s in session.segments] == [["mer", "plage"], ["chat"]]
+    assert [s.ai_status for s in session.segments] == ["done", "done"]
+
+
+def test_single_update_goes_through_the_grouped_path(monkeypatch: pytest.MonkeyPatch, normalizer: _Normalizer) -> None:
+    session, saves = _session(monkeypatch)
+    analyze_utils.update_session_keywords(session, 2.0, 4.0, ["Chat"])
+    assert normalizer.calls == [[["Chat"]]]
+    assert session.segments[1].keywords == ["chat"]
+    assert session.segments[0].ai_status == "pending"
+
+    analyze_utils.update_session_keywords(session, 5.0, 6.0, ["x"])
+    assert len(normalizer.calls) == 1
+    assert saves == [1]
@@ -0,0 +1,86 @@
+"""
+Lecteur de frames ffmpeg : filtre `select` et détection des flux tronqués.
+"""
+
+from __future__ import annotations
+
+import io
+import re
+from typing import Any
+
+import pytest
+
+from smartcut.analyze import extract_frames_ffmpeg
+from smartcut.analyze.extract_frames_ffmpeg import FFmpegFramesError, _select_expr, iter_session_images_ffmpeg
+
+
+def _evaluate(expr: str, n: int) -> bool:
+    """
+    Évalue l'expression `select` générée (sous-ensemble eq/lt/if) pour la frame n.
+    """
+    python = re.sub(r"\bif\(", "_if(", expr.replace("\\,", ","))
+    env = {"n": n, "eq": lambda a, b: a == b, "lt": lambda a, b: a < b, "_if": lambda c, a, b: a if c else b}
+    return bool(eval(python, env))
+
+
+@pytest.mark.parametrize("targets", [[0], [3, 7], [0, 1, 2, 10, 11, 50, 51, 99], list(range(0, 500, 7))])
+def test_select_expr_keeps_exactly_the_targets(targets: list[int]) -> None:
+    expr = _select_expr(targets)
+    assert [n for n in range(max(targets) + 20) if _evaluate(expr, n)] == targets
+
+
+def test_select_expr_depth_is_logarithmic() -> None:
+    expr = _select_expr(list(range(1024)))
+    assert expr.count("if(") == 1023
+    depth = max_depth = 0
+    for char in expr:
+        depth += char == "("
+        depth -= char == ")"
+        max_depth = max(max_depth, depth)
+    assert max_depth <= 12
+
+
+class _FakeProcess:
+    def __init__(self, payload: bytes, returncode: int) -> None:
+        self.stdout = io.BytesIO(payload)
+        self.returncode = returncode
+
+    def communicate(self) -> tuple[bytes, bytes]:
+        return b"", b"truncated"
+
+    def __enter__(self) -> _FakeProcess:
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        return None
+
+
+def _run(
+    monkeypatch: pytest.MonkeyPatch, frames: int, returncode: int = 0, yielded: list[tuple[int, int]] | None = None
+) -> list[tuple[int, int]]:
+    width, height = 4, 2
+    payload = bytes(width * height * 3 * frames)
+    monkeypatch.setattr(extract_frames_ffmpeg, "get_fps", lambda _: 25.0)
+    monkeypatch.setattr(extract_frames_ffmpeg.subprocess, "Popen", lambda *_, **__: _FakeProcess(payload, returncode))
+    segments = [(0.0, 2.0), (10.0, 12.0)]  # 2 frames chacun à fps_extract=1
+    yielded = [] if yielded is None else yielded
+    for idx, images in iter_session_images_ffmpeg("video.mp4", segments, False, 1.0, 5, (width, height)):
+        yielded.append((idx, len(images)))
+    return yielded
+
+
+def test_complete_stream_yields_every_segment(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert _run(monkeypatch, frames=4) == [(0, 2), (1, 2)]
+
+
+def test_truncated_stream_raises_after_complete_segments(monkeypatch: pytest.MonkeyPatch) -> None:
+    yielded: list[tuple[int, int]] = []
+    with pytest.raises(FFmpegFramesError, match="3/4"):
+        _run(monkeypatch, frames=3, yielded=yielded)
+    # Le premier segment est complet, le second (une frame sur deux) n'est jamais rendu
+    assert yielded == [(0, 2)]
+
+
+def test_nonzero_return_code_raises(monkeypatch: pytest.MonkeyPatch) -> None:
+    with pytest.raises(FFmpegFramesError):
+        _run(monkeypatch, frames=4, returncode=1)
@@ -0,0 +1,45 @@
+"""
+Préfetch : les batches dont la réponse est déjà en cache ne passent pas par le processor.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+from PIL import Image
+import pytest
+
+from smartcut.analyze import prefetch
+from smartcut.gen_keywords import prefix_cache
+from smartcut.gen_keywords.main_gen_keywords import result_key
+from smartcut.gen_keywords.result_cache import AIResultCache
+from smartcut.models_sc.smartcut_model import Segment
+
+
+class _Model:
+    name_or_path = "vlm"
+
+
+def test_cached_batches_are_not_prepared(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = AIResultCache(tmp_path, max_bytes=1 << 20)
+    prepared: list[list[Image.Image]] = []
+    monkeypatch.setattr(prefix_cache, "_prompts", {"system_keywords": "s", "keywords": "k"})
+    monkeypatch.setattr(prefetch, "get_result_cache", lambda: cache)
+
+    def prepare_inputs(batch: list[Image.Image], *_: object, **__: object) -> str:
+        prepared.append(batch)
+        return "inputs"
+
+    monkeypatch.setattr(prefetch, "prepare_inputs", prepare_inputs)
+
+    model: Any = _Model()
+    frames = [Image.new("RGB", (8, 8), (i, 0, 0)) for i in range(4)]
+    cache.put(result_key(frames[:2], model), {"description": "", "keywords": ["k"]})
+
+    segment = Segment(id=1, start=0.0, end=4.0)
+    no_processor: Any = object()
+    (result,) = prefetch.prefetch_segments(iter([(segment, "v", frames)]), no_processor, 2, depth=0, model=model)
+    assert result.inputs == [None, "inputs"]
+    assert prepared == [frames[2:]]
+    assert cache.stats()["hits"] == 0  # la vérification ne compte pas comme une lecture
@@ -0,0 +1,42 @@
+"""
+Registre du service d'embeddings : un encodeur par modèle, device demandé appliqué tant que rien n'est chargé.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from smartcut.embeddings import service
+from smartcut.embeddings.service import EmbeddingService
+
+
+class _Model:
+    def __init__(self, model_name: str, device: str, **_: Any) -> None:
+        self.device = device
+
+    def eval(self) -> _Model:
+        return self
+
+
+@pytest.fixture(autouse=True)
+def _no_download(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(service, "SentenceTransformer", _Model)
+
+
+def test_device_requested_after_registration_is_applied_before_loading() -> None:
+    registry = EmbeddingService()
+    shared = registry.get("m")  # premier appelant sans préférence (normalisation des mots-clés)
+    assert registry.get("m", device="cpu") is shared
+    shared.load()
+    assert shared.device == "cpu"
+
+
+def test_device_is_kept_once_the_model_is_loaded() -> None:
+    registry = EmbeddingService()
+    shared = registry.get("m", device="cpu")
+    shared.load()
+    assert registry.get("m", device="cuda") is shared
+    assert shared.device == "cpu"
+    assert shared.model.device == "cpu"
@@ -0,0 +1,121 @@
+"""
+Cache disque des embeddings : position des lignes, journal, compaction et relecture par un autre processus.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from smartcut.embeddings import store
+from smartcut.embeddings.store import EmbeddingStore
+
+DIM = 8
+
+
+def _vectors(texts: list[str]) -> np.ndarray:
+    vectors: np.ndarray = np.stack([np.full(DIM, float(sum(map(ord, t)) % 997), dtype=np.float32) for t in texts])
+    return vectors
+
+
+def _assert_cached(cache: EmbeddingStore, texts: list[str]) -> None:
+    found = cache.get_many(texts)
+    assert all(v is not None for v in found)
+    np.testing.assert_array_equal(np.stack(found), _vectors(texts).astype(np.float16).astype(np.float32))
+
+
+def test_rows_are_written_at_their_index_offset_despite_orphan_bytes(tmp_path: Path) -> None:
+    cache = EmbeddingStore("m", root=tmp_path, max_bytes=1 << 20)
+    cache.put_many(["a", "b"], _vectors(["a", "b"]))
+
+    # Écriture interrompue : des octets ajoutés au fichier sans entrée d'index
+    vectors_path = cache._vectors_path(cache._index["generation"])
+    with open(vectors_path, "ab") as f:
+        f.write(b"\xff" * (DIM * 2 * 3 + 5))
+
+    cache.put_many(["c"], _vectors(["c"]))
+    assert vectors_path.stat().st_size == 3 * DIM * 2
+    _assert_cached(EmbeddingStore("m", root=tmp_path), ["a", "b", "c"])
+
+
+def test_puts_append_to_the_journal_instead_of_rewriting_the_index(tmp_path: Path) -> None:
+    cache = EmbeddingStore("m", root=tmp_path, max_bytes=1 << 20)
+    cache.put_many(["a"], _vectors(["a"]))
+    snapshot = cache._index_path.stat()
+
+    for text in ["b", "c", "d"]:
+        cache.put_many([text], _vectors([text]))
+    after = cache._index_path.stat()
+    assert (after.st_mtime_ns, after.st_ino) == (snapshot.st_mtime_ns, snapshot.st_ino)
+    assert len(cache._journal_path(cache._index["checkpoint"]).read_text().splitlines()) == 3
+    _assert_cached(EmbeddingStore("m", root=tmp_path), ["a", "b", "c", "d"])
+
+
+def test_journal_is_folded_into_a_snapshot_when_it_grows(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(store, "JOURNAL_MIN_RECORDS", 2)
+    cache = EmbeddingStore("m", root=tmp_path, max_bytes=1 << 20)
+    texts = [f"t{i}" for i in range(10)]
+    for i, text in enumerate(texts):
+        cache.get_many(texts[:i])  # dates d'accès journalisées à chaque écriture
+        cache.put_many([text], _vectors([text]))
+        assert cache._journal_records <= max(2, i + 1)
+    assert cache._index["checkpoint"] > 1
+    assert len(list(tmp_path.glob("*/journal.*.jsonl"))) <= 1
+    _assert_cached(EmbeddingStore("m", root=tmp_path), texts)
+
+
+def test_partial_journal_line_is_ignored_then_overwritten(tmp_path: Path) -> None:
+    cache = EmbeddingStore("m", root=tmp_path, max_bytes=1 << 20)
+    cache.put_many(["a"], _vectors(["a"]))
+    cache.put_many(["b"], _vectors(["b"]))
+    with open(cache._journal_path(cache._index["checkpoint"]), "ab") as f:
+        f.write(b'["deadbeef", 7')
+
+    reader = EmbeddingStore("m", root=tmp_path)
+    _assert_cached(reader, ["a", "b"])
+    reader.put_many(["c"], _vectors(["c"]))
+    _assert_cached(EmbeddingStore("m", root=tmp_path), ["a", "b", "c"])
+
+
+def test_compaction_keeps_most_recent_entries_in_a_new_generation(tmp_path: Path) -> None:
+    row_bytes = DIM * 2
+    cache = EmbeddingStore("m", root=tmp_path, max_bytes=10 * row_bytes)
+    old = [f"old{i}" for i in range(8)]
+    cache.put_many(old, _vectors(old))
+    cache.get_many(["old0"])  # accès récent : doit survivre à l'éviction
+
+    new = [f"new{i}" for i in range(4)]
+    cache.put_many(new, _vectors(new))
+
+    assert cache._index["generation"] == 1
+    assert cache._index["rows"] == 8  # 80 % de 10 lignes
+    assert not cache._vectors_path(0).exists()
+    assert cache._vectors_path(1).stat().st_size == 8 * row_bytes
+    assert cache.evictions == 4
+
+    reloaded = EmbeddingStore("m", root=tmp_path)
+    _assert_cached(reloaded, ["old0", *new])
+    assert sum(v is None for v in reloaded.get_many(old[1:])) == 4
+
+
+def test_reader_sees_entries_added_by_another_writer(tmp_path: Path) -> None:
+    reader = EmbeddingStore("m", root=tmp_path)
+    writer = EmbeddingStore("m", root=tmp_path)
+    writer.put_many(["a"], _vectors(["a"]))
+    _assert_cached(reader, ["a"])
+    writer.put_many(["b"], _vectors(["b"]))
+    _assert_cached(reader, ["a", "b"])
+    assert reader.get_many(["absent"]) == [None]
+
+
+def test_dimension_change_resets_the_cache(tmp_path: Path) -> None:
+    cache = EmbeddingStore("m", root=tmp_path)
+    cache.put_many(["a"], _vectors(["a"]))
+    cache.put_many(["b"], np.ones((1, DIM * 2), dtype=np.float32))
+    reloaded = EmbeddingStore("m", root=tmp_path)
+    assert reloaded.get_many(["a"]) == [None]
+    (vector,) = reloaded.get_many(["b"])
+    assert vector is not None
+    assert vector.shape == (DIM * 2,)
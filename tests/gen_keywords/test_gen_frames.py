@@ -0,0 +1,55 @@
+"""
+Dédoublonnage des frames d'un segment par dHash.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image
+
+from smartcut.gen_keywords.gen_frames import dedup_images, dhash
+
+
+def _gradient(angle: int, noise: int = 0, seed: int = 0) -> Image.Image:
+    """
+    Dégradé orienté (un « plan » par angle), éventuellement bruité (même plan, autre frame).
+    """
+    y, x = np.mgrid[0:64, 0:64].astype(np.float64)
+    theta = np.deg2rad(angle)
+    values = (np.cos(theta) * x + np.sin(theta) * y) * 2 + 128
+    values += np.random.default_rng(seed).integers(-noise, noise + 1, values.shape) if noise else 0
+    return Image.fromarray(np.clip(values, 0, 255).astype(np.uint8)).convert("RGB")
+
+
+def test_dhash_is_stable_under_small_noise_and_differs_between_shots() -> None:
+    base = dhash(_gradient(0))
+    assert (base ^ dhash(_gradient(0, noise=2, seed=1))).bit_count() <= 4
+    assert (base ^ dhash(_gradient(180))).bit_count() > 4
+
+
+def test_consecutive_duplicates_collapse_to_one_frame_per_shot() -> None:
+    frames = [_gradient(0, 2, s) for s in range(3)] + [_gradient(180, 2, s) for s in range(3)] + [_gradient(0)]
+    kept = dedup_images(frames, min_frames=1)
+    # Le retour au premier plan après un autre plan reste une frame distincte (groupes consécutifs)
+    assert kept == [frames[0], frames[3], frames[6]]
+
+
+def test_entropy_pick_keeps_the_most_informative_frame_of_a_group() -> None:
+    flat = Image.new("RGB", (64, 64), (64, 64, 64))
+    frames = [flat, flat.copy(), _gradient(0), _gradient(0)]
+    kept = dedup_images(frames, max_distance=64, min_frames=1, pick="entropy")
+    assert kept == [frames[2]]
+
+
+def test_min_frames_reinstates_dropped_frames_in_order() -> None:
+    frames = [_gradient(0, 2, s) for s in range(8)]
+    kept = dedup_images(frames, min_frames=3)
+    assert len(kept) == 3
+    assert kept[0] is frames[0]
+    indices = [frames.index(img) for img in kept]
+    assert indices == sorted(indices)
+
+
+def test_short_segments_are_returned_untouched() -> None:
+    frames = [_gradient(0)] * 3
+    assert dedup_images(frames, min_frames=3) is frames
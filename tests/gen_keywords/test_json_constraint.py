@@ -0,0 +1,217 @@
+"""
+Décodage contraint mots-clés : automate, suivi des lignes et compatibilité avec la génération assistée.
+
+Les tests de génération utilisent un tokenizer caractère (plus quelques littéraux du schéma) et de petits GPT-2
+aléatoires sur CPU : pas de téléchargement, mêmes chemins `generate` que le VLM.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import string
+from typing import TYPE_CHECKING
+
+import pytest
+import torch
+
+from smartcut.gen_keywords.json_constraint import (
+    DONE,
+    JsonState,
+    JsonTracker,
+    KeywordsJsonLogitsProcessor,
+    KeywordsJsonStoppingCriteria,
+    advance,
+)
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedModel, PreTrainedTokenizerFast
+
+transformers = pytest.importorskip("transformers")
+tokenizers = pytest.importorskip("tokenizers")
+
+LITERALS = ['{"description": "', '", "keywords": [', '"]}', '", "', "]}"]
+VALID = '{"description": "plage au soleil", "keywords": ["mer", "sable"]}'
+
+
+@pytest.fixture(scope="module")
+def tokenizer() -> PreTrainedTokenizerFast:
+    chars = sorted(set(string.ascii_letters + string.digits + string.punctuation + " éèàç"))
+    vocab = {tok: i for i, tok in enumerate(["<pad>", "<eos>", "<unk>", *chars, *LITERALS])}
+    backend = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.Split("", behavior="isolated")
+    backend.decoder = tokenizers.decoders.Fuse()
+    result: PreTrainedTokenizerFast = transformers.PreTrainedTokenizerFast(
+        tokenizer_object=backend, pad_token="<pad>", eos_token="<eos>", unk_token="<unk>"
+    )
+    return result
+
+
+def _ids(tokenizer: PreTrainedTokenizerFast, pieces: list[str]) -> list[int]:
+    return [tokenizer.convert_tokens_to_ids(piece) for piece in pieces]
+
+
+# -------------------- Automate -------------------- #
+
+
+def test_advance_accepts_the_schema_whatever_the_split() -> None:
+    assert advance(JsonState(), VALID) == DONE
+    state: JsonState | None = JsonState()
+    for ch in VALID:
+        assert state is not None
+        state = advance(state, ch)
+    assert state == DONE
+
+
+def test_advance_accepts_empty_keyword_list() -> None:
+    assert advance(JsonState(), '{"description": "", "keywords": []}') == DONE
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "<think>",
+        ' {"description": "',
+        '{"description": "a\\"b',
+        '{"description": "a\nb',
+        '{"description": "a", "tags": [',
+        '{"description": "a", "keywords": ["x"],',
+    ],
+)
+def test_advance_rejects_text_outside_the_schema(text: str) -> None:
+    assert advance(JsonState(), text) is None
+
+
+def test_advance_rejects_anything_after_done() -> None:
+    assert advance(DONE, " ") is None
+    assert advance(DONE, "") == DONE
+
+
+# -------------------- Suivi des lignes -------------------- #
+
+
+def test_tracker_recomputes_state_when_the_prefix_shrinks(tokenizer: PreTrainedTokenizerFast) -> None:
+    prompt = [0, 0]
+    head = _ids(tokenizer, ['{"description": "', "a"])
+    tracker = JsonTracker(tokenizer, prompt_length=len(prompt))
+
+    # Brouillon : la description est fermée puis la liste ouverte
+    drafted = head + _ids(tokenizer, ['", "keywords": [', '"', "x"])
+    assert tracker.update(torch.tensor([prompt + drafted])) == [JsonState("keyword")]
+
+    # Vérification : la cible rejette les trois derniers tokens et en choisit un autre
+    verified = head + _ids(tokenizer, ["b"])
+    assert tracker.update(torch.tensor([prompt + verified])) == [JsonState("description")]
+    assert tracker.update(torch.tensor([prompt + head])) == [JsonState("description")]
+    assert tracker.update(torch.tensor([prompt])) == [JsonState()]
+
+
+def test_tracker_rows_are_independent(tokenizer: PreTrainedTokenizerFast) -> None:
+    tracker = JsonTracker(tokenizer, prompt_length=0)
+    closed = _ids(tokenizer, ['{"description": "', '", "keywords": [', "]}", "<eos>"])
+    opened = _ids(tokenizer, ['{"description": "', "a", "b", "c"])
+    tracker.update(torch.tensor([closed, opened]))
+    assert tracker.finished() == [True, False]
+
+
+def test_processor_masks_everything_but_the_schema(tokenizer: PreTrainedTokenizerFast) -> None:
+    tracker = JsonTracker(tokenizer, prompt_length=1)
+    scores = torch.zeros(1, len(tokenizer))
+    masked = KeywordsJsonLogitsProcessor(tracker)(torch.tensor([[0]]), scores)
+    allowed = {tokenizer.convert_ids_to_tokens(i) for i in torch.nonzero(masked[0] > float("-inf")).flatten().tolist()}
+    assert allowed == {"{", '{"description": "'}
+
+
+# -------------------- Génération -------------------- #
+
+
+def _tiny_lm(tokenizer: PreTrainedTokenizerFast, seed: int) -> PreTrainedModel:
+    torch.manual_seed(seed)
+    config = transformers.GPT2Config(
+        vocab_size=len(tokenizer),
+        n_embd=32,
+        n_layer=2,
+        n_head=2,
+        n_positions=256,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    result: PreTrainedModel = transformers.GPT2LMHeadModel(config).eval()
+    return result
+
+
+def _constrained_generate(
+    model: PreTrainedModel,
+    tokenizer: PreTrainedTokenizerFast,
+    **kwargs: object,
+) -> str:
+    input_ids = torch.tensor([tokenizer.convert_tokens_to_ids(list("mots:"))])
+    tracker = JsonTracker(tokenizer, input_ids.shape[1])
+    with torch.inference_mode():
+        output = model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=60,
+            do_sample=False,
+            logits_processor=transformers.LogitsProcessorList([KeywordsJsonLogitsProcessor(tracker)]),
+            stopping_criteria=transformers.StoppingCriteriaList([KeywordsJsonStoppingCriteria(tracker)]),
+            **kwargs,
+        )
+    text: str = tokenizer.decode(output[0, input_ids.shape[1] :], skip_special_tokens=True)
+    return text
+
+
+def test_assisted_generation_matches_plain_constrained_generation(
+    tokenizer: PreTrainedTokenizerFast,
+) -> None:
+    target, draft = _tiny_lm(tokenizer, seed=0), _tiny_lm(tokenizer, seed=1)
+    draft.generation_config.num_assistant_tokens = 4
+
+    plain = _constrained_generate(target, tokenizer)
+    assisted = _constrained_generate(target, tokenizer, assistant_model=draft)
+
+    assert assisted == plain
+    assert advance(JsonState(), assisted) is not None
+    if advance(JsonState(), assisted) == DONE:
+        assert set(json.loads(assisted)) == {"description", "keywords"}
+
+
+def test_generate_assisted_counts_acceptance(
+    tokenizer: PreTrainedTokenizerFast, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from smartcut.gen_keywords import speculative
+
+    monkeypatch.setattr(speculative, "BASELINE_EVERY", 2)
+    target, draft = _tiny_lm(tokenizer, seed=0), _tiny_lm(tokenizer, seed=0)
+    assistant = speculative.attach_assistant(target, draft)
+    # Brouillon complet à chaque étape : la dernière dépasse `max_new_tokens` et est tronquée par `generate`
+    draft.generation_config.assistant_confidence_threshold = 0.0
+    try:
+        input_ids = torch.tensor([tokenizer.convert_tokens_to_ids(list("mots:"))])
+        inputs = transformers.BatchFeature({"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)})
+        outputs = [
+            speculative.generate_assisted(inputs, None, target, max_new_tokens=20, do_sample=False) for _ in range(2)
+        ]
+    finally:
+        speculative.release_assistant(target)
+
+    # Première génération = référence sans brouillon, seconde = assistée ; même résultat en greedy
+    assert torch.equal(outputs[0], outputs[1])
+    stats = assistant.stats
+    assert stats.runs == 2
+    assert stats.plain_tokens == stats.assisted_tokens == 20
+    # Brouillon identique à la cible : tout ce qui est proposé est accepté
+    assert stats.drafted > 0
+    assert stats.acceptance_rate == 1.0
+
+
+@pytest.mark.skipif(
+    not (os.environ.get("SMARTCUT_TINY_TARGET") and os.environ.get("SMARTCUT_TINY_DRAFT")),
+    reason="SMARTCUT_TINY_TARGET / SMARTCUT_TINY_DRAFT : petits checkpoints VLM locaux",
+)
+def test_cpu_check_with_tiny_vlm_checkpoints() -> None:
+    from smartcut.gen_keywords import speculative
+
+    stats = speculative._cpu_check(os.environ["SMARTCUT_TINY_TARGET"], os.environ["SMARTCUT_TINY_DRAFT"], runs=2)
+    assert stats.runs == 2
@@ -0,0 +1,171 @@
+"""
+Cache KV du prompt système : même génération que `generate` classique, et rechargement atomique des prompts.
+
+Le modèle est un Qwen2-VL minuscule initialisé aléatoirement, avec un processor construit localement (tokenizer
+caractère, chat template réduit) : pré-remplissage avec pixels, deltas M-RoPE et reprise de `past_key_values` sont
+exercés sans téléchargement.
+"""
+
+from __future__ import annotations
+
+import string
+from typing import TYPE_CHECKING, Any
+
+from PIL import Image
+import pytest
+import torch
+
+from smartcut.gen_keywords import prefix_cache
+
+if TYPE_CHECKING:
+    from transformers import BatchFeature, PreTrainedModel, ProcessorMixin
+
+transformers = pytest.importorskip("transformers")
+tokenizers = pytest.importorskip("tokenizers")
+
+SYSTEM = "Tu es un assistant."
+SPECIALS = ["<|endoftext|>", "<|im_start|>", "<|im_end|>", "<|vision_start|>", "<|vision_end|>", "<|image_pad|>"]
+CHAT_TEMPLATE = (
+    "{% for m in messages %}<|im_start|>{{ m['role'] }}\n{% if m['content'] is string %}{{ m['content'] }}"
+    "{% else %}{% for c in m['content'] %}{% if c['type'] == 'image' %}<|vision_start|><|image_pad|><|vision_end|>"
+    "{% elif c['type'] == 'text' %}{{ c['text'] }}{% endif %}{% endfor %}{% endif %}<|im_end|>\n{% endfor %}"
+    "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+
+
+@pytest.fixture(scope="module")
+def processor() -> ProcessorMixin:
+    chars = [*sorted(set(string.printable) - set(string.whitespace)), " ", "\n"]
+    vocab = {tok: i for i, tok in enumerate([*SPECIALS, "<|video_pad|>", *chars, "<unk>"])}
+    backend = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.Split("", behavior="isolated")
+    backend.decoder = tokenizers.decoders.Fuse()
+    tokenizer = transformers.Qwen2TokenizerFast(
+        tokenizer_object=backend,
+        eos_token="<|im_end|>",
+        pad_token="<|endoftext|>",
+        unk_token="<unk>",
+        additional_special_tokens=[*SPECIALS[1:], "<|video_pad|>"],
+    )
+    result: ProcessorMixin = transformers.Qwen2VLProcessor(
+        image_processor=transformers.Qwen2VLImageProcessor(min_pixels=56 * 56, max_pixels=112 * 112),
+        tokenizer=tokenizer,
+        video_processor=transformers.Qwen2VLVideoProcessor(),
+        chat_template=CHAT_TEMPLATE,
+    )
+    return result
+
+
+@pytest.fixture(scope="module")
+def model(processor: ProcessorMixin) -> PreTrainedModel:
+    tokenizer = processor.tokenizer
+    token = tokenizer.convert_tokens_to_ids
+    config = transformers.Qwen2VLConfig(
+        text_config={
+            "vocab_size": len(tokenizer),
+            "hidden_size": 32,
+            "intermediate_size": 64,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 4,
+            "num_key_value_heads": 2,
+            "rope_scaling": {"type": "mrope", "mrope_section": [2, 1, 1]},
+            "eos_token_id": tokenizer.eos_token_id,
+            "pad_token_id": tokenizer.pad_token_id,
+            "bos_token_id": tokenizer.pad_token_id,
+        },
+        vision_config={"depth": 1, "embed_dim": 32, "hidden_size": 32, "num_heads": 2, "mlp_ratio": 2},
+        image_token_id=token("<|image_pad|>"),
+        video_token_id=token("<|video_pad|>"),
+        vision_start_token_id=token("<|vision_start|>"),
+        vision_end_token_id=token("<|vision_end|>"),
+    )
+    torch.manual_seed(0)
+    result: PreTrainedModel = transformers.Qwen2VLForConditionalGeneration(config).eval()
+    return result
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(prefix_cache, "PREFIX_CACHE", True)
+    monkeypatch.setattr(prefix_cache, "_prompts", {"system_keywords": SYSTEM})
+    monkeypatch.setattr(prefix_cache, "_CACHE", prefix_cache.PrefixKVCache())
+
+
+def _inputs(processor: ProcessorMixin, user_text: str = "mots") -> BatchFeature:
+    messages = [
+        {"role": "system", "content": SYSTEM},
+        {"role": "user", "content": [{"type": "image"}, {"type": "text", "text": user_text}]},
+    ]
+    text = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    image = Image.new("RGB", (56, 56), (120, 60, 30))
+    inputs: BatchFeature = processor(text=[text], images=[image], return_tensors="pt")
+    return inputs
+
+
+def _generate(model: PreTrainedModel, inputs: BatchFeature, processor: ProcessorMixin | None = None) -> Any:
+    kwargs: dict[str, Any] = {
+        "max_new_tokens": 6,
+        "do_sample": False,
+        "output_scores": True,
+        "return_dict_in_generate": True,
+    }
+    with torch.inference_mode():
+        if processor is None:
+            return model.generate(**inputs, **kwargs)
+        return prefix_cache.generate_with_prefix(inputs, processor, model, **kwargs)
+
+
+def test_generate_with_prefix_matches_plain_generate(processor: ProcessorMixin, model: PreTrainedModel) -> None:
+    for user_text in ("mots", "autre"):
+        inputs = _inputs(processor, user_text)
+        plain = _generate(model, inputs)
+        cached = _generate(model, inputs, processor)
+        assert torch.equal(cached.sequences, plain.sequences)
+        torch.testing.assert_close(torch.stack(cached.scores), torch.stack(plain.scores), atol=1e-5, rtol=1e-4)
+
+    cache = prefix_cache.get_prefix_cache()
+    assert (cache.builds, cache.hits) == (1, 2)
+
+
+def test_wrong_rope_deltas_change_the_scores(
+    processor: ProcessorMixin, model: PreTrainedModel, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Témoin : le test d'égalité détecte bien une reprise avec de mauvaises positions.
+    """
+    inputs = _inputs(processor)
+    plain = _generate(model, inputs)
+    get_rope_index = model.model.get_rope_index
+
+    def shifted(*args: Any, **kwargs: Any) -> tuple[torch.Tensor, torch.Tensor]:
+        position_ids, deltas = get_rope_index(*args, **kwargs)
+        return position_ids, deltas + 7
+
+    monkeypatch.setattr(model.model, "get_rope_index", shifted)
+    cached = _generate(model, inputs, processor)
+    assert (torch.stack(cached.scores) - torch.stack(plain.scores)).abs().max() > 1e-5
+
+
+def test_unusable_prefix_falls_back_without_counting_a_hit(
+    processor: ProcessorMixin, model: PreTrainedModel, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    inputs = _inputs(processor)
+    monkeypatch.setattr(prefix_cache, "_prompts", {"system_keywords": "Autre prompt système."})
+    plain = _generate(model, inputs)
+    cached = _generate(model, inputs, processor)
+    assert torch.equal(cached.sequences, plain.sequences)
+    assert prefix_cache.get_prefix_cache().hits == 0
+
+
+def test_reload_swaps_the_prompts_dict_in_one_assignment(monkeypatch: pytest.MonkeyPatch) -> None:
+    signatures = iter([(1, 1), (2, 2)])
+    monkeypatch.setattr(prefix_cache, "prompts_signature", lambda: next(signatures))
+    monkeypatch.setattr(prefix_cache, "load_prompts", lambda: {"system_keywords": "nouveau", "keywords": "k"})
+    monkeypatch.setattr(prefix_cache, "_prompts_signature", None)
+
+    before = prefix_cache.current_prompts()
+    assert prefix_cache.reload_prompts_if_changed() is False
+    assert prefix_cache.reload_prompts_if_changed() is True
+    # Un lecteur qui tenait l'ancien instantané le voit intact ; les suivants voient le nouveau
+    assert before == {"system_keywords": SYSTEM}
+    assert prefix_cache.current_prompts() == {"system_keywords": "nouveau", "keywords": "k"}
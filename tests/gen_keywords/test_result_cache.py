@@ -0,0 +1,63 @@
+"""
+Cache des réponses du VLM : comptage de taille et éviction LRU.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from smartcut.gen_keywords.result_cache import AIResultCache
+
+
+def _disk_size(root: Path) -> int:
+    return sum(p.stat().st_size for p in root.glob("*/*.json"))
+
+
+def _key(i: int) -> str:
+    return f"{i:064x}"
+
+
+def test_get_returns_what_put_stored(tmp_path: Path) -> None:
+    cache = AIResultCache(tmp_path, max_bytes=1 << 20)
+    cache.put(_key(1), {"description": "plage", "keywords": ["mer"]})
+    assert cache.get(_key(1)) == {"description": "plage", "keywords": ["mer"]}
+    assert cache.get(_key(2)) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_overwriting_a_key_does_not_double_count(tmp_path: Path) -> None:
+    cache = AIResultCache(tmp_path, max_bytes=1 << 20)
+    cache.put(_key(1), {"description": "a", "keywords": []})
+    for _ in range(5):
+        cache.put(_key(1), {"description": "b" * 100, "keywords": ["c"]})
+    assert cache._size == _disk_size(tmp_path)
+
+
+def test_eviction_drops_oldest_down_to_low_water_mark(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = AIResultCache(tmp_path, max_bytes=2000)
+    scans = 0
+    entries = cache._entries
+
+    def counting_entries() -> list[tuple[Path, os.stat_result]]:
+        nonlocal scans
+        scans += 1
+        return entries()
+
+    monkeypatch.setattr(cache, "_entries", counting_entries)
+    for i in range(60):
+        cache.put(_key(i), {"description": "x" * 60, "keywords": []})
+        path = cache._path(_key(i))
+        os.utime(path, ns=(i * 10**9, i * 10**9))  # ordre d'accès déterministe
+
+    assert _disk_size(tmp_path) <= cache.max_bytes
+    assert cache._size == _disk_size(tmp_path)
+    # Les plus récentes sont conservées
+    assert cache.get(_key(59)) is not None
+    assert cache.get(_key(0)) is None
+    # Une éviction redescend sous le seuil bas : le répertoire n'est pas re-parcouru à chaque écriture
+    assert scans < 60 / 4
+    assert cache.evictions > 0
@@ -0,0 +1,65 @@
+"""
+Planificateur de pixels par frame : budget de tokens et plafond de résolution.
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from smartcut.gen_keywords import prefix_cache, token_budget
+from smartcut.gen_keywords.token_budget import count_tokens, frame_size, plan_max_pixels
+
+PROMPT_TOKENS = 100
+
+
+class _FakeProcessor:
+    image_processor = SimpleNamespace(patch_size=14, merge_size=2, min_pixels=None, max_pixels=None, size={})
+
+    def apply_chat_template(self, messages: list[dict[str, Any]], **_: Any) -> str:
+        return "prompt"
+
+    def tokenizer(self, text: str) -> dict[str, list[int]]:
+        return {"input_ids": [0] * PROMPT_TOKENS}
+
+
+@pytest.fixture(autouse=True)
+def _prompts(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(prefix_cache, "_prompts", {"system_keywords": "système", "keywords": "mots-clés"})
+    monkeypatch.setattr(token_budget, "MIN_PIXELS", 4 * 28 * 28)
+
+
+def test_frame_size_grows_to_ceiling_and_keeps_ratio() -> None:
+    width, height = frame_size((448, 252), max_pixels=1792 * 1008)
+    assert (width, height) == (1792, 1008)
+    assert frame_size((448, 252), max_pixels=448 * 252 // 2) == (448, 252)
+
+
+def test_short_batch_gets_sharper_frames_than_long_batch() -> None:
+    processor = _FakeProcessor()
+    native = [(1792, 1008)]
+    short_pixels, short_tokens = plan_max_pixels(processor, native * 2, cap=8000, ceiling=1792 * 1008)
+    long_pixels, long_tokens = plan_max_pixels(processor, native * 16, cap=8000, ceiling=1792 * 1008)
+
+    assert short_pixels > long_pixels
+    assert short_tokens <= 8000
+    assert long_tokens <= 8000
+    # Le batch court dépasse la taille historique 448×252 : le budget libre sert à la netteté
+    assert short_pixels > 448 * 252
+
+
+def test_plan_never_exceeds_native_resolution() -> None:
+    processor = _FakeProcessor()
+    pixels, tokens = plan_max_pixels(processor, [(448, 252)], cap=100_000, ceiling=4096 * 4096)
+    assert pixels <= 448 * 252 + 28 * 28
+    assert tokens == count_tokens(processor, [(448, 252)], 4096 * 4096)
+
+
+def test_plan_is_largest_fitting_budget() -> None:
+    processor = _FakeProcessor()
+    sizes = [(1792, 1008)] * 8
+    pixels, tokens = plan_max_pixels(processor, sizes, cap=5000, ceiling=1792 * 1008)
+    assert tokens <= 5000
+    assert count_tokens(processor, sizes, pixels + 28 * 28 * 8) > 5000
@@ -0,0 +1,90 @@
+"""
+Courbe de scores : coupures déduites pour un seuil / un intervalle, et sidecar persisté.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from smartcut.models_sc.scene_curve import SCORE_DTYPE, SceneScoreCurve
+
+FPS = 25.0
+
+
+def _curve(
+    peaks: dict[int, float],
+    frames: range | list[int] = range(250),
+    backend: str = "content",
+    coarse_step: int = 1,
+    coarse_threshold: float = 0.0,
+) -> SceneScoreCurve:
+    records: np.ndarray = np.zeros(len(frames), dtype=SCORE_DTYPE)
+    records["frame"] = list(frames)
+    records["time"] = records["frame"] / FPS
+    records["score"] = [peaks.get(f, 1.0) for f in frames]
+    return SceneScoreCurve(FPS, 10.0, records, backend, coarse_step, coarse_threshold)
+
+
+def test_detect_cuts_on_peaks_above_threshold() -> None:
+    curve = _curve({50: 40.0, 100: 30.0, 200: 20.0})
+    assert curve.detect(27.0) == [(0.0, 2.0), (2.0, 4.0), (4.0, 10.0)]
+    assert curve.detect(35.0) == [(0.0, 2.0), (2.0, 10.0)]
+    assert curve.detect(15.0)[-1] == (8.0, 10.0)
+
+
+def test_detect_respects_min_scene_len() -> None:
+    curve = _curve({50: 40.0, 55: 40.0, 70: 40.0})
+    assert curve.detect(27.0, min_scene_len=15) == [(0.0, 2.0), (2.0, 2.8), (2.8, 10.0)]
+    assert curve.detect(27.0, min_scene_len=30) == [(0.0, 2.0), (2.0, 10.0)]
+
+
+def test_detect_without_cut_returns_empty_list() -> None:
+    assert _curve({50: 10.0}).detect(27.0) == []
+
+
+def test_detect_on_interval_ignores_its_first_frame() -> None:
+    curve = _curve({75: 40.0, 100: 40.0, 225: 40.0})
+    assert curve.detect(27.0, start=3.0, end=8.0) == [(3.0, 4.0), (4.0, 8.0)]
+    assert curve.detect(27.0, start=3.0, end=3.9) == []
+
+
+def test_sparse_coarse_curve_treats_missing_frames_as_no_cut() -> None:
+    curve = _curve({100: 40.0}, frames=[*range(90, 110), *range(180, 200)], coarse_step=8)
+    assert curve.detect(27.0) == [(0.0, 4.0), (4.0, 10.0)]
+
+
+def test_sidecar_round_trip_and_invalidation(tmp_path: Path) -> None:
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"\0" * 16)
+    sidecar = tmp_path / "video.scores.npy"
+    curve = _curve({50: 40.0}, backend="luma")
+    curve.save(sidecar, video)
+
+    loaded = SceneScoreCurve.load(sidecar, video, backend="luma")
+    assert loaded is not None
+    np.testing.assert_array_equal(loaded.records, curve.records)
+    assert loaded.detect(27.0) == curve.detect(27.0)
+
+    # Une courbe dense sert aussi une demande coarse ; l'inverse est faux
+    assert SceneScoreCurve.load(sidecar, video, backend="luma", coarse_step=8, coarse_threshold=5.0) is not None
+    assert SceneScoreCurve.load(sidecar, video, backend="content") is None
+
+    stat = video.stat()
+    os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert SceneScoreCurve.load(sidecar, video, backend="luma") is None
+
+
+@pytest.mark.parametrize("stored, requested, valid", [((8, 5.0), (8, 5.0), True), ((8, 5.0), (4, 5.0), False)])
+def test_coarse_sidecar_is_only_valid_for_same_sampling(
+    tmp_path: Path, stored: tuple[int, float], requested: tuple[int, float], valid: bool
+) -> None:
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"\0")
+    sidecar = tmp_path / "video.scores.npy"
+    _curve({}, frames=range(10), coarse_step=stored[0], coarse_threshold=stored[1]).save(sidecar, video)
+    loaded = SceneScoreCurve.load(sidecar, video, coarse_step=requested[0], coarse_threshold=requested[1])
+    assert (loaded is not None) == valid
@@ -0,0 +1,155 @@
+"""
+Normalisation des mots-clés : chemin groupé, rechargement de mapping.json et fichiers réécrits au démarrage.
+
+L'encodeur est remplacé par des vecteurs déterministes (un axe par préfixe de 4 lettres) : deux mots de même préfixe
+ont une similarité de 1, les autres de 0.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from smartcut.embeddings import store
+from smartcut.norm_keywords import keyword_normalizer
+from smartcut.norm_keywords.keyword_normalizer import KeywordNormalizer
+
+DIM = 64
+
+
+class _PrefixEncoder:
+    def __init__(self) -> None:
+        self.axes: dict[str, int] = {}
+        self.encoded: list[str] = []
+
+    def encode(self, sentences: list[str], **_: object) -> np.ndarray:
+        self.encoded.extend(sentences)
+        matrix: np.ndarray = np.zeros((len(sentences), DIM), dtype=np.float32)
+        for i, text in enumerate(sentences):
+            matrix[i, self.axes.setdefault(text[:4], len(self.axes))] = 1.0
+        return matrix
+
+
+class _Service:
+    def __init__(self) -> None:
+        self.encoder = _PrefixEncoder()
+
+    def get(self, model_name: str) -> _PrefixEncoder:
+        return self.encoder
+
+
+@pytest.fixture
+def service(monkeypatch: pytest.MonkeyPatch) -> _Service:
+    service = _Service()
+    monkeypatch.setattr(store, "EMBEDDING_CACHE", False)
+    monkeypatch.setattr(keyword_normalizer, "get_embedding_service", lambda: service)
+    return service
+
+
+def _write(path: Path, data: object) -> None:
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def _normalizer(tmp_path: Path, mapping: dict[str, str] | None = None, mode: str = "full") -> KeywordNormalizer:
+    if mapping is not None:
+        _write(tmp_path / "mapping.json", mapping)
+    return KeywordNormalizer(
+        model_name="stub",
+        threshold=0.8,
+        mode=mode,
+        mapping_path=tmp_path / "mapping.json",
+        forbidden_path=tmp_path / "forbidden.json",
+        cache_path=tmp_path / "cache.json",
+    )
+
+
+def _cache_file(tmp_path: Path) -> dict[str, str]:
+    cache: dict[str, str] = json.loads((tmp_path / "cache.json").read_text(encoding="utf-8"))
+    return cache
+
+
+def test_normalize_many_uses_mapping_then_nearest_candidate(tmp_path: Path, service: _Service) -> None:
+    normalizer = _normalizer(tmp_path, {"beach": "plage", "cat": "chat"})
+    words = ["Beach", "plages", "chatons", "zèbre", "plages"]
+    assert normalizer.normalize_many(words) == ["plage", "plage", "chat", "zèbre", "plage"]
+    # Un seul encodage pour les mots inconnus, dédoublonnés
+    assert service.encoder.encoded[-3:] == ["plages", "chatons", "zèbre"]
+    assert _cache_file(tmp_path)["chatons"] == "chat"
+
+
+def test_normalize_many_matches_word_by_word_normalize(tmp_path: Path, service: _Service) -> None:
+    words = ["plages", "chatons", "zèbre", "chat", "beach"]
+    (tmp_path / "grouped").mkdir()
+    (tmp_path / "single").mkdir()
+    grouped = _normalizer(tmp_path / "grouped", {"beach": "plage"})
+    single = _normalizer(tmp_path / "single", {"beach": "plage"})
+    assert grouped.normalize_many(words) == [single.normalize(w) for w in words]
+
+
+def test_constructor_does_not_rewrite_sorted_files(tmp_path: Path, service: _Service) -> None:
+    _write(tmp_path / "forbidden.json", ["flou"])
+    _normalizer(tmp_path, {"a": "x", "b": "y"})
+    past = 1_000_000_000_000_000_000
+    for name in ("mapping.json", "forbidden.json"):
+        os.utime(tmp_path / name, ns=(past, past))
+
+    _normalizer(tmp_path)
+    assert (tmp_path / "mapping.json").stat().st_mtime_ns == past
+    assert (tmp_path / "forbidden.json").stat().st_mtime_ns == past
+
+    # Un fichier non trié est encore réécrit trié
+    _write(tmp_path / "mapping.json", {"b": "y", "a": "x"})
+    _normalizer(tmp_path)
+    assert list(json.loads((tmp_path / "mapping.json").read_text(encoding="utf-8"))) == ["a", "b"]
+
+
+def test_mapping_mtime_change_without_content_change_keeps_cache(tmp_path: Path, service: _Service) -> None:
+    normalizer = _normalizer(tmp_path, {"beach": "plage"})
+    normalizer.normalize_many(["plages", "zèbre"])
+    encoded = len(service.encoder.encoded)
+
+    os.utime(tmp_path / "mapping.json", ns=(1, 1))
+    assert normalizer.normalize_many(["plages", "zèbre"]) == ["plage", "zèbre"]
+    assert len(service.encoder.encoded) == encoded
+    assert set(_cache_file(tmp_path)) >= {"plages", "zèbre"}
+
+
+def test_new_candidate_only_drops_entries_it_can_change(tmp_path: Path, service: _Service) -> None:
+    normalizer = _normalizer(tmp_path, {"beach": "plage"})
+    normalizer.normalize_many(["plages", "zèbres"])
+
+    _write(tmp_path / "mapping.json", {"beach": "plage", "zebra": "zèbre"})
+    os.utime(tmp_path / "mapping.json", ns=(2, 2))
+    normalizer._refresh_mapping()
+    # "plages" → "plage" reste valide ; "zèbres" (resté sous le seuil) doit être réévalué
+    assert normalizer.cache == {"plages": "plage"}
+    assert _cache_file(tmp_path) == {"plages": "plage"}
+    assert normalizer.normalize_many(["zèbres"]) == ["zèbre"]
+
+
+def test_removed_candidate_and_changed_key_are_invalidated(tmp_path: Path, service: _Service) -> None:
+    normalizer = _normalizer(tmp_path, {"beach": "plage", "cat": "chat"})
+    normalizer.normalize_many(["plages", "chatons", "beach"])
+
+    _write(tmp_path / "mapping.json", {"beach": "sable", "cat": "chat"})
+    os.utime(tmp_path / "mapping.json", ns=(3, 3))
+    normalizer._refresh_mapping()
+    assert normalizer.cache == {"chatons": "chat"}
+    assert normalizer.normalize_many(["beach", "plages"]) == ["sable", "plages"]
+
+
+def test_session_keywords_match_per_segment_normalization(tmp_path: Path, service: _Service) -> None:
+    lists = [["Plages", "chat", " "], [], ["chatons", "zèbre", "beach"]]
+    (tmp_path / "session").mkdir()
+    (tmp_path / "segment").mkdir()
+    session = _normalizer(tmp_path / "session", {"beach": "plage", "cat": "chat"}, mode="mixed")
+    segment = _normalizer(tmp_path / "segment", {"beach": "plage", "cat": "chat"}, mode="mixed")
+
+    before = len(service.encoder.encoded)
+    grouped = session.normalize_session_keywords(lists)
+    assert service.encoder.encoded[before:] == ["plages", "chat", "chatons", "zèbre"]  # un seul encodage
+    assert grouped == [segment.normalize_keywords(kws) for kws in lists]
@@ -0,0 +1,33 @@
+"""
+Fenêtres de raffinement de la détection coarse-to-fine.
+"""
+
+from __future__ import annotations
+
+from smartcut.scene_split.pyscenedetect import merge_windows, split_windows
+
+
+def test_merge_windows_joins_touching_windows() -> None:
+    assert merge_windows([10, 14, 40], step=5) == [(5, 15), (35, 41)]
+
+
+def test_merge_windows_joins_windows_within_gap() -> None:
+    assert merge_windows([10, 40], step=5, gap=24) == [(5, 41)]
+    assert merge_windows([10, 40], step=5, gap=23) == [(5, 11), (35, 41)]
+
+
+def test_merge_windows_sorts_and_clamps_at_zero() -> None:
+    assert merge_windows([100, 2], step=5) == [(0, 3), (95, 101)]
+
+
+def test_split_windows_keeps_order_and_balances() -> None:
+    windows = [(0, 10), (20, 30), (40, 50), (60, 70)]
+    groups = split_windows(windows, 2)
+    assert groups == [[(0, 10), (20, 30)], [(40, 50), (60, 70)]]
+    assert [w for group in groups for w in group] == windows
+
+
+def test_split_windows_never_exceeds_parts() -> None:
+    windows = [(i * 10, i * 10 + 5) for i in range(7)]
+    assert len(split_windows(windows, 3)) <= 3
+    assert split_windows(windows[:1], 4) == [windows[:1]]